@@ -0,0 +1,71 @@
+import functools
+import os
+import time
+
+from bootcamp_lib.logger import Logger
+
+# the handler modules import this module first, so the init is counted from here
+_IMPORTED_AT = time.perf_counter()
+
+
+class ColdStartTimer:
+    """Measures the cold start of a Lambda function: the module initialization, from the import
+    of this module to `init_done()`, and the first invocation, which pays for the lazily loaded
+    modules and resources.
+
+    Both are logged once per container by the decorated handler, as a warning when their sum
+    exceeds `budget_ms` (default: the COLD_START_BUDGET_MS environment variable).
+
+    Usage, with this module imported before the other modules of the handler:
+
+        from bootcamp_lib.cold_start import ColdStartTimer
+        ...
+        init_timer = ColdStartTimer("recommend-plant")
+        @init_timer.measure
+        def handler(event, context):
+            ...
+        init_timer.init_done()
+    """
+
+    def __init__(self, name: str, budget_ms: float = None):
+        self.name = name
+        self.budgetMs = (
+            budget_ms if budget_ms is not None
+            else float(os.getenv("COLD_START_BUDGET_MS", "0")) or None
+        )
+        self.initMs = None
+        self.firstInvocationMs = None
+        self._started = _IMPORTED_AT
+
+    def init_done(self):
+        self.initMs = (time.perf_counter() - self._started) * 1000
+
+    def report(self) -> dict:
+        total_ms = (self.initMs or 0) + (self.firstInvocationMs or 0)
+        return {
+            "function": self.name,
+            "initMs": round(self.initMs or 0, 1),
+            "firstInvocationMs": round(self.firstInvocationMs or 0, 1),
+            "totalMs": round(total_ms, 1),
+            "budgetMs": self.budgetMs,
+            "overBudget": bool(self.budgetMs and total_ms > self.budgetMs)
+        }
+
+    def measure(self, handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            if self.firstInvocationMs is not None:
+                return handler(*args, **kwargs)
+
+            started = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                self.firstInvocationMs = (time.perf_counter() - started) * 1000
+                report = self.report()
+                if report["overBudget"]:
+                    Logger().warning("Cold start over budget: %s", report)
+                else:
+                    Logger().info("Cold start: %s", report)
+
+        return wrapper
@@ -1,9 +1,13 @@
 # This file should be kept compatible with Python 3.7 syntax
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 import dataclasses
+import queue
+import random
+import threading
 import time
-from typing import Generic, TypeVar, List, Union
+from typing import Generic, Iterator, TypeVar, List, Optional, Tuple, Union
 try:
     from typing import Literal
 except ImportError:
@@ -12,24 +16,54 @@ except ImportError:
 import os
 
 import boto3  # type: ignore
-from boto3.dynamodb.conditions import ConditionBase
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
 from botocore.errorfactory import ClientError
 from dynamodb_json import json_util
 
 from bootcamp_lib.logger import Logger
 from bootcamp_lib.dynamodb_model import DynamoDbModel
+from bootcamp_lib.pagination import decode_cursor, encode_cursor
 
 
 DYNAMO_RETURN_VALUES = Literal["NONE", "ALL_OLD", "UPDATED_OLD", "ALL_NEW", "UPDATED_NEW"]
+DEFAULT_SCAN_SEGMENTS = 4
+BATCH_GET_SIZE = 100
+DEFAULT_BATCH_GET_WORKERS = 4
+# resubmissions of the unprocessed keys of a batch, with jittered exponential backoff
+BATCH_GET_RETRIES = 8
+BATCH_GET_BASE_DELAY = 0.05
+BATCH_GET_MAX_DELAY = 2.0
 
 T = TypeVar("T")
 
 
+class UnprocessedKeysError(Exception):
+    """Raised when DynamoDB still returns unprocessed keys after every retry (throttling)."""
+
+    def __init__(self, table_name: str, keys: List[dict]):
+        super().__init__(f"{len(keys)} keys of table {table_name} were not processed")
+        self.keys = keys
+
+
+def _key_id(key: dict) -> tuple:
+    # hashable key, a Decimal and an int with the same value having the same hash
+    return tuple(sorted(key.items()))
+
+
 class QueryResult(Generic[T]):
-    def __init__(self, count: int, scanned_count: int, items: List[T]):
+    def __init__(
+            self, count: int, scanned_count: int, items: List[T], last_evaluated_key: dict = None):
         self.count = count
         self.scannedCount = scanned_count
         self.items = items
+        self.lastEvaluatedKey = last_evaluated_key
+
+    @property
+    def nextCursor(self) -> Optional[str]:
+        """The `lastEvaluatedKey` as an opaque cursor, to be given back as the `cursor` of the
+        next call. None when there are no results left."""
+        return encode_cursor(self.lastEvaluatedKey)
 
 
 class UpdateStatements:
@@ -46,13 +80,102 @@ class RetryConfig:
     retryDelay: float = 0.25
 
 
+class DynamodbWireTable:
+    """The Query and Scan calls of a table made with a plain boto3 client, whose items stay in the
+    DynamoDB wire format, e.g. {"plantID": {"N": "7"}}, to be read with `DynamoDbModel.from_wire`.
+
+    The parameters are those of the resource Table: the conditions and the values are
+    serialized as the resource does, and the `LastEvaluatedKey` of the responses is deserialized.
+    The clients being thread safe, an instance can be shared by threads.
+    """
+
+    def __init__(self, client, table_name: str):
+        self._client = client
+        self._table_name = table_name
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+
+    def query(self, **params) -> dict:
+        return self._read(self._client.query, params)
+
+    def scan(self, **params) -> dict:
+        return self._read(self._client.scan, params)
+
+    def _serialize(self, values: dict) -> dict:
+        return {name: self._serializer.serialize(value) for name, value in values.items()}
+
+    def _read(self, call, params: dict) -> dict:
+        params = dict(params, TableName=self._table_name)
+        names = dict(params.get("ExpressionAttributeNames") or {})
+        values = dict(params.get("ExpressionAttributeValues") or {})
+        builder = ConditionExpressionBuilder()
+        for name, is_key_condition in (
+                ("KeyConditionExpression", True), ("FilterExpression", False)):
+            if isinstance(params.get(name), ConditionBase):
+                expression = builder.build_expression(params[name], is_key_condition)
+                params[name] = expression.condition_expression
+                names.update(expression.attribute_name_placeholders)
+                values.update(expression.attribute_value_placeholders)
+        if names:
+            params["ExpressionAttributeNames"] = names
+        if values:
+            params["ExpressionAttributeValues"] = self._serialize(values)
+        if params.get("ExclusiveStartKey"):
+            params["ExclusiveStartKey"] = self._serialize(params["ExclusiveStartKey"])
+
+        response = call(**params)
+        if response.get("LastEvaluatedKey"):
+            response["LastEvaluatedKey"] = self._deserialize(response["LastEvaluatedKey"])
+        return response
+
+    def _deserialize(self, item: dict) -> dict:
+        return {name: self._deserializer.deserialize(value) for name, value in item.items()}
+
+
+class DynamodbClientTable(DynamodbWireTable):
+    """The `DynamodbWireTable` calls with the items deserialized as the resource Table does.
+
+    The resource Table is not thread safe, it builds the condition expressions with a shared
+    builder, so the threads reading pages in the background share an instance of this instead.
+    """
+
+    def _read(self, call, params: dict) -> dict:
+        response = super()._read(call, params)
+        response["Items"] = [self._deserialize(item) for item in response["Items"]]
+        return response
+
+    def batch_get(self, keys: List[dict], **params) -> Tuple[List[dict], List[dict]]:
+        """One BatchGetItem call of `keys`, returning the items found and the unprocessed keys,
+        both deserialized."""
+        request = dict(params, Keys=[self._serialize(key) for key in keys])
+        response = self._client.batch_get_item(RequestItems={self._table_name: request})
+        items = response["Responses"].get(self._table_name, [])
+        unprocessed = (response.get("UnprocessedKeys") or {}).get(self._table_name) or {}
+        return ([self._deserialize(item) for item in items],
+                [self._deserialize(key) for key in unprocessed.get("Keys", [])])
+
+
+def plain_client(resource, verify: Union[bool, str] = None):
+    """A client of the service of `resource` without the conversions of the resource, its
+    requests and responses being in the wire format.
+
+    It is created by a new boto3 session, with the region, the endpoint and the configuration
+    the resource was created with, its credentials being found by the default chain. The TLS
+    verification of a resource cannot be read back, `verify` is the one of the client.
+    """
+    meta = resource.meta.client.meta
+    return boto3.session.Session().client(
+        meta.service_model.service_name, region_name=meta.region_name,
+        endpoint_url=meta.endpoint_url, verify=verify, config=meta.config)
+
+
 class DynamodbTable(Generic[T]):
     """Base class for representing a DynamoDB table with its operations.
     """
     table = ""
     model_type = DynamoDbModel
 
-    def __init__(self, dynamodb_resource=None, model_type=None):
+    def __init__(self, dynamodb_resource=None, model_type=None, verify: Union[bool, str] = None):
         if dynamodb_resource:
             self._dynamo_resource = dynamodb_resource
         else:
@@ -60,6 +183,28 @@ class DynamodbTable(Generic[T]):
         self._table_name = os.environ["environment"] + self.table
         self._table = self._dynamo_resource.Table(self._table_name)
         self._model_type = model_type or self.model_type
+        # the TLS verification of the wire format client, see plain_client
+        self._verify = verify
+        self._plain_client = None
+        self._wire = None
+        self._client_table = None
+
+    def _client(self):
+        # created once, the clients being thread safe
+        if self._plain_client is None:
+            self._plain_client = plain_client(self._dynamo_resource, self._verify)
+        return self._plain_client
+
+    def _wire_table(self) -> DynamodbWireTable:
+        if self._wire is None:
+            self._wire = DynamodbWireTable(self._client(), self._table_name)
+        return self._wire
+
+    def _thread_table(self) -> DynamodbClientTable:
+        # the table read by the background threads, shared by all of them
+        if self._client_table is None:
+            self._client_table = DynamodbClientTable(self._client(), self._table_name)
+        return self._client_table
 
     def _prepare_fetch_fields(self):
         reserved_words = {
@@ -143,38 +288,76 @@ class DynamodbTable(Generic[T]):
 
     def get_items(
             self, keys: List[dict], as_dict: bool = False, projection: str = "", limit=0,
-            names: dict = {}, model_type=None
-    ) -> List[T]:
-        params = {
-            "RequestItems": {self._table.table_name: {}}
-        }
+            names: dict = {}, model_type=None, ordered: bool = False,
+            max_workers: int = DEFAULT_BATCH_GET_WORKERS
+    ) -> List[Optional[T]]:
+        """Gets the items of `keys` with BatchGetItem calls of BATCH_GET_SIZE keys.
 
+        Args:
+            keys: the keys of the items, the duplicates being requested once
+            as_dict: True if the returned results should be dictionaries instead of model instances
+            projection: fields which should be returned for each record, including the key
+                fields when `ordered`
+            limit: maximum number of distinct keys read
+            ordered: return one result per distinct key, in the order of `keys`, None for the
+                missing items
+            max_workers: number of batches sent at once
+        Results:
+            The items found, in no particular order unless `ordered`.
+        Raises:
+            UnprocessedKeysError: when some keys are still unprocessed after BATCH_GET_RETRIES
+        """
+        table_params = {}
         if projection:
-            params["RequestItems"][self._table.table_name]["ProjectionExpression"] = projection
+            table_params["ProjectionExpression"] = projection
             if names:
-                params["RequestItems"][self._table.table_name]["ExpressionAttributeNames"] = names
+                table_params["ExpressionAttributeNames"] = names
         elif not as_dict:
-            params["RequestItems"][self._table.table_name].update(self._prepare_fetch_fields())
+            table_params.update(self._prepare_fetch_fields())
 
-        all_items = []
+        keys = list({_key_id(key): key for key in keys}.values())
         if limit > 0:
             keys = keys[:limit]
 
         if not model_type:
             model_type = self._model_type
 
-        while keys:
-            params["RequestItems"][self._table.table_name]["Keys"] = keys[:100]
-            keys = keys[100:]
+        batches = [keys[start:start + BATCH_GET_SIZE]
+                   for start in range(0, len(keys), BATCH_GET_SIZE)]
+        if len(batches) > 1 and max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+                responses = list(executor.map(
+                    lambda batch: self._batch_get(batch, table_params), batches))
+        else:
+            responses = [self._batch_get(batch, table_params) for batch in batches]
+        items = [item for response in responses for item in response]
 
-            get_response = self._dynamo_resource.meta.client.batch_get_item(**params)
-            items = get_response["Responses"].get(self._table.table_name, [])
-            if as_dict:
-                all_items.extend(items)
-            else:
-                all_items.extend([model_type(**item) for item in items])
+        if ordered:
+            key_names = list(keys[0]) if keys else []
+            found = {_key_id({name: item.get(name) for name in key_names}): item for item in items}
+            items = [found.get(_key_id(key)) for key in keys]
+        if as_dict:
+            return items
+        return [model_type(**item) if item is not None else None for item in items]
 
-        return all_items
+    def _batch_get(self, keys: List[dict], table_params: dict) -> List[dict]:
+        """One BatchGetItem call, then the resubmissions of its unprocessed keys. The batches
+        run on worker threads, so they are sent with the table client shared by the threads."""
+        table = self._thread_table()
+        items = []
+        for attempt in range(BATCH_GET_RETRIES + 1):
+            found, keys = table.batch_get(keys, **table_params)
+            items.extend(found)
+            if not keys:
+                return items
+            if attempt < BATCH_GET_RETRIES:
+                # full jitter, so the throttled batches do not retry in lockstep
+                time.sleep(random.uniform(
+                    0, min(BATCH_GET_MAX_DELAY, BATCH_GET_BASE_DELAY * 2 ** attempt)))
+
+        Logger().warning(
+            "Unprocessed keys of table %s after %d retries", self._table_name, BATCH_GET_RETRIES)
+        raise UnprocessedKeysError(self._table_name, keys)
 
     def _retry_command(self, command, retry_config: RetryConfig):
         max_retries = 0 if not retry_config else retry_config.retriesCount
@@ -325,8 +508,10 @@ class DynamodbTable(Generic[T]):
         consistent_read: bool = False,
         model_type=None,
         sort_desc: bool = False,
-        last_eval_key: str = None,
+        last_eval_key: dict = None,
         limit: int = None,
+        cursor: str = None,
+        wire: bool = False,
     ) -> QueryResult[T]:
         """Query the table for a specific key condition.
 
@@ -336,12 +521,22 @@ class DynamodbTable(Generic[T]):
             size: results count over which fetching should stop
             filter: a simple or composed filter formed using `boto3.dynamodb.conditions.Attr`
             return_count: return the number of elements meeting the criteria
+            last_eval_key: the `lastEvaluatedKey` of a previous result to resume from
+            limit: results count at which fetching should stop, a single page being read when it
+                is also the page size
+            cursor: the `nextCursor` of a previous result to resume from, see `decode_cursor`
+            wire: True to read the model instances through `DynamodbWireTable`, which skips the
+                Decimal conversions of the resource, see `DynamoDbModel.from_wire`
         Results:
             List of records as objects or dictionaries. If `size` is specified, the returned size is
             not equal with `size`, but the page fetching will stop once the fetched size is greater
             than `size`.
             If return_count is true, return the count instead of the records list.
+            The `lastEvaluatedKey` and `nextCursor` of the result are None when all the matching
+            records were read.
         """
+        if cursor:
+            last_eval_key = decode_cursor(cursor)
         results = []
         count = 0
         scanned_count = 0
@@ -375,12 +570,14 @@ class DynamodbTable(Generic[T]):
 
         if not model_type:
             model_type = self._model_type
+        wire = wire and not (as_dict or return_count)
+        table = self._wire_table() if wire else self._table
 
         while True:
             if last_eval_key:
                 params["ExclusiveStartKey"] = last_eval_key
 
-            db_items = self._table.query(**params)
+            db_items = table.query(**params)
             scanned_count += db_items.get("ScannedCount", 0)
             last_eval_key = db_items.get("LastEvaluatedKey")
 
@@ -388,7 +585,9 @@ class DynamodbTable(Generic[T]):
                 count += db_items["Count"]
             else:
                 for item in db_items["Items"]:
-                    if not as_dict:
+                    if wire:
+                        results.append(model_type.from_wire(item))
+                    elif not as_dict:
                         results.append(model_type(**item))
                     else:
                         results.append(item)
@@ -406,12 +605,102 @@ class DynamodbTable(Generic[T]):
         return QueryResult(
             count=len(results) if not return_count else count,
             scanned_count=scanned_count,
-            items=results
+            items=results,
+            last_evaluated_key=last_eval_key
         )
 
+    def query_generator(
+            self, key_condition, index_name: str = None, as_dict: bool = False, size: int = 0,
+            filter: ConditionBase = None, projection: str = "", names: dict = None,
+            consistent_read: bool = False, model_type=None, sort_desc: bool = False,
+            page_size: int = None, prefetch: bool = True, wire: bool = False
+    ) -> Iterator[T]:
+        """Queries the table for a specific key condition and yields the items lazily.
+
+        While the items of a page are consumed, the next page is read by a background thread,
+        so the latency of the calls overlaps the processing, and at most two pages are held.
+
+        Args:
+            key_condition: simple or composed conditions formed with `boto3.dynamodb.conditions.Key`
+            as_dict: True if the returned results should be dictionaries instead of model instances
+            size: results count over which fetching should stop
+            filter: a simple or composed filter formed using `boto3.dynamodb.conditions.Attr`
+            page_size: maximum number of items evaluated per Query call [Limit]
+            prefetch: False to read the next page only when the current one is consumed
+            wire: True to read the model instances through `DynamodbWireTable`, which skips the
+                Decimal conversions of the resource, see `DynamoDbModel.from_wire`
+        Results:
+            The records as objects or dictionaries. If `size` is specified, the page fetching
+            stops once the fetched size is greater than `size`, as with `query`.
+        """
+        params = {
+            "KeyConditionExpression": key_condition,
+            "ConsistentRead": consistent_read
+        }
+
+        if page_size:
+            params["Limit"] = page_size
+
+        if index_name:
+            params["IndexName"] = index_name
+
+        if sort_desc:
+            params["ScanIndexForward"] = False
+
+        if projection:
+            params["ProjectionExpression"] = projection
+            if names:
+                params["ExpressionAttributeNames"] = names
+        elif not as_dict:
+            params.update(self._prepare_fetch_fields())
+
+        if filter:
+            params["FilterExpression"] = filter
+
+        if not model_type:
+            model_type = self._model_type
+
+        wire = wire and not as_dict
+        if wire:
+            table = self._wire_table()
+        else:
+            # the pages read in the background go through the client shared by the threads of
+            # every call, not the resource
+            table = self._thread_table() if prefetch else self._table
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+
+        def request(page_params):
+            # the page is read in the background, or only when its result is needed
+            if executor:
+                return executor.submit(table.query, **page_params).result
+            return lambda: table.query(**page_params)
+
+        next_page = request(params)
+        items_count = 0
+        try:
+            while next_page:
+                db_items = next_page()
+                items_count += len(db_items["Items"])
+                last_eval_key = db_items.get("LastEvaluatedKey")
+
+                next_page = None
+                # Don't stop at the exact size, so we can signal when there are items left
+                if last_eval_key and not (size > 0 and items_count > size):
+                    next_page = request(dict(params, ExclusiveStartKey=last_eval_key))
+
+                for item in db_items["Items"]:
+                    if wire:
+                        yield model_type.from_wire(item)
+                    else:
+                        yield item if as_dict else model_type(**item)
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
     def scan(
             self, projection: str = "", as_dict: bool = False, filter: ConditionBase = None,
-            index_name: str = None, names: dict = None, size: int = 0, return_count: bool = False
+            index_name: str = None, names: dict = None, size: int = 0, return_count: bool = False,
+            wire: bool = False
     ) -> Union[List[T], int]:
         """Scans entire table and return the filtered items.
 
@@ -421,6 +710,8 @@ class DynamodbTable(Generic[T]):
             filter: a simple or composed filter formed using `boto3.dynamodb.conditions.Attr`
             size: results count over which fetching should stop
             return_count: return the number of elements meeting the criteria
+            wire: True to read the model instances through `DynamodbWireTable`, which skips the
+                Decimal conversions of the resource, see `DynamoDbModel.from_wire`
         Results:
             List of records as objects or dictionaries. If `size` is specified, the returned size is
             not equal with `size`, but the page fetching will stop once the fetched size is greater
@@ -430,6 +721,8 @@ class DynamodbTable(Generic[T]):
         results = []
         count = 0
         params = {"ReturnConsumedCapacity": "TOTAL"}
+        wire = wire and not (as_dict or return_count)
+        table = self._wire_table() if wire else self._table
 
         if projection:
             params["ProjectionExpression"] = projection
@@ -453,14 +746,16 @@ class DynamodbTable(Generic[T]):
             if last_eval_key:
                 params["ExclusiveStartKey"] = last_eval_key
 
-            db_items = self._table.scan(**params)
+            db_items = table.scan(**params)
             last_eval_key = db_items.get("LastEvaluatedKey")
 
             if return_count:
                 count += db_items["Count"]
             else:
                 for item in db_items["Items"]:
-                    if not as_dict:
+                    if wire:
+                        results.append(self._model_type.from_wire(item))
+                    elif not as_dict:
                         results.append(self._model_type(**item))
                     else:
                         results.append(item)
@@ -474,9 +769,63 @@ class DynamodbTable(Generic[T]):
 
         return results if not return_count else count
 
+    def scan_page(
+            self, limit: int, exclusive_start_key: dict = None, projection: str = "",
+            as_dict: bool = False, filter: ConditionBase = None, names: dict = None,
+            cursor: str = None, wire: bool = False
+    ) -> QueryResult[T]:
+        """Reads a single page of the table, with one Scan call of at most `limit` items.
+
+        Args:
+            limit: maximum number of evaluated items [Limit]
+            exclusive_start_key: the `lastEvaluatedKey` of the previous page
+            cursor: the `nextCursor` of the previous page, instead of `exclusive_start_key`
+            wire: True to read the model instances through `DynamodbWireTable`, which skips the
+                Decimal conversions of the resource, see `DynamoDbModel.from_wire`
+            projection: fields which should be returned for each record
+            as_dict: True if the returned results should be dictionaries instead of model instances
+            filter: a simple or composed filter formed using `boto3.dynamodb.conditions.Attr`,
+                applied after the `limit` items are read, so a page can be shorter than `limit`
+        Results:
+            The page records and its `lastEvaluatedKey` and `nextCursor`, None when the scan
+            reached the table end.
+        """
+        if cursor:
+            exclusive_start_key = decode_cursor(cursor)
+        params = {"Limit": limit, "ReturnConsumedCapacity": "TOTAL"}
+
+        if projection:
+            params["ProjectionExpression"] = projection
+            if names:
+                params["ExpressionAttributeNames"] = names
+        elif not as_dict:
+            params.update(self._prepare_fetch_fields())
+
+        if filter:
+            params["FilterExpression"] = filter
+
+        if exclusive_start_key:
+            params["ExclusiveStartKey"] = exclusive_start_key
+
+        if wire and not as_dict:
+            db_items = self._wire_table().scan(**params)
+            items = [self._model_type.from_wire(item) for item in db_items["Items"]]
+        else:
+            db_items = self._table.scan(**params)
+            items = db_items["Items"]
+            if not as_dict:
+                items = [self._model_type(**item) for item in items]
+
+        return QueryResult(
+            count=len(items),
+            scanned_count=db_items.get("ScannedCount", 0),
+            items=items,
+            last_evaluated_key=db_items.get("LastEvaluatedKey")
+        )
+
     def scan_generator(
             self, projection: str = "", as_dict: bool = False, filter: ConditionBase = None,
-            names: dict = None, size: int = 0) -> Union[List[T], int]:
+            names: dict = None, size: int = 0, wire: bool = False) -> Union[List[T], int]:
         """Scans entire table and return the filtered items as a generator.
 
         Args:
@@ -484,6 +833,8 @@ class DynamodbTable(Generic[T]):
             as_dict: True if the returned results should be dictionaries instead of model instances
             filter: a simple or composed filter formed using `boto3.dynamodb.conditions.Attr`
             size: results count over which fetching should stop
+            wire: True to read the model instances through `DynamodbWireTable`, which skips the
+                Decimal conversions of the resource, see `DynamoDbModel.from_wire`
         Results:
             List of records as objects or dictionaries. If `size` is specified, the returned size is
             not equal with `size`, but the page fetching will stop once the fetched size is greater
@@ -492,6 +843,8 @@ class DynamodbTable(Generic[T]):
         items_count = 0
         params = {}
         params["ReturnConsumedCapacity"] = "TOTAL"
+        wire = wire and not as_dict
+        table = self._wire_table() if wire else self._table
 
         if projection:
             params["ProjectionExpression"] = projection
@@ -509,12 +862,14 @@ class DynamodbTable(Generic[T]):
             if last_eval_key:
                 params["ExclusiveStartKey"] = last_eval_key
 
-            db_items = self._table.scan(**params)
+            db_items = table.scan(**params)
             last_eval_key = db_items.get("LastEvaluatedKey")
 
             for item in db_items["Items"]:
                 items_count += 1
-                if not as_dict:
+                if wire:
+                    yield self._model_type.from_wire(item)
+                elif not as_dict:
                     yield self._model_type(**item)
                 else:
                     yield item
@@ -526,6 +881,121 @@ class DynamodbTable(Generic[T]):
             if size > 0 and items_count > size:
                 break
 
+    def parallel_scan_generator(
+            self, total_segments: int = DEFAULT_SCAN_SEGMENTS, max_workers: int = None,
+            projection: str = "", as_dict: bool = False, filter: ConditionBase = None,
+            index_name: str = None, names: dict = None, size: int = 0, max_pages: int = None,
+            wire: bool = False
+    ) -> Iterator[T]:
+        """Scans the table as `total_segments` segments read by a thread pool, and yields the
+        filtered items as their pages arrive, in no particular order.
+
+        Args:
+            total_segments: number of segments of the scan [TotalSegments]
+            max_workers: number of segments scanned at once (default: `total_segments`)
+            projection: fields which should be returned for each record
+            as_dict: True if the returned results should be dictionaries instead of model instances
+            filter: a simple or composed filter formed using `boto3.dynamodb.conditions.Attr`
+            size: results count over which fetching should stop
+            max_pages: number of pages buffered for the consumer before the segments wait
+                (default: 2 per worker)
+            wire: True to read the model instances through `DynamodbWireTable`, which skips the
+                Decimal conversions of the resource, see `DynamoDbModel.from_wire`
+        Results:
+            The records as objects or dictionaries. As with `scan`, once more than `size` items
+            have been fetched, no more pages are read, the pages being read are still returned.
+        """
+        params = {"ReturnConsumedCapacity": "TOTAL", "TotalSegments": total_segments}
+
+        if projection:
+            params["ProjectionExpression"] = projection
+            if names:
+                params["ExpressionAttributeNames"] = names
+        elif not as_dict:
+            params.update(self._prepare_fetch_fields())
+
+        if index_name:
+            params["IndexName"] = index_name
+
+        if filter:
+            params["FilterExpression"] = filter
+
+        wire = wire and not as_dict
+        max_workers = min(max_workers or total_segments, total_segments)
+        pages = queue.Queue(maxsize=max_pages or 2 * max_workers)
+        # `stopped` when the consumer is gone, `enough` when more than `size` items were read
+        stopped = threading.Event()
+        enough = threading.Event()
+        fetched = [0]
+        fetched_lock = threading.Lock()
+
+        def put(message):
+            # gives up when the consumer is gone, instead of waiting for a free slot forever
+            while not stopped.is_set():
+                try:
+                    pages.put(message, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def scan_segment(segment: int):
+            try:
+                table = self._wire_table() if wire else self._thread_table()
+                segment_params = dict(params, Segment=segment)
+                while not (enough.is_set() or stopped.is_set()):
+                    db_items = table.scan(**segment_params)
+                    items = db_items["Items"]
+                    if wire:
+                        items = [self._model_type.from_wire(item) for item in items]
+                    elif not as_dict:
+                        items = [self._model_type(**item) for item in items]
+                    if not put(("items", items)):
+                        return
+                    with fetched_lock:
+                        fetched[0] += len(items)
+                        if size > 0 and fetched[0] > size:
+                            enough.set()
+
+                    last_eval_key = db_items.get("LastEvaluatedKey")
+                    if not last_eval_key:
+                        break
+                    segment_params["ExclusiveStartKey"] = last_eval_key
+                put(("done", None))
+            except Exception as ex:
+                put(("error", ex))
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            for segment in range(total_segments):
+                executor.submit(scan_segment, segment)
+
+            remaining = total_segments
+            while remaining:
+                kind, value = pages.get()
+                if kind == "error":
+                    raise value
+                if kind == "done":
+                    remaining -= 1
+                else:
+                    for item in value:
+                        yield item
+        finally:
+            stopped.set()
+            executor.shutdown(wait=False)
+
+    def parallel_scan(
+            self, total_segments: int = DEFAULT_SCAN_SEGMENTS, max_workers: int = None,
+            projection: str = "", as_dict: bool = False, filter: ConditionBase = None,
+            index_name: str = None, names: dict = None, size: int = 0, wire: bool = False
+    ) -> List[T]:
+        """`scan` with the segments read in parallel, see `parallel_scan_generator`. The items
+        are not in the order of `scan`."""
+        return list(self.parallel_scan_generator(
+            total_segments=total_segments, max_workers=max_workers, projection=projection,
+            as_dict=as_dict, filter=filter, index_name=index_name, names=names, size=size,
+            wire=wire))
+
 
 class DynamoDbTransactionTable:
     TRANSACTION_SIZE = 100
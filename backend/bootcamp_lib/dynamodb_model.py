@@ -1,26 +1,52 @@
 # This file should be kept compatible with Python 3.7 syntax
 
-from typing import Dict, Set, _GenericAlias
+from typing import Callable, Dict, Optional, Set, _GenericAlias
 import dataclasses
 from decimal import Decimal
 import copy
 
+from boto3.dynamodb.types import TypeDeserializer  # type: ignore
 from dynamodb_json import json_util  # type: ignore
 
+_wire_deserializer = TypeDeserializer()
+
 
 class DynamoDbModelValueConversionError(Exception):
     pass
 
 
+def _wire_value(value: dict):
+    # strings are most of the attributes, the other types go through the boto3 deserializer
+    if "S" in value:
+        return value["S"]
+    return _wire_deserializer.deserialize(value)
+
+
+def _wire_number(dest_type: type) -> Callable[[dict], object]:
+    def convert(value: dict):
+        number = value.get("N")
+        if number is None:
+            return _wire_value(value)
+        try:
+            converted = dest_type(number)
+        except ValueError:
+            # e.g. "1.0" or "1E+2" for an int
+            converted = dest_type(Decimal(number))
+        # as for the Decimal values of the resource reads, see __post_init__, zero becomes None
+        return converted if converted else None
+    return convert
+
+
 class DynamoDbModel:
     """Base model for entity validation and properties conversion to DynamoDB values.
     """
 
     __slots__ = ("_errors")
-    _INTERNAL_FIELDS = ["_errors", "_convert_types", "_fields"]
+    _INTERNAL_FIELDS = ["_errors", "_convert_types", "_fields", "_wire_converters"]
     _validations: Dict[str, dict] = {}
     _convert_types: Dict[str, type] = None
     _fields: Set[str] = None
+    _wire_converters: Dict[str, Callable[[dict], object]] = None
 
     def __init__(self):
         self._errors: Dict[str, dict] = {}
@@ -129,28 +155,65 @@ class DynamoDbModel:
             new_dict = {prop: val for prop, val in dict.items() if prop in model_class._fields}
             return model_class(**new_dict)
 
+    @classmethod
+    def _field_convert_types(cls) -> Dict[str, type]:
+        # the int, float and model fields, and the lists of them, with their element type
+        convert_types = {}
+        for field in dataclasses.fields(cls):
+            if field.type in (int, float):
+                convert_types[field.name] = field.type
+            elif isinstance(field.type, _GenericAlias):
+                type_name = str(field.type)
+                if (type_name.startswith("typing.Union")
+                        or type_name.startswith("typing.Optional")):
+                    subtype = field.type.__args__[0]
+                    if str(subtype).startswith("typing.List"):
+                        if (subtype.__args__[0] in (int, float)
+                                or issubclass(subtype.__args__[0], DynamoDbModel)):
+                            convert_types[field.name] = subtype.__args__[0]
+                    elif (subtype in (int, float) or issubclass(subtype, DynamoDbModel)):
+                        convert_types[field.name] = subtype
+                elif type_name.startswith("typing.List"):
+                    convert_types[field.name] = field.type.__args__[0]
+            elif issubclass(field.type, DynamoDbModel):
+                convert_types[field.name] = field.type
+        return convert_types
+
+    @classmethod
+    def from_wire(cls, item: dict):
+        """Builds the model from an item in the DynamoDB wire format, e.g. {"plantID": {"N": "7"}},
+        as returned by a boto3 client.
+
+        The numbers of the int and float fields are parsed straight to their type, instead of
+        going through Decimal and being converted again by __post_init__. Other values are read
+        as by the boto3 resources, and the attributes which are not model fields are ignored.
+        The converters of the fields are built on the first call for the model class.
+        """
+        converters = cls.__dict__.get("_wire_converters")
+        if converters is None:
+            convert_types = cls._field_convert_types()
+            converters = {}
+            for field in dataclasses.fields(cls):
+                dest_type = convert_types.get(field.name)
+                # a list of numbers is read as a list of Decimal, then converted by __post_init__
+                converters[field.name] = (
+                    _wire_number(dest_type)
+                    if dest_type in (int, float) and field.type in (
+                        dest_type, Optional[dest_type])
+                    else _wire_value)
+            cls._wire_converters = converters
+
+        values = {}
+        for name, value in item.items():
+            convert = converters.get(name)
+            if convert is not None:
+                values[name] = convert(value)
+        return cls(**values)
+
     def __post_init__(self):
         super().__init__()
         if self.__class__._convert_types is None:
-            self.__class__._convert_types = {}
-            for field in dataclasses.fields(self.__class__):
-                if field.type in (int, float):
-                    self.__class__._convert_types[field.name] = field.type
-                elif isinstance(field.type, _GenericAlias):
-                    type_name = str(field.type)
-                    if (type_name.startswith("typing.Union")
-                            or type_name.startswith("typing.Optional")):
-                        subtype = field.type.__args__[0]
-                        if str(subtype).startswith("typing.List"):
-                            if (subtype.__args__[0] in (int, float)
-                                    or issubclass(subtype.__args__[0], DynamoDbModel)):
-                                self.__class__._convert_types[field.name] = subtype.__args__[0]
-                        elif (subtype in (int, float) or issubclass(subtype, DynamoDbModel)):
-                            self.__class__._convert_types[field.name] = subtype
-                    elif type_name.startswith("typing.List"):
-                        self.__class__._convert_types[field.name] = field.type.__args__[0]
-                elif issubclass(field.type, DynamoDbModel):
-                    self.__class__._convert_types[field.name] = field.type
+            self.__class__._convert_types = self._field_convert_types()
 
         if self.__class__._convert_types:
             for field_name, dest_type in self.__class__._convert_types.items():
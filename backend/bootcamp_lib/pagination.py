@@ -0,0 +1,121 @@
+# This file should be kept compatible with Python 3.7 syntax
+
+import base64
+import binascii
+from decimal import Decimal, InvalidOperation
+import hashlib
+import hmac
+import json
+import os
+from typing import Collection, Optional
+
+from boto3.dynamodb.types import Binary  # type: ignore
+
+
+CURSOR_SECRET_ENV = "PAGINATION_CURSOR_SECRET"
+# bytes of the HMAC-SHA256 digest kept in a signed cursor
+SIGNATURE_SIZE = 16
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def cursor_secret() -> Optional[str]:
+    """The key signing the cursors, from the PAGINATION_CURSOR_SECRET environment variable."""
+    return os.environ.get(CURSOR_SECRET_ENV) or None
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _signature(payload: str, secret: str) -> str:
+    digest = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest()
+    return _b64encode(digest[:SIGNATURE_SIZE])
+
+
+def _encode_value(value):
+    # keys only hold S, N and B attributes: the numbers and binaries are tagged to be read back
+    # with their exact DynamoDB type
+    if isinstance(value, bool):
+        raise TypeError(f"Unsupported key value {value!r}")
+    if isinstance(value, (int, Decimal)):
+        return {"N": str(value)}
+    if isinstance(value, (bytes, bytearray)):
+        return {"B": _b64encode(bytes(value))}
+    if isinstance(value, Binary):
+        return {"B": _b64encode(value.value)}
+    raise TypeError(f"Unsupported key value {value!r}")
+
+
+def _decode_value(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict) and len(value) == 1:
+        if isinstance(value.get("N"), str):
+            try:
+                return Decimal(value["N"])
+            except InvalidOperation:
+                raise InvalidCursorError("Invalid cursor key value")
+        if isinstance(value.get("B"), str):
+            try:
+                return _b64decode(value["B"])
+            except (binascii.Error, ValueError):
+                raise InvalidCursorError("Invalid cursor key value")
+    raise InvalidCursorError("Invalid cursor key value")
+
+
+def encode_cursor(last_evaluated_key: Optional[dict], secret: str = None) -> Optional[str]:
+    """The DynamoDB LastEvaluatedKey as a compact URL safe token, None at the end of the results.
+
+    The token is the base64 of the key as JSON, followed by "." and a truncated HMAC-SHA256 of
+    it when a `secret` is given (by default the one of `cursor_secret`), so that the clients
+    cannot forge a start key.
+    """
+    if not last_evaluated_key:
+        return None
+    data = json.dumps(
+        {name: value if isinstance(value, str) else _encode_value(value)
+         for name, value in last_evaluated_key.items()},
+        separators=(",", ":"), sort_keys=True)
+    payload = _b64encode(data.encode())
+    secret = secret or cursor_secret()
+    if secret:
+        return f"{payload}.{_signature(payload, secret)}"
+    return payload
+
+
+def decode_cursor(
+        cursor: Optional[str], secret: str = None, key_names: Collection[str] = None
+) -> Optional[dict]:
+    """The ExclusiveStartKey of a cursor from `encode_cursor`, None for an empty cursor.
+
+    Args:
+        secret: the key the cursor was signed with, by default the one of `cursor_secret`.
+            When set, unsigned cursors are rejected.
+        key_names: when given, the exact attribute names of the key
+    Raises:
+        InvalidCursorError: the cursor is malformed, its signature does not match or its key
+            attributes are not `key_names`
+    """
+    if not cursor:
+        return None
+    payload, _, signature = cursor.partition(".")
+    secret = secret or cursor_secret()
+    if secret and not hmac.compare_digest(
+            signature.encode(), _signature(payload, secret).encode()):
+        raise InvalidCursorError("Invalid cursor signature")
+    try:
+        key = json.loads(_b64decode(payload))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursorError("Malformed cursor")
+    if not isinstance(key, dict) or not key:
+        raise InvalidCursorError("Malformed cursor")
+    if key_names is not None and set(key) != set(key_names):
+        raise InvalidCursorError("Invalid cursor key")
+    return {name: _decode_value(value) for name, value in key.items()}
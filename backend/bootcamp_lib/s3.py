@@ -1,11 +1,15 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
 
 import boto3
+from botocore.exceptions import ClientError
 
 from bootcamp_lib.logger import Logger
 
 
 class CavendishS3:
+    DELETE_BATCH_SIZE = 1000
 
     def __init__(self, bucket: str, s3_res=None):
         self._bucket = bucket
@@ -16,6 +20,54 @@ class CavendishS3:
         self._s3_res.Object(self._bucket, bucket_file).delete()
         Logger().info("'s3://%s/%s' deleted", self._bucket, bucket_file)
 
+    def delete_files(self, bucket_files: List[str], max_workers: int = 4) -> Dict[str, str]:
+        """Deletes the files with multi-object deletes of up to DELETE_BATCH_SIZE keys, sent in
+        parallel. A missing file counts as deleted.
+
+        Returns:
+            The error message of every file that could not be deleted, by key. When a whole
+            batch is rejected, e.g. access denied or throttled, all of its keys get its error.
+        """
+        bucket_files = list(dict.fromkeys(bucket_files))
+        batches = [
+            bucket_files[start:start + self.DELETE_BATCH_SIZE]
+            for start in range(0, len(bucket_files), self.DELETE_BATCH_SIZE)
+        ]
+        if not batches:
+            return {}
+
+        def delete_batch(keys: List[str]) -> Dict[str, str]:
+            # the clients are thread safe, unlike the resources
+            try:
+                response = self._s3_res.meta.client.delete_objects(
+                    Bucket=self._bucket,
+                    Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True}
+                )
+            except ClientError as ex:
+                Logger().exception(
+                    "Could not delete %d files from 's3://%s'", len(keys), self._bucket)
+                error = ex.response.get("Error", {})
+                return {key: f"{error.get('Code')}: {error.get('Message')}" for key in keys}
+            return {
+                error["Key"]: f"{error.get('Code')}: {error.get('Message')}"
+                for error in response.get("Errors", [])
+            }
+
+        Logger().info("Deleting %d files from 's3://%s'", len(bucket_files), self._bucket)
+        errors = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            for batch_errors in executor.map(delete_batch, batches):
+                errors.update(batch_errors)
+        Logger().info(
+            "%d files deleted from 's3://%s', %d failed",
+            len(bucket_files) - len(errors), self._bucket, len(errors))
+        return errors
+
+    def list_files(self, prefix: str) -> List[str]:
+        """The keys of the files whose key starts with `prefix`."""
+        bucket = self._s3_res.Bucket(self._bucket)
+        return [item.key for item in bucket.objects.filter(Prefix=prefix)]
+
     def upload_file(self, local_file: str, bucket_file: str):
         file_size = os.path.getsize(local_file)
         Logger().info("Uploading 's3://%s/%s' (%d) bytes", self._bucket, bucket_file, file_size)
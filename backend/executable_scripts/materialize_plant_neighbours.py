@@ -0,0 +1,35 @@
+import argparse
+
+import boto3
+
+from services.flower_shop.recommender_model import RecommenderModelStore
+from services.flower_shop.recommender_neighbours import (
+    materialize_neighbours, neighbours_count_from_env
+)
+from services.flower_shop.table_plant_neighbours import PlantNeighboursTable
+
+dynamodb_res = boto3.resource("dynamodb", verify=False)
+
+
+def main():
+    """Precomputes the plant neighbours outside Lambda, for catalogs too large for its 6 vCPUs.
+
+    Requires the `environment` and `BOOTCAMP_BUCKET` environment variables of the target stage.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--neighbours", type=int, default=neighbours_count_from_env())
+    parser.add_argument("--version", help="model version, defaults to the latest one")
+    parser.add_argument("--workers", type=int, help="thread pool size, defaults to cpu count")
+    args = parser.parse_args()
+
+    model = RecommenderModelStore().load(args.version)
+    print(f"Materializing {args.neighbours} neighbours for {model.plants_count} plants "
+          f"of model {model.version}...")
+    plants_count = materialize_neighbours(
+        model, PlantNeighboursTable(dynamodb_res), n_neighbours=args.neighbours,
+        max_workers=args.workers)
+    print(f"Wrote the neighbours of {plants_count} plants")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from typing import Optional
+
+import boto3
+
+from services.flower_shop.table_plant_data import PlantDataTable
+from services.flower_shop.table_plant_data_deprecated import PlantDataTableDeprecated
+
+dynamodb_res = boto3.resource('dynamodb', verify=False)
+
+
+def convert_item(item: dict) -> Optional[dict]:
+    """The item of the deprecated table keyed by plantID, None when its idPlant is not numeric."""
+    item = dict(item)
+    try:
+        item["plantID"] = int(item.pop("idPlant"))
+    except (KeyError, TypeError, ValueError):
+        return None
+    return item
+
+
+def migrate_data():
+    plant_table_deprecated = PlantDataTableDeprecated(dynamodb_res)
+    plant_table = PlantDataTable(dynamodb_res)
+
+    print("Scanning the deprecated table for all items...")
+    try:
+        items = plant_table_deprecated.parallel_scan(as_dict=True)
+    except Exception as e:
+        print(f"Error scanning deprecated table: {e}")
+        return
+
+    if not items:
+        print("No items found in the deprecated table.")
+        return
+
+    print(f"Found {len(items)} items in the deprecated table.")
+
+    converted = []
+    for item in items:
+        new_item = convert_item(item)
+        if new_item is None:
+            print(f"Skipping item with a non numeric idPlant: {item.get('idPlant')!r}")
+        else:
+            converted.append(new_item)
+
+    try:
+        plant_table.put_items(converted)
+    except Exception as e:
+        print(f"Error writing items to new table: {e}")
+        return
+
+    print(f"Data migration completed successfully, {len(converted)} items copied.")
+
+
+if __name__ == "__main__":
+    migrate_data()
@@ -14,7 +14,7 @@ def migrate_data():
 
     print("Scanning the deprecated table for all items...")
     try:
-        items = football_players_table_deprecated.scan(as_dict=True)
+        items = football_players_table_deprecated.parallel_scan(as_dict=True)
     except Exception as e:
         print(f"Error scanning deprecated table: {e}")
         return
@@ -1,90 +1,255 @@
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import json
 import os
+import random
+import threading
+import time
+from typing import Iterator, List, Tuple
+
 import boto3
-from dataclasses import dataclass
-from typing import List
+
+from bootcamp_lib.dynamodb_model import DynamoDbModel, DynamoDbModelValueConversionError
 from bootcamp_lib.logger import Logger
-import sys
-sys.path.append('/path/to/bootcamp_lib')
+from services.flower_shop.table_plant_data import PlantDataModel, PlantDataTable
 
-# Initialize DynamoDB resource
 dynamodb_res = boto3.resource("dynamodb", verify=False)
 
-# Define the PlantDataModel using dataclass
-@dataclass
-class PlantDataModel:
-    plantID: int
-    plantRating: int
-    plantName: str
-    soilType: str
-    sunlightHours: int
-    waterFrequency: str
-    fertilizerType: str
-    temperature: float
-    humidity: float
-    location: str
-    age: int
-
-# Define the PlantDataTable class
-class PlantDataTable:
-    def __init__(self, dynamodb_resource):
-        self.table = dynamodb_resource.Table('PlantDataTable')
-
-    def put_items(self, items: List[PlantDataModel]):
-        with self.table.batch_writer() as batch:
-            for item in items:
-                batch.put_item(Item=item.__dict__)
-
-# Function to load plant data from a JSON file
-def load_plant_data(file_path):
-    with open(file_path, 'r') as file:
-        data = json.load(file)
-    return data
-
-# Main function to populate the DynamoDB table
-def main():
-    logger = Logger()
-    plant_data_table = PlantDataTable(dynamodb_res)
+# keys of scripts/plant_data.json and of the generate_plant_entries.py output -> model fields,
+# the rows may also use the model field names
+INPUT_KEYS = {
+    "Plant-ID": "plantID",
+    "Plant-Rating": "plantRating",
+    "Plant-Name": "plantName",
+    "Soil-Type": "soilType",
+    "Sunlight-Hours": "sunlightHours",
+    "Water-Frequency": "waterFrequency",
+    "Fertilizer-Type": "fertilizerType",
+    "Temperature": "temperature",
+    "Humidity": "humidity",
+    "Location": "location",
+    "Age": "age"
+}
+
+DEFAULT_WORKERS = 8
+DEFAULT_CHUNK_LINES = 1000
+# BatchWriteItem accepts at most 25 put requests
+BATCH_SIZE = 25
+MAX_RETRIES = 10
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 10.0
 
-    # Path to the JSON file containing plant data
-    file_path = "D:/plant_recommender_system/backend/scripts/plant_data.json"
 
-    # Load plant data from the JSON file
+class UnprocessedItemsError(Exception):
+    pass
+
+
+def parse_plant(line: bytes) -> PlantDataModel:
+    """Parses and validates one JSONL row, raises ValueError when it is not a valid plant."""
+    data = json.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError("not a JSON object")
+    # the missing fields are None rather than the model defaults, so validate() reports them
+    fields = dict.fromkeys(INPUT_KEYS.values())
+    fields.update((INPUT_KEYS.get(key, key), value) for key, value in data.items())
     try:
-        plant_data_list = load_plant_data(file_path)
-    except Exception as e:
-        logger.exception(f"Error loading plant data: {str(e)}")
-        return
-
-    # Convert JSON data to PlantDataModel instances
-    plants = []
-    for plant_data in plant_data_list:
+        plant = DynamoDbModel.dict_to_model(PlantDataModel, fields)
+    except DynamoDbModelValueConversionError as e:
+        raise ValueError(str(e)) from e
+    if not plant.validate():
+        raise ValueError(plant.validation_errors)
+    return plant
+
+
+def read_chunks(
+        file_path: str, offset: int, line_number: int, chunk_lines: int
+) -> Iterator[Tuple[int, int, List[Tuple[int, bytes]]]]:
+    """Streams the input from the byte `offset`, without reading more than a chunk ahead.
+
+    Yields:
+        (offset after the chunk, line number after the chunk, [(line number, line), ...])
+    """
+    with open(file_path, "rb") as file:
+        file.seek(offset)
+        lines = []
+        for line in file:
+            offset += len(line)
+            line_number += 1
+            if line.strip():
+                lines.append((line_number, line))
+            if len(lines) >= chunk_lines:
+                yield offset, line_number, lines
+                lines = []
+        if lines:
+            yield offset, line_number, lines
+
+
+class PlantBatchWriter:
+    """Buffers plants into BatchWriteItem calls of 25 and resends the unprocessed items with
+    exponential backoff and full jitter, unlike boto3's batch_writer which resends them at once.
+
+    Not thread safe: every worker thread owns a writer and its client.
+    """
+
+    def __init__(self, client, table_name: str, max_retries: int = MAX_RETRIES):
+        self._client = client
+        self._table_name = table_name
+        self._max_retries = max_retries
+        # keyed by plantID, a batch must not contain the same key twice
+        self._requests = {}
+        self.retries = 0
+
+    def put(self, plant: PlantDataModel):
+        self._requests[plant.plantID] = {
+            "PutRequest": {"Item": plant.to_dynamodb_dict(serialize=True)}
+        }
+        if len(self._requests) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        requests = list(self._requests.values())
+        self._requests = {}
+        attempt = 0
+        while requests:
+            response = self._client.batch_write_item(RequestItems={self._table_name: requests})
+            requests = response.get("UnprocessedItems", {}).get(self._table_name, [])
+            if not requests:
+                return
+            if attempt == self._max_retries:
+                raise UnprocessedItemsError(
+                    f"{len(requests)} plants still unprocessed after {attempt} retries")
+            time.sleep(random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+            attempt += 1
+            self.retries += 1
+
+
+def load_checkpoint(checkpoint_path: str, file_path: str) -> dict:
+    checkpoint = {"input": os.path.abspath(file_path), "offset": 0, "line": 0, "written": 0,
+                  "invalid": 0}
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as file:
+            saved = json.load(file)
+        if saved["input"] != checkpoint["input"] or saved["offset"] > os.path.getsize(file_path):
+            raise ValueError(f"Checkpoint {checkpoint_path} does not belong to {file_path}")
+        checkpoint.update(saved)
+    return checkpoint
+
+
+def save_checkpoint(checkpoint_path: str, checkpoint: dict):
+    # written aside then renamed, so an interrupted save does not lose the previous checkpoint
+    temp_path = f"{checkpoint_path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(checkpoint, file)
+    os.replace(temp_path, checkpoint_path)
+
+
+def populate_plants(
+        file_path: str, checkpoint_path: str, workers: int = DEFAULT_WORKERS,
+        chunk_lines: int = DEFAULT_CHUNK_LINES) -> dict:
+    """Writes the plants of a JSONL file into the plant table with `workers` threads.
+
+    The chunks are written in parallel but acknowledged in file order: the checkpoint holds the
+    byte offset after the last chunk whose previous chunks were all written, so a resumed load
+    only rewrites (idempotently) the chunks that were in flight.
+    """
+    logger = Logger()
+    table_name = PlantDataTable(dynamodb_res)._table_name
+    checkpoint = load_checkpoint(checkpoint_path, file_path)
+    if checkpoint["offset"]:
+        print(f"Resuming after line {checkpoint['line']} ({checkpoint['written']} plants written)")
+
+    local = threading.local()
+    writers = []
+
+    def writer() -> PlantBatchWriter:
+        if not hasattr(local, "writer"):
+            # boto3 clients are created per thread, the default session is not thread safe
+            client = boto3.session.Session().client("dynamodb", verify=False)
+            local.writer = PlantBatchWriter(client, table_name)
+            writers.append(local.writer)
+        return local.writer
+
+    def write_chunk(lines: List[Tuple[int, bytes]]) -> Tuple[int, int]:
+        chunk_writer = writer()
+        written = invalid = 0
+        for line_number, line in lines:
+            try:
+                plant = parse_plant(line)
+            except ValueError as e:
+                logger.error("Invalid plant on line %d: %s", line_number, e)
+                invalid += 1
+                continue
+            chunk_writer.put(plant)
+            written += 1
+        chunk_writer.flush()
+        return written, invalid
+
+    started = time.perf_counter()
+    resumed_written = checkpoint["written"]
+
+    def acknowledge(pending: deque):
+        offset, line_number, future = pending.popleft()
+        written, invalid = future.result()
+        checkpoint.update(
+            offset=offset, line=line_number, written=checkpoint["written"] + written,
+            invalid=checkpoint["invalid"] + invalid)
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # a bounded window of chunks in flight, so the reader does not run ahead of the writes
+        pending = deque()
         try:
-            plant = PlantDataModel(
-                plantID=plant_data["Plant-ID"],
-                plantRating=plant_data["Plant-Rating"],
-                plantName=plant_data["Plant-Name"],
-                soilType=plant_data["Soil-Type"],
-                sunlightHours=plant_data["Sunlight-Hours"],
-                waterFrequency=plant_data["Water-Frequency"],
-                fertilizerType=plant_data["Fertilizer-Type"],
-                temperature=plant_data["Temperature"],
-                humidity=plant_data["Humidity"],
-                location=plant_data["Location"],
-                age=plant_data["Age"]
-            )
-            plants.append(plant)
-        except KeyError as e:
-            logger.error(f"Missing key in plant data: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error processing plant data: {str(e)}")
-
-    # Add plant instances to the DynamoDB table
-    try:
-        plant_data_table.put_items(plants)
-        logger.info("Successfully added plant data to the DynamoDB table.")
-    except Exception as e:
-        logger.exception(f"Error adding plant data to the DynamoDB table: {str(e)}")
+            for offset, line_number, lines in read_chunks(
+                    file_path, checkpoint["offset"], checkpoint["line"], chunk_lines):
+                pending.append((offset, line_number, executor.submit(write_chunk, lines)))
+                if len(pending) >= 2 * workers:
+                    acknowledge(pending)
+            while pending:
+                acknowledge(pending)
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    elapsed = time.perf_counter() - started
+    written = checkpoint["written"] - resumed_written
+    summary = {
+        **checkpoint,
+        "seconds": elapsed,
+        "plantsPerSecond": written / elapsed if elapsed else None,
+        "retries": sum(batch_writer.retries for batch_writer in writers)
+    }
+    logger.info("Populated the plant table: %s", summary)
+    # there is no checkpoint when no chunk was written, e.g. for an empty input
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return summary
+
+
+def main():
+    """Streams a JSONL plant file (e.g. scripts/plant_data.json or the generate_plant_entries.py
+    output) into the plant table, resuming from the checkpoint of an interrupted load.
+
+    Requires the `environment` environment variable of the target stage.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("input", help="JSONL file, one plant per line")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--chunk-lines", type=int, default=DEFAULT_CHUNK_LINES,
+                        help="lines per worker task and checkpoint")
+    parser.add_argument("--checkpoint", help="defaults to <input>.checkpoint")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the checkpoint and load from the first line")
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or f"{args.input}.checkpoint"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    summary = populate_plants(args.input, checkpoint_path, args.workers, args.chunk_lines)
+    print(f"Wrote {summary['written']} plants ({summary['invalid']} invalid rows) "
+          f"in {summary['seconds']:.1f}s, {summary['retries']} batch retries")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,55 @@
+import argparse
+
+import boto3
+
+from services.flower_shop.recommender_model import RecommenderModelStore
+from services.flower_shop.recommender_training import (
+    DEFAULT_PAGE_SIZE, fetch_training_plants, train_model, train_model_streaming
+)
+from services.flower_shop.table_plant_data import PlantDataTable
+
+dynamodb_res = boto3.resource("dynamodb", verify=False)
+
+
+def main():
+    """Trains the plant recommender outside Lambda, using every core for the k selection.
+
+    Requires the `environment` and `BOOTCAMP_BUCKET` environment variables of the target stage.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--min-clusters", type=int, default=2)
+    parser.add_argument("--max-clusters", type=int, default=10)
+    parser.add_argument("--clusters", type=int, help="skip the selection and use this k")
+    parser.add_argument("--workers", type=int, help="process pool size, defaults to cpu count")
+    parser.add_argument(
+        "--streaming", action="store_true",
+        help="fit MiniBatchKMeans page by page instead of loading the whole table")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="do not publish the model")
+    args = parser.parse_args()
+
+    plant_table = PlantDataTable(dynamodb_res)
+    if args.streaming:
+        print(f"Streaming the plant table in pages of {args.page_size}...")
+        model = train_model_streaming(
+            plant_table, n_clusters=args.clusters, page_size=args.page_size)
+    else:
+        print("Scanning the plant table...")
+        plants = fetch_training_plants(plant_table)
+        print(f"Training on {len(plants)} plants...")
+        model = train_model(
+            plants, n_clusters=args.clusters,
+            cluster_range=(args.min_clusters, args.max_clusters), max_workers=args.workers)
+
+    for candidate in model.metadata.get("clusterSelection", {}).get("candidates", []):
+        print(f"k={candidate['nClusters']}: inertia={candidate['inertia']:.2f}, "
+              f"silhouette={candidate['silhouetteScore']}")
+    print(f"Selected k={model.metadata['nClusters']}, silhouette={model.silhouetteScore}")
+
+    if not args.dry_run:
+        RecommenderModelStore().save(model)
+        print(f"Published model {model.version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,7 @@ dynamodb_res = boto3.resource('dynamodb', verify=False)
 def update_players_table_position_field_name():
     football_players_table = FootballPlayersTable(dynamodb_res)
 
-    response = football_players_table.scan(as_dict=True)
+    response = football_players_table.parallel_scan(as_dict=True)
 
     for item in response:
         if 'position' in item:
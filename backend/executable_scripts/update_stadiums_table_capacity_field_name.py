@@ -9,7 +9,7 @@ dynamodb_res = boto3.resource('dynamodb', verify=False)
 def update_stadiums_table_capacity_field_name():
     stadiums_table = StadiumsTable(dynamodb_res)
 
-    response = stadiums_table.scan(as_dict=True)
+    response = stadiums_table.parallel_scan(as_dict=True)
 
     for item in response:
         if 'capacity' in item:
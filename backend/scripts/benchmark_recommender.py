@@ -0,0 +1,196 @@
+"""Benchmarks the flower-shop recommender engines on seeded synthetic catalogs.
+
+Run from the backend directory, e.g.:
+    python -m scripts.benchmark_recommender --sizes 1000,100000 --output benchmark.json
+
+Every catalog size runs in its own process, so the reported peak RSS values are not inflated
+by the previous sizes. They are high-water marks of that process, measured after each stage.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+import sklearn
+
+from scripts.generate_plant_entries import generate_columns
+from services.flower_shop.recommender_neighbours import compute_neighbours
+from services.flower_shop.recommender_scoring import ScoringConfig
+from services.flower_shop.recommender_training import train_model_from_columns
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000, 5000000)
+ENGINES = ("cluster", "knn", "precomputed")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def latency_stats(latencies: list) -> dict:
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "queries": len(latencies),
+        "p50Ms": float(np.percentile(latencies_ms, 50)),
+        "p99Ms": float(np.percentile(latencies_ms, 99)),
+        "meanMs": float(latencies_ms.mean())
+    }
+
+
+def benchmark_queries(query, batch_query, rows: np.ndarray, batch_size: int) -> dict:
+    """Per-query latency of `query(row)` and throughput of `batch_query(rows)`."""
+    latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        query(int(row))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for batch_start in range(0, len(rows), batch_size):
+        batch_query(rows[batch_start:batch_start + batch_size])
+    elapsed = time.perf_counter() - start
+
+    return {
+        **latency_stats(latencies),
+        "batchSize": batch_size,
+        "batchThroughputQps": len(rows) / elapsed if elapsed else None
+    }
+
+
+def benchmark_size(plants_count: int, options: dict) -> dict:
+    rng = np.random.default_rng(options["seed"])
+    columns, generate_seconds = timed(generate_columns, plants_count, rng)
+    result = {
+        "plants": plants_count,
+        "generateSeconds": generate_seconds,
+        "peakRssMb": {"generate": peak_rss_mb()},
+        "engines": {}
+    }
+
+    model, fit_seconds = timed(
+        train_model_from_columns, columns.pop("plantID"), columns,
+        n_clusters=options["clusters"],
+        scoring=ScoringConfig(method="simplified", seed=options["seed"]))
+    del columns
+    result["fitSeconds"] = fit_seconds
+    result["peakRssMb"]["fit"] = peak_rss_mb()
+
+    k = options["k"]
+    query_rows = rng.integers(0, plants_count, min(options["queries"], plants_count))
+
+    if "cluster" in options["engines"]:
+        result["engines"]["cluster"] = {
+            "buildSeconds": 0.0,
+            **benchmark_queries(
+                lambda row: model.cluster_members(model.features[row:row + 1], k, row),
+                lambda rows: model.cluster_members_batch(model.features[rows], k, rows),
+                query_rows, options["batchSize"])
+        }
+        result["peakRssMb"]["cluster"] = peak_rss_mb()
+
+    if "knn" in options["engines"]:
+        _, build_seconds = timed(lambda: model.neighbour_index)
+        result["engines"]["knn"] = {
+            "buildSeconds": build_seconds,
+            **benchmark_queries(
+                lambda row: model.nearest(model.features[row:row + 1], k, row),
+                lambda rows: model.nearest_batch(model.features[rows], k, rows),
+                query_rows, options["batchSize"])
+        }
+        result["peakRssMb"]["knn"] = peak_rss_mb()
+
+    if "precomputed" in options["engines"]:
+        if plants_count > options["maxPrecomputed"]:
+            # the all-pairs materialization is quadratic, see --max-precomputed
+            result["engines"]["precomputed"] = {"skipped": True}
+        else:
+            def materialize():
+                neighbours = np.empty((plants_count, k), dtype=np.int64)
+                for start, rows, _ in compute_neighbours(model.features, k, options["workers"]):
+                    neighbours[start:start + len(rows)] = rows
+                return neighbours
+
+            neighbours, build_seconds = timed(materialize)
+            # an in-memory lookup, the DynamoDB get_item round trip is not part of it
+            plant_ids = model.plantIds
+            result["engines"]["precomputed"] = {
+                "buildSeconds": build_seconds,
+                **benchmark_queries(
+                    lambda row: plant_ids[neighbours[row]].tolist(),
+                    lambda rows: plant_ids[neighbours[rows]].tolist(),
+                    query_rows, options["batchSize"])
+            }
+            result["peakRssMb"]["precomputed"] = peak_rss_mb()
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the plant recommender engines.")
+    parser.add_argument(
+        "--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="comma separated catalog sizes")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--clusters", type=int, default=8)
+    parser.add_argument("--k", type=int, default=10, help="recommendations per query")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--max-precomputed", type=int, default=200000,
+                        help="largest catalog for the quadratic precomputed engine")
+    parser.add_argument("--workers", type=int, help="threads of the precomputed engine")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="recommender_benchmark.json")
+    args = parser.parse_args()
+
+    options = {
+        "engines": [engine for engine in args.engines.split(",") if engine in ENGINES],
+        "clusters": args.clusters,
+        "k": args.k,
+        "queries": args.queries,
+        "batchSize": args.batch_size,
+        "maxPrecomputed": args.max_precomputed,
+        "workers": args.workers,
+        "seed": args.seed
+    }
+    report = {
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "machine": platform.machine(),
+            "cpuCount": os.cpu_count()
+        },
+        "options": options,
+        "results": []
+    }
+
+    for size in (int(size) for size in args.sizes.split(",")):
+        print(f"Benchmarking {size} plants...")
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(benchmark_size, size, options).result()
+        report["results"].append(result)
+        print(json.dumps(result, indent=2))
+
+        # written after every size, so a long run keeps its completed sizes
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
-import random
+import argparse
+import csv
 import json
+import os
+
+import numpy as np
 
 # Extracted plant names from the provided list
 plant_names = [
@@ -152,36 +156,179 @@ plant_names = [
     "Yellow coneflower", "Yam", "Yunnan camellia", "Zebrawood", "Zedoary"
 ]
 
-def generate_entry(plant_id, plant_name):
-    soil_types = ["Sandy", "Clay", "Silt", "Peat", "Chalk", "Loam"]
-    fertilizer_types = ["Organic", "Inorganic", "Compost", "Manure", "Liquid"]
-    countries = ["USA", "Canada", "Germany", "Australia", "India", "Brazil", "Japan", "South Africa", "France", "Italy"]
-
-    return {
-        "Plant-ID": plant_id,
-        "Plant-Rating": random.randint(1, 5),
-        "Plant-Name": plant_name,
-        "Soil-Type": random.choice(soil_types),
-        "Sunlight-Hours": random.randint(1, 12),
-        "Water-Frequency": random.choice(["Daily", "Weekly", "Bi-weekly", "Monthly"]),
-        "Fertilizer-Type": random.choice(fertilizer_types),
-        "Temperature": random.uniform(15.0, 35.0),  # Temperature in Celsius
-        "Humidity": random.uniform(30.0, 80.0),     # Humidity in percentage
-        "Location": f"{random.choice(countries)}",
-        "Age": random.randint(1, 100)  # Age in weeks
+SOIL_TYPES = ["Sandy", "Clay", "Silt", "Peat", "Chalk", "Loam"]
+FERTILIZER_TYPES = ["Organic", "Inorganic", "Compost", "Manure", "Liquid"]
+COUNTRIES = [
+    "USA", "Canada", "Germany", "Australia", "India", "Brazil", "Japan", "South Africa", "France",
+    "Italy"
+]
+WATER_FREQUENCIES = ["Daily", "Weekly", "Bi-weekly", "Monthly"]
+RATING_RANGE = (1, 5)
+SUNLIGHT_HOURS_RANGE = (1, 12)
+TEMPERATURE_RANGE = (15.0, 35.0)  # Temperature in Celsius
+HUMIDITY_RANGE = (30.0, 80.0)     # Humidity in percentage
+AGE_RANGE = (1, 100)              # Age in weeks
+
+# Appended to the base names once every name of the list was used, e.g. "Alder Dwarf 2"
+NAME_SUFFIXES = ["Dwarf", "Giant", "Variegated", "Compact", "Wild", "Golden", "Alpine", "Hybrid"]
+
+CATEGORICAL_VALUES = {
+    "soilType": SOIL_TYPES,
+    "waterFrequency": WATER_FREQUENCIES,
+    "fertilizerType": FERTILIZER_TYPES,
+    "location": COUNTRIES
+}
+
+# PlantDataModel field -> key of the generated files, as in plant_data.json
+OUTPUT_KEYS = {
+    "plantID": "Plant-ID",
+    "plantRating": "Plant-Rating",
+    "plantName": "Plant-Name",
+    "soilType": "Soil-Type",
+    "sunlightHours": "Sunlight-Hours",
+    "waterFrequency": "Water-Frequency",
+    "fertilizerType": "Fertilizer-Type",
+    "temperature": "Temperature",
+    "humidity": "Humidity",
+    "location": "Location",
+    "age": "Age"
+}
+
+OUTPUT_FORMATS = ("jsonl", "csv", "npy")
+
+
+def synthesize_names(plant_ids: np.ndarray) -> np.ndarray:
+    """The base names for the first len(plant_names) IDs, then the base names followed by a
+    suffix and, past the suffixes, a number."""
+    base_names = np.array(plant_names)
+    rounds, positions = np.divmod(plant_ids - 1, len(base_names))
+    names = base_names[positions]
+
+    suffixed = rounds > 0
+    if suffixed.any():
+        suffix_rounds, suffix_positions = np.divmod(rounds[suffixed] - 1, len(NAME_SUFFIXES))
+        suffixes = np.char.add(" ", np.array(NAME_SUFFIXES)[suffix_positions])
+        numbers = np.where(
+            suffix_rounds > 0, np.char.mod(" %d", suffix_rounds + 1), "").astype(str)
+        names = names.astype(object)
+        names[suffixed] = np.char.add(np.char.add(names[suffixed].astype(str), suffixes), numbers)
+    return names.astype(object)
+
+
+def generate_codes(rows_count, rng: np.random.Generator, first_id=1):
+    """One array per PlantDataModel field, drawn from the seeded `rng`. The categorical
+    fields are returned as int8 codes into CATEGORICAL_VALUES."""
+    def integers(bounds):
+        return rng.integers(bounds[0], bounds[1] + 1, rows_count)
+
+    plant_ids = np.arange(first_id, first_id + rows_count, dtype=np.int64)
+    columns = {
+        "plantID": plant_ids,
+        "plantRating": integers(RATING_RANGE),
+        "plantName": synthesize_names(plant_ids),
+        "sunlightHours": integers(SUNLIGHT_HOURS_RANGE),
+        "temperature": rng.uniform(*TEMPERATURE_RANGE, rows_count),
+        "humidity": rng.uniform(*HUMIDITY_RANGE, rows_count),
+        "age": integers(AGE_RANGE)
     }
+    for field, values in CATEGORICAL_VALUES.items():
+        columns[field] = rng.integers(0, len(values), rows_count, dtype=np.int8)
+    return {field: columns[field] for field in OUTPUT_KEYS}
+
+
+def generate_columns(rows_count, rng: np.random.Generator, first_id=1):
+    """Vectorized plant generator: one array per PlantDataModel field, drawn from the seeded
+    `rng`, the categorical values being uniform over the lists above."""
+    columns = generate_codes(rows_count, rng, first_id)
+    for field, values in CATEGORICAL_VALUES.items():
+        columns[field] = np.array(values, dtype=object)[columns[field]]
+    return columns
+
+
+def generate_chunks(rows_count, chunk_size, seed=0, first_id=1):
+    """Yields the catalog as column chunks of at most `chunk_size` rows, see `generate_codes`.
+    The output depends on the seed and on the chunk size."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows_count, chunk_size):
+        yield generate_codes(min(chunk_size, rows_count - start), rng, first_id + start)
+
+
+def write_jsonl(chunks, filename):
+    # the few categorical values and base names are escaped once, not once per row
+    encoded = {field: [json.dumps(value) for value in values]
+               for field, values in CATEGORICAL_VALUES.items()}
+    keys = {field: json.dumps(key) for field, key in OUTPUT_KEYS.items()}
+    with open(filename, "w") as f:
+        for chunk in chunks:
+            values = {
+                field: (np.array(encoded[field], dtype=object)[column] if field in encoded
+                        else column.tolist())
+                for field, column in chunk.items()
+            }
+            values["plantName"] = [json.dumps(name) for name in values["plantName"]]
+            f.writelines(
+                "{" + ", ".join(f"{keys[field]}: {value}" for field, value in zip(keys, row))
+                + "}\n"
+                for row in zip(*(values[field] for field in keys)))
+
+
+def write_csv(chunks, filename):
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(OUTPUT_KEYS.values())
+        for chunk in chunks:
+            columns = [
+                np.array(CATEGORICAL_VALUES[field], dtype=object)[column]
+                if field in CATEGORICAL_VALUES else column
+                for field, column in chunk.items()
+            ]
+            writer.writerows(zip(*columns))
+
+
+def write_npy(chunks, directory, rows_count):
+    """Columnar output: one .npy file per field, filled chunk by chunk through memory maps,
+    and a meta.json with the row count and the categories of the int8 coded fields."""
+    os.makedirs(directory, exist_ok=True)
+    name_width = max(len(name) for name in plant_names) + max(len(s) for s in NAME_SUFFIXES) + 12
+    files = {}
+    start = 0
+    for chunk in chunks:
+        for field, column in chunk.items():
+            if field not in files:
+                dtype = f"<U{name_width}" if field == "plantName" else column.dtype
+                files[field] = np.lib.format.open_memmap(
+                    os.path.join(directory, f"{field}.npy"), mode="w+", dtype=dtype,
+                    shape=(rows_count,))
+            files[field][start:start + len(column)] = column
+        start += len(chunk["plantID"])
+    for column in files.values():
+        column.flush()
+
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({"rows": rows_count, "categories": CATEGORICAL_VALUES}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a synthetic plant catalog.")
+    parser.add_argument("--rows", type=int, default=len(plant_names))
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="jsonl")
+    parser.add_argument("--output", default="dynamodb_data.json",
+                        help="file, or directory for the npy format")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--first-id", type=int, default=1)
+    args = parser.parse_args()
 
-def generate_data(plant_names):
-    data = [generate_entry(i, plant_names[i - 1]) for i in range(1, len(plant_names) + 1)]
-    return data
+    chunks = generate_chunks(args.rows, args.chunk_size, args.seed, args.first_id)
+    if args.format == "jsonl":
+        write_jsonl(chunks, args.output)
+    elif args.format == "csv":
+        write_csv(chunks, args.output)
+    else:
+        write_npy(chunks, args.output, args.rows)
 
-def save_to_file(data, filename):
-    with open(filename, 'w') as f:
-        for entry in data:
-            f.write(json.dumps(entry) + "\n")
+    print(f"Generated {args.rows} plants into {args.output}")
 
-# Generate entries for the provided plant names
-data = generate_data(plant_names)
-save_to_file(data, 'dynamodb_data.json')
 
-print("Data file generated successfully.")
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,45 @@
 from __future__ import annotations
 from dataclasses import dataclass
+from typing import List, Optional
 import boto3
 import os
-from services.flower_shop.utils import generate_signed_url
 from bootcamp_lib.lambda_middleware import (
     http_request, HttpRequestData, BadRequestException, NotFoundException
 )
 from bootcamp_lib.logger import Logger
-from services.flower_shop.table_plant_data import (
-    PlantDataTable, PlantDataModel
-)
+from bootcamp_lib.s3 import CavendishS3
+from services.flower_shop.table_plant_data import PlantDataTable
+from services.flower_shop.utils import plant_image_key
+
+MAX_DELETE_PLANTS = 1000
 
 dynamodb_res = boto3.resource("dynamodb")
 s3_client = boto3.client("s3")
+s3_res = boto3.resource("s3")
+
+
+@dataclass
+class PlantDeleteResult:
+    plantID: int
+    deleted: bool
+    imageDeleted: bool = False
+    error: Optional[str] = None
+
 
 @dataclass
-class PlantResponse:
-    plant: PlantDataModel
-    signedPhotoUrl: str
-        
-def delete_plant(idPlant: str):
-    
+class PlantsDeleteResponse:
+    results: List[PlantDeleteResult]
+
+
+def delete_plant(plant_id: int):
     table = PlantDataTable(dynamodb_res)
-    plant = table.delete_item({"idPlant": idPlant}, return_values="ALL_OLD")
-    
+    plant = table.delete_item({"plantID": plant_id}, return_values="ALL_OLD")
+
     if not plant.get("Attributes"):
-        raise NotFoundException(f"Plant not found for ID {idPlant}")
-    
-# Delete the image from S3
-    image_url = plant["Attributes"]["namePlant"]
-    s3_key = f"FlowerShop/PlantImages/{image_url.replace(' ', '')}.png"
+        raise NotFoundException(f"Plant not found for ID {plant_id}")
+
+    # Delete the image from S3
+    s3_key = plant_image_key(plant["Attributes"]["plantName"])
     try:
         s3_client.delete_object(Bucket=os.environ["BOOTCAMP_BUCKET"], Key=s3_key)
         Logger().info(f"Deleted image from S3: {s3_key}")
@@ -37,15 +47,72 @@ def delete_plant(idPlant: str):
         Logger().error(f"Error deleting image from S3: {e}")
         raise
 
+
+def delete_plants(plant_ids: List[int]) -> List[PlantDeleteResult]:
+    """Deletes the plants and their images, with one result per distinct ID, in order.
+
+    The existing plants are read in batches of 100 keys, deleted in batches of 25, then their
+    images are removed with multi-object deletes of up to 1000 keys. A plant whose image could
+    not be deleted is still deleted, its result carrying the S3 error.
+    """
+    plant_ids = list(dict.fromkeys(plant_ids))
+    table = PlantDataTable(dynamodb_res)
+    plants = table.get_items(
+        [{"plantID": plant_id} for plant_id in plant_ids], as_dict=True,
+        projection="plantID, plantName")
+    names = {int(plant["plantID"]): plant.get("plantName", "") for plant in plants}
+
+    table.delete_items([{"plantID": plant_id} for plant_id in plant_ids if plant_id in names])
+    image_keys = {plant_id: plant_image_key(name) for plant_id, name in names.items()}
+    errors = CavendishS3(os.environ["BOOTCAMP_BUCKET"], s3_res).delete_files(
+        list(image_keys.values()))
+
+    results = []
+    for plant_id in plant_ids:
+        if plant_id not in names:
+            results.append(PlantDeleteResult(
+                plantID=plant_id, deleted=False, error=f"Plant not found for ID {plant_id}"))
+        else:
+            error = errors.get(image_keys[plant_id])
+            results.append(PlantDeleteResult(
+                plantID=plant_id, deleted=True, imageDeleted=error is None, error=error))
+    Logger().info(
+        "Deleted %d of %d plants, %d images could not be deleted",
+        len(names), len(plant_ids), len(errors))
+    return results
+
+
+def parse_delete_plant_ids(value: list) -> List[int]:
+    if not value:
+        raise BadRequestException("At least one plant ID is required.")
+    if len(value) > MAX_DELETE_PLANTS:
+        raise BadRequestException(f"At most {MAX_DELETE_PLANTS} plant IDs can be deleted.")
+    try:
+        return [int(plant_id) for plant_id in value]
+    except (TypeError, ValueError):
+        raise BadRequestException("Every plant ID must be numeric.")
+
+
 @http_request()
 def delete_plant_handler(event: HttpRequestData, context):
     try:
-        idPlant = str(event.pathParams.get("id", "").strip())
-    except Exception as e:
+        plant_id = int(event.pathParams.get("id", "").strip())
+    except (TypeError, ValueError) as e:
         Logger().error("Error found trying to get the plant ID: " + str(e))
-        raise BadRequestException("Error found trying to get the plant ID: " + str(e))
+        raise BadRequestException("Parameter 'id' must be a plant ID.")
+
+    return delete_plant(plant_id)
+
 
-    if not idPlant:
-        raise BadRequestException(f"Invalid Plant ID {idPlant}")
+@http_request(
+    request_type="POST",
+    validation={
+        "plantIds": {"required": True, "items": {}}
+    })
+def delete_plants_handler(request: HttpRequestData, _):
+    """Deletes the plants of the body {"plantIds": [...]} and their images.
 
-    return delete_plant(idPlant)
+    Plants that do not exist are returned with "deleted": false instead of failing the batch.
+    """
+    return PlantsDeleteResponse(
+        results=delete_plants(parse_delete_plant_ids(request.dictBody.get("plantIds"))))
@@ -1,53 +1,103 @@
-from logging import Logger
 from dataclasses import dataclass
-from typing import List
+from decimal import Decimal
 import os
+from typing import List, Optional
+
 import boto3
+
 from bootcamp_lib.lambda_middleware import (
-    HttpRequestData, http_request, lambda_logger
-)
-from services.flower_shop.utils import generate_signed_url
-from services.flower_shop.table_plant_data import (
-    PlantDataTable, PlantDataModel
+    BadRequestException, HttpRequestData, http_request, lambda_logger
 )
+from bootcamp_lib.logger import Logger
+from bootcamp_lib.pagination import InvalidCursorError, decode_cursor
+from services.flower_shop.plant_catalog import CachedPlantCatalog
+from services.flower_shop.utils import generate_signed_url, plant_image_key
+from services.flower_shop.table_plant_data import PlantDataModel
 
 dynamodb_res = boto3.resource("dynamodb")
 
-plant_table = PlantDataTable(dynamodb_res)
+# the whole catalog is kept in memory by warm containers when PLANT_CATALOG_SNAPSHOT is set
+plant_catalog = CachedPlantCatalog(dynamodb_res)
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
 
 @dataclass
 class PlantResponse:
     plant: PlantDataModel
     signedPhotoUrl: str
 
+
 @dataclass
 class PlantsResponse:
-    items: list[PlantResponse]
+    items: List[PlantResponse]
+    nextCursor: Optional[str] = None
+
 
-def generate_response_with_photos(items: List[PlantDataModel]):
+def generate_response_with_photos(items: List[PlantDataModel]) -> List[PlantResponse]:
     results = []
 
     for item in items:
-        s3_key = (
-            "FlowerShop/PlantImages/"
-            f"{item.namePlant.replace(' ', '')}.png"
-        )
-        signed_url = generate_signed_url(os.environ["BOOTCAMP_BUCKET"], s3_key)
+        signed_url = generate_signed_url(
+            os.environ["BOOTCAMP_BUCKET"], plant_image_key(item.plantName))
         results.append(
             PlantResponse(plant=item, signedPhotoUrl=signed_url)
         )
-    
+
     return results
 
-def get_plants() -> List[PlantDataModel]:
+
+def _is_plant_id(value) -> bool:
+    return isinstance(value, Decimal) and value.is_finite() and value == value.to_integral_value()
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[dict]:
+    try:
+        key = decode_cursor(cursor, key_names={"plantID"})
+        # without a PAGINATION_CURSOR_SECRET the key can be forged, e.g. with a string plantID
+        if key is not None and not _is_plant_id(key["plantID"]):
+            raise InvalidCursorError("Invalid cursor plantID")
+        return key
+    except InvalidCursorError as e:
+        Logger().warning(f"Invalid plants cursor: {e}")
+        raise BadRequestException("Parameter 'cursor' is not valid.")
+
+
+def parse_page_limit(value) -> int:
+    if value in (None, ""):
+        return DEFAULT_PAGE_LIMIT
     try:
-        plants = PlantDataTable(dynamodb_res).scan(size=100)
-        return generate_response_with_photos(plants)
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise BadRequestException("Parameter 'limit' must be an integer.")
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise BadRequestException(f"Parameter 'limit' must be between 1 and {MAX_PAGE_LIMIT}.")
+    return limit
+
+
+def get_plants(limit: int = DEFAULT_PAGE_LIMIT, cursor: str = None) -> PlantsResponse:
+    """One page of at most `limit` plants after `cursor`, read from the catalog snapshot or
+    with a single Scan call. The response cursor is None once the whole table was read."""
+    try:
+        page = plant_catalog.scan_page(limit, parse_cursor(cursor))
+    except BadRequestException:
+        raise
     except Exception as e:
         Logger().warning(f"Error fetching plants: {e}")
         raise
+    return PlantsResponse(
+        items=generate_response_with_photos(page.items),
+        nextCursor=page.nextCursor
+    )
+
 
 @http_request()
 @lambda_logger(log_input=True)
 def get_plant_data_handler(request: HttpRequestData, _):
-    return get_plants()
+    """Query parameters:
+    - limit: plants per page, 1 to MAX_PAGE_LIMIT
+    - cursor: the nextCursor of the previous page
+    """
+    params = request.queryParams or {}
+    return get_plants(parse_page_limit(params.get("limit")), params.get("cursor"))
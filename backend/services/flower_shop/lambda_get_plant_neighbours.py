@@ -0,0 +1,30 @@
+import boto3
+from bootcamp_lib.lambda_middleware import (
+    http_request, HttpRequestData, BadRequestException, NotFoundException
+)
+from services.flower_shop.table_plant_neighbours import PlantNeighboursTable
+
+# Only the neighbours table is read here: no NumPy or scikit-learn import on the hot path,
+# the neighbours are precomputed by lambda_materialize_plant_neighbours
+dynamodb_res = boto3.resource("dynamodb")
+neighbours_table = PlantNeighboursTable(dynamodb_res)
+
+
+@http_request()
+def get_plant_neighbours_handler(request: HttpRequestData, _):
+    try:
+        plant_id = int(request.pathParams.get("id", "").strip())
+    except ValueError:
+        raise BadRequestException("A numeric plant ID is required.")
+
+    k = request.queryParams.get("k")
+    if k not in (None, "") and not (k.isdigit() and int(k) > 0):
+        raise BadRequestException("Query parameter 'k' must be a positive integer.")
+
+    neighbours = neighbours_table.get_item({"plantID": plant_id})
+    if not neighbours:
+        raise NotFoundException(f"Plant ID {plant_id} not found.")
+
+    if k:
+        neighbours.neighbours = neighbours.neighbours[:int(k)]
+    return neighbours
@@ -0,0 +1,29 @@
+import boto3
+
+from bootcamp_lib.lambda_middleware import lambda_logger
+from services.flower_shop.recommender_model import RecommenderModelStore
+from services.flower_shop.recommender_neighbours import (
+    materialize_neighbours, neighbours_count_from_env
+)
+from services.flower_shop.table_plant_neighbours import PlantNeighboursTable
+
+dynamodb_res = boto3.resource("dynamodb")
+
+
+@lambda_logger(log_input=True, log_response=True)
+def materialize_plant_neighbours_handler(event, _):
+    """Precomputes the top-N neighbours of every plant from the latest recommender model.
+
+    Scheduled after the training, or invoked on demand with {"nNeighbours": N, "version": v}.
+    """
+    event = event or {}
+    model = RecommenderModelStore().load(event.get("version"))
+    n_neighbours = int(event.get("nNeighbours") or neighbours_count_from_env())
+    plants_count = materialize_neighbours(
+        model, PlantNeighboursTable(dynamodb_res), n_neighbours=n_neighbours)
+
+    return {
+        "version": model.version,
+        "plantsCount": plants_count,
+        "nNeighbours": n_neighbours
+    }
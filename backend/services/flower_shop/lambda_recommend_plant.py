@@ -1,105 +1,214 @@
 from __future__ import annotations
+# imported first, the cold start timer counts the init from here
+from bootcamp_lib.cold_start import ColdStartTimer
 from dataclasses import dataclass
-import boto3
-import json
+from typing import List, Optional, Tuple
+# numpy stays imported at init (about 60ms): the model, the filters, the ranking and the catalog
+# snapshot are arrays, so every request past the validation needs it, and the init phase runs
+# before the first request instead of delaying it
 import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
-from services.flower_shop.utils import generate_signed_url
 from bootcamp_lib.lambda_middleware import (
     http_request, HttpRequestData, BadRequestException, NotFoundException
 )
-from bootcamp_lib.logger import Logger
-from services.flower_shop.table_plant_data import (
-    PlantDataTable, PlantDataModel
+from services.flower_shop.plant_catalog import CachedPlantCatalog
+from services.flower_shop.recommender_filters import PlantFilters
+from services.flower_shop.recommender_model import (
+    CachedRecommenderModel, PlantRecommenderModel
 )
+from services.flower_shop.recommender_ranking import RankingWeights, rank_hybrid
+from services.flower_shop.table_plant_data import PlantDataModel
 
-# Initialize DynamoDB resource
-dynamodb_res = boto3.resource("dynamodb")
-plant_table = PlantDataTable(dynamodb_res)
+DEFAULT_RECOMMENDATIONS = 10
+MAX_RECOMMENDATIONS = 100
+RECOMMENDATION_MODES = ("similar", "cluster")
 
-# Logger setup
-logger = Logger()
+init_timer = ColdStartTimer("recommend-plant")
 
-def lambda_handler(event, context):
-    try:
-        # Parse input plant ID from the event
-        plant_id = event.get('plant_id')
-        if not plant_id:
-            raise BadRequestException("Input plant ID is required.")
-
-        # Fetch data from DynamoDB
-        plant_data = fetch_plant_data()
-        
-        # Preprocess data for K-Means
-        data_matrix, plant_ids = preprocess_data(plant_data)
-        
-        # Apply K-Means clustering
-        kmeans_result = apply_kmeans(data_matrix)
-        
-        # Find the cluster for the input plant ID
-        recommended_plants = recommend_plants(plant_id, kmeans_result, plant_data, plant_ids)
-        
-        # Return the result
-        return {
-            'statusCode': 200,
-            'body': json.dumps(recommended_plants)
-        }
-    except Exception as e:
-        logger.error(f"Error in lambda_handler: {str(e)}")
-        return {
-            'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
+# The catalog table, its DynamoDB resource and the model are created on first use, so the
+# init and the invocations rejected by the validation do not pay for them.
+# The whole catalog is kept in memory by warm containers when PLANT_CATALOG_SNAPSHOT is set
+plant_catalog = CachedPlantCatalog()
+
+# The model is trained offline by lambda_train_recommender and loaded once per container
+recommender_model = CachedRecommenderModel()
+
+
+@dataclass
+class PlantRecommendation:
+    plant: PlantDataModel
+    distance: float
+    # hybrid ranking score, None when ranked by distance only
+    score: Optional[float] = None
+
+
+@dataclass
+class PlantRecommendations:
+    plantID: int
+    found: bool
+    recommendations: List[PlantRecommendation]
+
+
+def query_vectors(
+        plant_ids: List[int], model: PlantRecommenderModel
+) -> Tuple[List[int], np.ndarray, List[Optional[int]]]:
+    """Encodes the queried plants as a single feature matrix.
+
+    Plants added after the last training are fetched in one batch and encoded on the fly with
+    the feature builder stored in the model. Returns the IDs that were found, their vectors and
+    their model rows (None for the plants unknown to the model).
+    """
+    rows = {plant_id: model.row_of(plant_id) for plant_id in plant_ids}
+    unknown_ids = [plant_id for plant_id, row in rows.items() if row is None]
+    new_plants = {}
+    if unknown_ids:
+        new_plants = {
+            plant.plantID: plant
+            for plant in plant_catalog.get_items(unknown_ids)
         }
 
-def fetch_plant_data():
-    # Scan the DynamoDB table
-    response = plant_table.scan()
-    items = response['Items']
-    return items
-
-def preprocess_data(items):
-    # Extract relevant features for clustering and keep track of plant IDs
-    features = []
-    plant_ids = []
-    for item in items:
-        features.append([
-            float(item['Sunlight-Hours']),
-            float(item['Water-Frequency']),
-            float(item['Temperature']),
-            float(item['Humidity'])
-        ])
-        plant_ids.append(item['Plant-ID'])
-    return np.array(features), plant_ids
-
-def apply_kmeans(data_matrix, n_clusters=3):
-    # Apply K-Means algorithm
-    kmeans = KMeans(n_clusters=n_clusters, random_state=0)
-    kmeans.fit(data_matrix)
-    
-    # Calculate silhouette score
-    silhouette_avg = silhouette_score(data_matrix, kmeans.labels_)
-    
-    return {
-        'centroids': kmeans.cluster_centers_,
-        'labels': kmeans.labels_,
-        'silhouette_score': silhouette_avg
+    found_ids = [
+        plant_id for plant_id in plant_ids if rows[plant_id] is not None or plant_id in new_plants
+    ]
+    vectors = np.empty((len(found_ids), model.features.shape[1]), dtype=model.features.dtype)
+    known = [index for index, plant_id in enumerate(found_ids) if rows[plant_id] is not None]
+    vectors[known] = model.features_of([rows[found_ids[index]] for index in known])
+    added = [index for index, plant_id in enumerate(found_ids) if rows[plant_id] is None]
+    if added:
+        vectors[added] = model.feature_builder.transform_plants(
+            [new_plants[found_ids[index]] for index in added])
+    return found_ids, vectors, [rows[plant_id] for plant_id in found_ids]
+
+
+def recommend_plants_batch(
+        plant_ids: List[int], model: PlantRecommenderModel, k: int = DEFAULT_RECOMMENDATIONS,
+        mode: str = "similar", filters: PlantFilters = None, weights: RankingWeights = None
+) -> List[PlantRecommendations]:
+    """Returns the `k` recommended plants of every ID in `plant_ids`, closest first.
+
+    The "similar" mode queries the KD-tree built over the plant features, while the "cluster"
+    mode ranks the plants from the same K-Means cluster. Both search the neighbours of the
+    whole batch at once, and the recommended plants are read with a single `get_items` (from
+    the catalog snapshot when it is enabled).
+    With `filters`, the candidates are restricted with the model attribute bitmaps before the
+    ranking.
+    With hybrid `weights`, a larger pool of nearest plants is re-ranked by the weighted sum of
+    similarity, rating and age, best score first.
+    """
+    plant_ids = list(dict.fromkeys(plant_ids))
+    mask = None
+    if filters:
+        try:
+            mask = model.attribute_index.mask(filters)
+        except ValueError as ex:
+            raise BadRequestException(str(ex))
+    found_ids, vectors, rows = query_vectors(plant_ids, model)
+
+    hybrid = weights is not None and weights.hybrid
+    candidates_count = weights.candidates_count(k) if hybrid else k
+    neighbours = {}
+    if found_ids:
+        if mode == "cluster":
+            batch_neighbours = model.cluster_members_batch(
+                vectors, candidates_count, exclude_rows=rows, mask=mask)
+        else:
+            batch_neighbours = model.nearest_batch(
+                vectors, candidates_count, exclude_rows=rows, mask=mask)
+        if hybrid:
+            batch_neighbours = rank_hybrid(model, batch_neighbours, k, weights)
+        neighbours = dict(zip(found_ids, batch_neighbours))
+
+    neighbour_ids = {
+        neighbour[0] for plant_neighbours in neighbours.values() for neighbour in plant_neighbours
     }
+    plants = {}
+    if neighbour_ids:
+        plants = {
+            plant.plantID: plant
+            for plant in plant_catalog.get_items(list(neighbour_ids))
+        }
+
+    # keep the model order, skipping plants deleted since the last training
+    return [
+        PlantRecommendations(
+            plantID=plant_id,
+            found=plant_id in neighbours,
+            recommendations=[
+                PlantRecommendation(
+                    plant=plants[neighbour[0]], distance=neighbour[1],
+                    score=round(neighbour[2], 6) if hybrid else None)
+                for neighbour in neighbours.get(plant_id, [])
+                if neighbour[0] in plants
+            ]
+        )
+        for plant_id in plant_ids
+    ]
 
-def recommend_plants(plant_id, kmeans_result, plant_data, plant_ids):
-    # Find the index of the input plant ID
+
+def recommend_plants(
+        plant_id: int, model: PlantRecommenderModel, k: int = DEFAULT_RECOMMENDATIONS,
+        mode: str = "similar", filters: PlantFilters = None, weights: RankingWeights = None
+) -> List[PlantRecommendation]:
+    """Returns the `k` recommended plants for `plant_id`, closest first."""
+    result = recommend_plants_batch(
+        [plant_id], model, k=k, mode=mode, filters=filters, weights=weights)[0]
+    if not result.found:
+        raise NotFoundException(f"Plant ID {plant_id} not found.")
+    return result.recommendations
+
+
+def parse_recommendations_count(value) -> int:
+    if value in (None, ""):
+        return DEFAULT_RECOMMENDATIONS
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        raise BadRequestException("Parameter 'k' must be an integer.")
+    if not 1 <= k <= MAX_RECOMMENDATIONS:
+        raise BadRequestException(
+            f"Parameter 'k' must be between 1 and {MAX_RECOMMENDATIONS}.")
+    return k
+
+
+def parse_recommendation_mode(value) -> str:
+    mode = value or "similar"
+    if mode not in RECOMMENDATION_MODES:
+        raise BadRequestException(
+            f"Parameter 'mode' must be one of {', '.join(RECOMMENDATION_MODES)}.")
+    return mode
+
+
+def parse_recommendation_filters(params: dict) -> PlantFilters:
+    """Filters from the "location", "soilType", "fertilizerType" (comma separated values) and
+    "minRating" parameters."""
+    try:
+        return PlantFilters.from_params(params or {})
+    except (TypeError, ValueError):
+        raise BadRequestException("Parameter 'minRating' must be an integer.")
+
+
+def parse_ranking_weights(params: dict) -> RankingWeights:
+    """Weights from the "distanceWeight", "ratingWeight" and "ageWeight" parameters."""
     try:
-        plant_index = plant_ids.index(plant_id)
+        return RankingWeights.from_params(params)
+    except ValueError as ex:
+        raise BadRequestException(str(ex))
+
+
+@init_timer.measure
+@http_request()
+def recommend_plant_handler(request: HttpRequestData, _):
+    try:
+        plant_id = int(request.pathParams.get("id", "").strip())
     except ValueError:
-        raise NotFoundException(f"Plant ID {plant_id} not found.")
-    
-    # Get the cluster label for the input plant
-    input_label = kmeans_result['labels'][plant_index]
-    
-    # Find plants in the same cluster
-    recommended_plants = []
-    for idx, label in enumerate(kmeans_result['labels']):
-        if label == input_label and plant_ids[idx] != plant_id:
-            recommended_plants.append(plant_data[idx])
-    
-    return recommended_plants
+        raise BadRequestException("A numeric plant ID is required.")
+
+    k = parse_recommendations_count(request.queryParams.get("k"))
+    mode = parse_recommendation_mode(request.queryParams.get("mode"))
+    filters = parse_recommendation_filters(request.queryParams)
+    weights = parse_ranking_weights(request.queryParams)
+
+    return recommend_plants(
+        plant_id, recommender_model.get(), k=k, mode=mode, filters=filters, weights=weights)
+
+
+init_timer.init_done()
@@ -0,0 +1,49 @@
+# imported first, the cold start timer counts the init from here
+from bootcamp_lib.cold_start import ColdStartTimer
+from bootcamp_lib.lambda_middleware import http_request, HttpRequestData, BadRequestException
+from services.flower_shop.lambda_recommend_plant import (
+    parse_ranking_weights, parse_recommendation_filters, parse_recommendation_mode,
+    parse_recommendations_count, recommend_plants_batch, recommender_model
+)
+
+MAX_BATCH_PLANTS = 100
+
+init_timer = ColdStartTimer("recommend-plants-batch")
+
+
+def parse_plant_ids(value: list) -> list:
+    if not value:
+        raise BadRequestException("At least one plant ID is required.")
+    if len(value) > MAX_BATCH_PLANTS:
+        raise BadRequestException(f"At most {MAX_BATCH_PLANTS} plant IDs can be requested.")
+    try:
+        return [int(plant_id) for plant_id in value]
+    except (TypeError, ValueError):
+        raise BadRequestException("Every plant ID must be numeric.")
+
+
+@init_timer.measure
+@http_request(
+    request_type="POST",
+    validation={
+        "plantIds": {"required": True, "items": {}}
+    })
+def recommend_plants_batch_handler(request: HttpRequestData, _):
+    """Returns the top-k recommendations of every plant in the body
+    {"plantIds": [...], "k": 10, "mode": "similar", "filters": {"location": [...], ...},
+     "ratingWeight": 0.5, "ageWeight": 0, "distanceWeight": 1}, in the requested order.
+
+    Plants that do not exist are returned with "found": false instead of failing the batch.
+    """
+    body = request.dictBody
+    plant_ids = parse_plant_ids(body.get("plantIds"))
+    k = parse_recommendations_count(body.get("k"))
+    mode = parse_recommendation_mode(body.get("mode"))
+    filters = parse_recommendation_filters(body.get("filters"))
+    weights = parse_ranking_weights(body)
+
+    return recommend_plants_batch(
+        plant_ids, recommender_model.get(), k=k, mode=mode, filters=filters, weights=weights)
+
+
+init_timer.init_done()
@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+from typing import List
+
+from bootcamp_lib.lambda_middleware import http_request, HttpRequestData, BadRequestException
+from services.flower_shop.plant_catalog import CachedPlantCatalog
+from services.flower_shop.plant_search import PlantNameIndex, PlantSearchMatch, search_plants
+
+DEFAULT_SEARCH_RESULTS = 10
+MAX_SEARCH_RESULTS = 50
+MAX_QUERY_LENGTH = 100
+
+# the name index is built from the catalog snapshot, and rebuilt with it on every refresh.
+# Like the other catalog reads, the snapshot is only kept when PLANT_CATALOG_SNAPSHOT is set
+plant_catalog = CachedPlantCatalog()
+
+
+@dataclass
+class PlantSearchResponse:
+    query: str
+    matches: List[PlantSearchMatch]
+
+
+def parse_search_query(value) -> str:
+    query = (value or "").strip()
+    if not query:
+        raise BadRequestException("Parameter 'q' is required.")
+    if len(query) > MAX_QUERY_LENGTH:
+        raise BadRequestException(
+            f"Parameter 'q' must be at most {MAX_QUERY_LENGTH} characters long.")
+    return query
+
+
+def parse_search_limit(value) -> int:
+    if value in (None, ""):
+        return DEFAULT_SEARCH_RESULTS
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise BadRequestException("Parameter 'limit' must be an integer.")
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        raise BadRequestException(
+            f"Parameter 'limit' must be between 1 and {MAX_SEARCH_RESULTS}.")
+    return limit
+
+
+@http_request()
+def search_plants_handler(request: HttpRequestData, _):
+    """Searches the plants by name, for typeahead and fuzzy matching.
+
+    Query parameters:
+    - q: the searched text, matched case insensitively
+    - limit: number of matches, 1 to MAX_SEARCH_RESULTS
+    - fuzzy: "false" to return the exact and prefix matches only
+
+    The matches are ranked exact name, name prefix, word prefix, then trigram similarity, with
+    a score in [0, 1] (the matched fraction of the name, or the trigram Jaccard similarity).
+    """
+    query = parse_search_query(request.queryParams.get("q"))
+    limit = parse_search_limit(request.queryParams.get("limit"))
+    fuzzy = request.queryParams.get("fuzzy", "true").lower() not in ("0", "false", "no")
+
+    snapshot = plant_catalog.snapshot()
+    index = plant_catalog.derived("nameIndex", PlantNameIndex.from_snapshot, snapshot)
+    return PlantSearchResponse(
+        query=query, matches=search_plants(snapshot, index, query, limit, fuzzy))
@@ -0,0 +1,43 @@
+import boto3
+
+from bootcamp_lib.lambda_middleware import lambda_logger
+from services.flower_shop.recommender_model import RecommenderModelStore
+from services.flower_shop.recommender_training import (
+    TRAINING_MODES, fetch_training_plants, train_model, train_model_streaming,
+    training_mode_from_env
+)
+from services.flower_shop.table_plant_data import PlantDataTable
+
+dynamodb_res = boto3.resource("dynamodb")
+
+
+def train_recommender(n_clusters: int = None, mode: str = "batch") -> dict:
+    plant_table = PlantDataTable(dynamodb_res)
+    if mode == "streaming":
+        model = train_model_streaming(plant_table, n_clusters=n_clusters)
+    else:
+        model = train_model(fetch_training_plants(plant_table), n_clusters=n_clusters)
+    RecommenderModelStore().save(model)
+
+    return {
+        "version": model.version,
+        "plantsCount": len(model.plantIds),
+        "silhouetteScore": model.silhouetteScore,
+        "metadata": model.metadata
+    }
+
+
+@lambda_logger(log_input=True, log_response=True)
+def train_recommender_handler(event, _):
+    """Refreshes the recommender model. Triggered by a schedule or invoked on demand.
+
+    The cluster count is selected automatically unless the event forces one with "nClusters".
+    The event "mode" (defaults to RECOMMENDER_TRAINING_MODE) switches between loading the whole
+    table ("batch") and the bounded memory MiniBatchKMeans over the table pages ("streaming").
+    """
+    event = event or {}
+    n_clusters = event.get("nClusters")
+    mode = event.get("mode") or training_mode_from_env()
+    if mode not in TRAINING_MODES:
+        raise ValueError(f"Unknown training mode {mode}")
+    return train_recommender(int(n_clusters) if n_clusters else None, mode)
@@ -0,0 +1,94 @@
+import json
+import os
+
+import boto3
+
+from bootcamp_lib.lambda_middleware import lambda_logger
+from bootcamp_lib.logger import Logger
+from services.flower_shop.recommender_model import CachedRecommenderModel, ModelVersionConflict
+from services.flower_shop.recommender_neighbours import refresh_neighbours
+from services.flower_shop.recommender_updates import (
+    PlantChanges, apply_plant_changes, drift_exceeded, drift_ratios, plant_changes_from_stream
+)
+from services.flower_shop.table_plant_neighbours import PlantNeighboursTable
+
+UPDATE_ATTEMPTS = 3
+
+dynamodb_res = boto3.resource("dynamodb")
+lambda_client = boto3.client("lambda")
+
+# the version this container updated last, only the newer deltas are applied to it
+recommender_model = CachedRecommenderModel(refresh_seconds=0)
+
+
+def request_retrain():
+    lambda_client.invoke(
+        FunctionName=os.environ["RECOMMENDER_TRAIN_FUNCTION"],
+        InvocationType="Event",
+        Payload=json.dumps({}).encode()
+    )
+
+
+def update_recommender(changes: PlantChanges) -> dict:
+    """Applies plant inserts, updates and deletes to the latest recommender model without
+    refitting it, patches the precomputed neighbours and requests a full retrain once the
+    drift passes the DriftConfig thresholds.
+
+    The changes are published as a delta of the latest version. When another version was
+    published meanwhile (e.g. by a training), they are applied again to that version.
+    """
+    for attempt in range(1, UPDATE_ATTEMPTS + 1):
+        model = recommender_model.get()
+        if not changes.upserts and not changes.removedIds:
+            return {"version": model.version, "retrainRequested": False}
+
+        updated, changed_vectors, delta = apply_plant_changes(model, changes)
+        statistics = delta.updates
+        retrain = not statistics["retrainRequested"] and drift_exceeded(updated)
+        # subsequent batches must not request the retrain again while it runs
+        statistics["retrainRequested"] = statistics["retrainRequested"] or retrain
+        try:
+            recommender_model.store.save_delta(delta)
+        except ModelVersionConflict as ex:
+            if attempt == UPDATE_ATTEMPTS:
+                raise
+            Logger().warning("%s, applying the changes to the latest version", ex)
+            continue
+        recommender_model.update(updated)
+        break
+
+    refresh_neighbours(
+        updated, PlantNeighboursTable(dynamodb_res), changed_vectors,
+        list(changes.upserts), changes.removedIds)
+
+    if retrain:
+        Logger().info(
+            "Recommender drift %s over the threshold, requesting a retrain",
+            drift_ratios(statistics))
+        request_retrain()
+
+    return {
+        "version": updated.version,
+        "upserted": len(changes.upserts),
+        "removed": len(changes.removedIds),
+        "drift": drift_ratios(statistics),
+        "retrainRequested": retrain
+    }
+
+
+@lambda_logger(log_input=False, log_response=True)
+def update_recommender_handler(event, _):
+    """Keeps the recommender model in sync with the plant table.
+
+    Triggered by the plant table stream, or invoked explicitly (e.g. after a bulk import)
+    with {"upserts": [plant, ...], "removedIds": [id, ...]}.
+    """
+    event = event or {}
+    if "Records" in event:
+        changes = plant_changes_from_stream(event["Records"])
+    else:
+        changes = PlantChanges(
+            upserts={int(plant["plantID"]): plant for plant in event.get("upserts", [])},
+            removedIds=[int(plant_id) for plant_id in event.get("removedIds", [])]
+        )
+    return update_recommender(changes)
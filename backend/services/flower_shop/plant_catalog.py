@@ -0,0 +1,281 @@
+from itertools import islice
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bootcamp_lib.dynamodb import QueryResult
+from bootcamp_lib.logger import Logger
+from services.flower_shop.table_plant_data import PlantDataModel, PlantDataTable
+
+
+NUMERIC_COLUMNS = {
+    "plantRating": np.int16,
+    "sunlightHours": np.int16,
+    "temperature": np.float64,
+    "humidity": np.float64,
+    "age": np.int32
+}
+CATEGORICAL_COLUMNS = ("soilType", "waterFrequency", "fertilizerType", "location")
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_AGE_SECONDS = 3600
+# plants read from the scan before they are added to the snapshot columns
+SNAPSHOT_PAGE_SIZE = 5000
+
+
+def snapshot_enabled() -> bool:
+    return os.getenv("PLANT_CATALOG_SNAPSHOT", "").lower() in ("1", "true", "yes")
+
+
+def latest_model_version() -> str:
+    """The latest recommender model version. The plant table stream publishes a new one for
+    every batch of changes (a delta of the model), so it changes whenever the catalog does."""
+    # imported on first use, the reads without the snapshot do not need it
+    from services.flower_shop.recommender_model import RecommenderModelStore
+    return RecommenderModelStore().latest_version()
+
+
+class PlantCatalogSnapshot:
+    """The whole plant table as columns sorted by plantID: NumPy arrays for the numbers, int16
+    codes for the categorical fields and an ID -> row dict. The plant models are only built for
+    the rows that are returned."""
+
+    def __init__(
+            self, plant_ids: np.ndarray, columns: Dict[str, np.ndarray],
+            categories: Dict[str, List[str]], loaded_at: float = None, version: str = None):
+        self.plantIds = plant_ids
+        self.columns = columns
+        self.categories = categories
+        self.loadedAt = loaded_at or time.time()
+        # the catalog version the snapshot was loaded at, None when it was unknown
+        self.version = version
+        # structures built from the snapshot (e.g. search indexes), see CachedPlantCatalog.derived
+        self.derived = {}
+        self._rows = dict(zip(plant_ids.tolist(), range(len(plant_ids))))
+
+    @staticmethod
+    def _page_columns(page: List[dict], codes: Dict[str, dict]) -> Dict[str, np.ndarray]:
+        # the columns of a page of scanned plants, the category codes being shared by the pages
+        columns = {
+            "plantID": np.fromiter((plant["plantID"] for plant in page), np.int64, len(page)),
+            "plantName": np.array([plant.get("plantName", "") for plant in page], dtype=object)
+        }
+        for name, dtype in NUMERIC_COLUMNS.items():
+            columns[name] = np.fromiter((plant.get(name) or 0 for plant in page), dtype, len(page))
+        for name in CATEGORICAL_COLUMNS:
+            values = (plant.get(name) for plant in page)
+            columns[name] = np.fromiter(
+                (-1 if value in (None, "") else codes[name].setdefault(value, len(codes[name]))
+                 for value in values), np.int16, len(page))
+        return columns
+
+    @classmethod
+    def load(cls, table: PlantDataTable, version: str = None) -> "PlantCatalogSnapshot":
+        """Scans the plant table, the columns being built page by page so only one page of
+        plant dicts is held at a time."""
+        codes = {name: {} for name in CATEGORICAL_COLUMNS}
+        items = iter(table.scan_generator(as_dict=True))
+        blocks = [
+            cls._page_columns(page, codes)
+            for page in iter(lambda: list(islice(items, SNAPSHOT_PAGE_SIZE)), [])
+        ]
+        # an empty table still has its (empty) columns
+        blocks = blocks or [cls._page_columns([], codes)]
+
+        plant_ids = np.concatenate([block.pop("plantID") for block in blocks])
+        order = np.argsort(plant_ids, kind="stable")
+        columns = {
+            name: np.concatenate([block[name] for block in blocks])[order] for name in blocks[0]
+        }
+        return cls(
+            plant_ids[order], columns, {name: list(codes[name]) for name in codes},
+            version=version)
+
+    def __len__(self):
+        return len(self.plantIds)
+
+    def row_of(self, plant_id: int) -> Optional[int]:
+        return self._rows.get(int(plant_id))
+
+    def plant(self, row: int) -> PlantDataModel:
+        fields = {name: self.columns[name][row].item() for name in NUMERIC_COLUMNS}
+        for name in CATEGORICAL_COLUMNS:
+            code = self.columns[name][row]
+            fields[name] = self.categories[name][code] if code >= 0 else ""
+        return PlantDataModel(
+            plantID=int(self.plantIds[row]), plantName=self.columns["plantName"][row], **fields)
+
+    def get_items(self, plant_ids: Sequence[int]) -> List[PlantDataModel]:
+        """The plants of `plant_ids` which are in the snapshot, in the same order."""
+        rows = (self.row_of(plant_id) for plant_id in plant_ids)
+        return [self.plant(row) for row in rows if row is not None]
+
+    def page(self, limit: int, after_id: int = None) -> Tuple[List[PlantDataModel], Optional[int]]:
+        """At most `limit` plants with an ID greater than `after_id`, and the ID to continue
+        from, None after the last plant. Stable across refreshes, being keyed by plantID."""
+        start = 0 if after_id is None else int(np.searchsorted(self.plantIds, after_id, "right"))
+        stop = min(start + limit, len(self.plantIds))
+        plants = [self.plant(row) for row in range(start, stop)]
+        return plants, (int(self.plantIds[stop - 1]) if stop < len(self.plantIds) else None)
+
+
+class CachedPlantCatalog:
+    """Plant reads served from a PlantCatalogSnapshot kept for the lifetime of a warm container,
+    when the PLANT_CATALOG_SNAPSHOT environment variable is set, else from the plant table.
+
+    The first read loads the snapshot, then a daemon thread checks the catalog version every
+    PLANT_CATALOG_TTL_SECONDS and only rescans the table when it changed (or when the snapshot
+    is older than PLANT_CATALOG_MAX_AGE_SECONDS, e.g. the version is unknown), swapping the new
+    snapshot in, so the invocations never wait for a refresh. The version is read from
+    `version_source`, by default the latest recommender model version.
+    A read more than a TTL after the last check (e.g. the container was frozen) wakes the thread.
+    The structures registered with `derived` are rebuilt by the thread too, before the swap.
+    """
+
+    def __init__(
+            self, dynamodb_resource=None, ttl_seconds: int = None,
+            version_source: Callable[[], str] = None, max_age_seconds: int = None):
+        self._dynamodb_resource = dynamodb_resource
+        self._table = None
+        self._snapshot = None
+        self._ttl_seconds = (
+            ttl_seconds if ttl_seconds is not None
+            else int(os.getenv("PLANT_CATALOG_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        )
+        self._max_age_seconds = (
+            max_age_seconds if max_age_seconds is not None
+            else int(os.getenv("PLANT_CATALOG_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS))
+        )
+        self._version_source = version_source or latest_model_version
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._refresher = None
+        self._builders = {}
+
+    @property
+    def table(self) -> PlantDataTable:
+        if self._table is None:
+            self._table = PlantDataTable(self._dynamodb_resource)
+        return self._table
+
+    def catalog_version(self) -> Optional[str]:
+        """The current catalog version, None when it cannot be read."""
+        self._checked_at = time.time()
+        try:
+            return self._version_source()
+        except Exception as ex:
+            Logger().warning("Could not read the plant catalog version: %s", ex)
+            return None
+
+    def refresh(self, version: str = None) -> PlantCatalogSnapshot:
+        """Loads a new snapshot at `version` (default: the current one) and swaps it in."""
+        started = time.perf_counter()
+        snapshot = PlantCatalogSnapshot.load(self.table, version or self.catalog_version())
+        for name, builder in list(self._builders.items()):
+            snapshot.derived[name] = builder(snapshot)
+        self._snapshot = snapshot
+        Logger().info(
+            "Loaded the plant catalog snapshot %s: %d plants in %.3fs",
+            snapshot.version, len(snapshot), time.perf_counter() - started)
+        return snapshot
+
+    def refresh_if_changed(self) -> bool:
+        """Reloads the snapshot if the catalog version changed since it was loaded, or if it is
+        older than the max age. Returns whether it was reloaded."""
+        version = self.catalog_version()
+        snapshot = self._snapshot
+        if (snapshot is not None and (version is None or version == snapshot.version)
+                and snapshot.loadedAt + self._max_age_seconds > time.time()):
+            return False
+        self.refresh(version)
+        return True
+
+    def _refresh_loop(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self._ttl_seconds)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.refresh_if_changed()
+            except Exception:
+                # the previous snapshot is served until a refresh succeeds
+                Logger().exception("Could not refresh the plant catalog snapshot")
+
+    def snapshot(self) -> PlantCatalogSnapshot:
+        """The kept snapshot. Without PLANT_CATALOG_SNAPSHOT, a snapshot loaded for the call and
+        dropped after it."""
+        if not snapshot_enabled():
+            return PlantCatalogSnapshot.load(self.table)
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self.refresh()
+                    self._refresher = threading.Thread(
+                        target=self._refresh_loop, name="plant-catalog-refresh", daemon=True)
+                    self._refresher.start()
+            return self._snapshot
+
+        if self._checked_at + self._ttl_seconds < time.time():
+            self._wakeup.set()
+        return snapshot
+
+    def derived(
+            self, name: str, builder: Callable[[PlantCatalogSnapshot], Any],
+            snapshot: PlantCatalogSnapshot = None) -> Any:
+        """`builder(snapshot)` for `snapshot` (default: the current one), built on the first
+        call and then by every refresh, so the requests do not wait for it after the first one.
+        """
+        self._builders[name] = builder
+        snapshot = snapshot or self.snapshot()
+        if name not in snapshot.derived:
+            with self._lock:
+                if name not in snapshot.derived:
+                    snapshot.derived[name] = builder(snapshot)
+        return snapshot.derived[name]
+
+    def stop(self):
+        """Stops the refresh thread and drops the snapshot."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._refresher is not None:
+            self._refresher.join()
+        self._refresher = None
+        self._snapshot = None
+        self._stopped.clear()
+        self._wakeup.clear()
+
+    def get_items(self, plant_ids: Sequence[int]) -> List[PlantDataModel]:
+        """The plants of `plant_ids` that exist, in no particular order. The plants added since
+        the snapshot was loaded are read from the table."""
+        if not snapshot_enabled():
+            return self.table.get_items([{"plantID": plant_id} for plant_id in plant_ids])
+
+        snapshot = self.snapshot()
+        plants = snapshot.get_items(plant_ids)
+        missing_ids = [plant_id for plant_id in plant_ids if snapshot.row_of(plant_id) is None]
+        if missing_ids:
+            plants.extend(
+                self.table.get_items([{"plantID": plant_id} for plant_id in missing_ids]))
+        return plants
+
+    def scan_page(self, limit: int, exclusive_start_key: dict = None) -> QueryResult:
+        """One page of plants, see `DynamodbTable.scan_page`. From the snapshot, the pages are
+        in plantID order and the `lastEvaluatedKey` is the last plantID of the page."""
+        if not snapshot_enabled():
+            return self.table.scan_page(limit, exclusive_start_key)
+
+        after_id = int(exclusive_start_key["plantID"]) if exclusive_start_key else None
+        plants, last_id = self.snapshot().page(limit, after_id)
+        return QueryResult(
+            count=len(plants),
+            scanned_count=len(plants),
+            items=plants,
+            last_evaluated_key={"plantID": last_id} if last_id is not None else None
+        )
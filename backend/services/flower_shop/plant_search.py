@@ -0,0 +1,221 @@
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+from services.flower_shop.plant_catalog import PlantCatalogSnapshot
+from services.flower_shop.table_plant_data import PlantDataModel
+
+
+DEFAULT_MIN_SIMILARITY = 0.3
+_PADDING = 0
+_UNKNOWN = 1
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    # np.unique may hash instead of sorting, which is several times slower on these keys
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+
+@dataclass
+class PlantSearchMatch:
+    plant: PlantDataModel
+    score: float
+    matchType: str
+
+
+class PlantNameIndex:
+    """Search index over the plant names of a catalog snapshot.
+
+    - typeahead: the sorted normalized names and the sorted suffixes starting at every word
+      (a flattened prefix trie), a prefix being the range found by two binary searches
+    - fuzzy matching: the trigrams of the names padded with two leading and one trailing space,
+      as CSR posting lists of name indexes, ranked by Jaccard similarity with the query
+
+    Equal names are indexed once and map to all their snapshot rows.
+    """
+
+    def __init__(self, names: np.ndarray, rows: np.ndarray, row_bounds: np.ndarray):
+        """`names` sorted and unique, the snapshot rows of names[i] being
+        rows[row_bounds[i]:row_bounds[i + 1]]."""
+        self._names = names
+        self._rows = rows
+        self._row_bounds = row_bounds
+        self._lengths = np.char.str_len(names) if len(names) else np.empty(0, dtype=np.int64)
+
+        words = []
+        word_names = []
+        for index, name in enumerate(names.tolist()):
+            start = name.find(" ")
+            while start >= 0:
+                words.append(name[start + 1:])
+                word_names.append(index)
+                start = name.find(" ", start + 1)
+        words = np.array(words, dtype=names.dtype)
+        order = np.argsort(words, kind="stable")
+        self._words = words[order]
+        self._word_names = np.array(word_names, dtype=np.int64)[order]
+
+        # dense codes of the catalog characters, 0 being the padding and 1 any other character
+        alphabet = sorted(set("".join(names.tolist())))
+        self._lookup = np.full(
+            max((ord(char) for char in alphabet), default=0) + 1, _UNKNOWN, dtype=np.int64)
+        self._lookup[[ord(char) for char in alphabet]] = np.arange(2, len(alphabet) + 2)
+        self._lookup[0] = _PADDING
+        self._build_trigrams()
+
+    @classmethod
+    def from_snapshot(cls, snapshot: PlantCatalogSnapshot) -> "PlantNameIndex":
+        normalized = np.array(
+            [normalize_name(name) for name in snapshot.columns["plantName"].tolist()], dtype=str)
+        rows = np.argsort(normalized, kind="stable")
+        sorted_names = normalized[rows]
+        starts = np.flatnonzero(
+            np.concatenate(([True], sorted_names[1:] != sorted_names[:-1]))
+            if len(rows) else np.empty(0, dtype=bool))
+        return cls(sorted_names[starts], rows, np.append(starts, len(rows)))
+
+    def _encode(self, names: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """The names padded with two leading and one trailing space, as a matrix of character
+        codes with one row per name, and the names lengths."""
+        lengths = np.char.str_len(names) if len(names) else np.empty(0, dtype=np.int64)
+        width = int(lengths.max(initial=0))
+        codes = np.zeros((len(names), width + 3), dtype=np.int64)
+        if width:
+            chars = names.astype(f"<U{width}").view(np.uint32).reshape(len(names), width)
+            known = chars < len(self._lookup)
+            codes[:, 2:-1] = np.where(
+                known, self._lookup[np.where(known, chars, 0)], _UNKNOWN)
+        return codes, lengths
+
+    def _trigrams(self, names: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(name index, trigram code) pairs of every padded name without duplicates, sorted by
+        trigram code."""
+        codes, lengths = self._encode(names)
+        base = int(self._lookup.max(initial=_UNKNOWN)) + 1
+        trigrams = codes[:, :-2] * base * base + codes[:, 1:-1] * base + codes[:, 2:]
+        # a name of length l has l + 1 trigrams: "  a", " ab", ..., "yz "
+        valid = np.arange(trigrams.shape[1])[np.newaxis, :] <= lengths[:, np.newaxis]
+        rows = np.broadcast_to(np.arange(len(names))[:, np.newaxis], trigrams.shape)[valid]
+        pairs = _sorted_unique(trigrams[valid] * max(len(names), 1) + rows)
+        return pairs % max(len(names), 1), pairs // max(len(names), 1)
+
+    def _build_trigrams(self):
+        rows, trigrams = self._trigrams(self._names)
+        starts = np.flatnonzero(np.concatenate(([True], trigrams[1:] != trigrams[:-1])))
+        self._trigram_keys = trigrams[starts]
+        self._trigram_bounds = np.append(starts, len(trigrams))
+        self._trigram_names = rows
+        self._trigram_counts = np.bincount(rows, minlength=len(self._names))
+
+    def _prefix_range(self, keys: np.ndarray, prefix: str) -> Tuple[int, int]:
+        start = int(np.searchsorted(keys, prefix, "left"))
+        stop = int(np.searchsorted(keys, prefix + "\U0010ffff", "left"))
+        return start, stop
+
+    def _shortest(self, indexes: np.ndarray, limit: int) -> np.ndarray:
+        """The `limit` shortest names of `indexes`, in (length, name) order."""
+        # the names are sorted, so the index breaks the length ties alphabetically
+        keys = self._lengths[indexes] * (len(self._names) + 1) + indexes
+        if len(indexes) > limit:
+            keep = np.argpartition(keys, limit - 1)[:limit]
+            indexes, keys = indexes[keep], keys[keep]
+        return indexes[np.argsort(keys)]
+
+    def prefix_matches(self, query: str, limit: int) -> List[Tuple[int, float, str]]:
+        """(name index, score, match type) of the names starting with `query`, then of the
+        names with another word starting with it; the shortest names first."""
+        matches = {}
+        start, stop = self._prefix_range(self._names, query)
+        for index in self._shortest(np.arange(start, stop), limit).tolist():
+            length = int(self._lengths[index])
+            matches[index] = (1.0, "exact") if length == len(query) else (
+                len(query) / length, "prefix")
+
+        if len(matches) < limit:
+            start, stop = self._prefix_range(self._words, query)
+            # a name having two words with the prefix is found twice
+            candidates = self._shortest(self._word_names[start:stop], 2 * limit)
+            for index in candidates.tolist():
+                if index not in matches and len(matches) < limit:
+                    matches[index] = (len(query) / int(self._lengths[index]), "word")
+
+        return [(index, score, match_type) for index, (score, match_type) in matches.items()]
+
+    def fuzzy_matches(
+            self, query: str, limit: int, min_similarity: float = DEFAULT_MIN_SIMILARITY
+    ) -> List[Tuple[int, float, str]]:
+        """(name index, similarity, "fuzzy") of the names sharing enough trigrams with `query`,
+        the most similar first."""
+        _, query_trigrams = self._trigrams(np.array([query]))
+        positions = np.minimum(
+            np.searchsorted(self._trigram_keys, query_trigrams), len(self._trigram_keys) - 1)
+        positions = positions[self._trigram_keys[positions] == query_trigrams]
+        postings = sorted(
+            (self._trigram_names[self._trigram_bounds[position]:self._trigram_bounds[position + 1]]
+             for position in positions.tolist()),
+            key=len)
+
+        # similarity >= t requires sharing at least t * |query trigrams| of them, so a match is
+        # in at least one of the rarest len(postings) - that + 1 lists: the candidates are read
+        # from those only, the common trigrams are just probed with binary searches. When even
+        # the rare lists are long, counting every posting at once is cheaper.
+        min_shared = max(1, int(np.ceil(min_similarity * len(query_trigrams))))
+        if len(postings) < min_shared:
+            return []
+        rare = postings[:len(postings) - min_shared + 1]
+        if sum(len(names) for names in rare) * 16 > len(self._names):
+            counts = np.bincount(np.concatenate(postings), minlength=len(self._names))
+            candidates = np.flatnonzero(counts >= min_shared)
+            shared = counts[candidates]
+        else:
+            candidates = _sorted_unique(np.concatenate(rare))
+            shared = np.zeros(len(candidates), dtype=np.int64)
+            for names in postings:
+                found = np.minimum(np.searchsorted(names, candidates), len(names) - 1)
+                shared += names[found] == candidates
+
+        similarity = shared / (len(query_trigrams) + self._trigram_counts[candidates] - shared)
+        keep = similarity >= min_similarity
+        candidates, similarity = candidates[keep], similarity[keep]
+        best = np.lexsort((candidates, -similarity))[:limit]
+        return [
+            (int(index), round(float(score), 4), "fuzzy")
+            for index, score in zip(candidates[best], similarity[best])
+        ]
+
+    def search(
+            self, query: str, limit: int = 10, fuzzy: bool = True,
+            min_similarity: float = DEFAULT_MIN_SIMILARITY) -> List[Tuple[int, float, str]]:
+        """(snapshot row, score, match type) of the best `limit` plants for `query`: the exact
+        and prefix matches first, then, with `fuzzy`, the trigram matches."""
+        query = normalize_name(query)
+        if not query or not len(self._names):
+            return []
+
+        matches = self.prefix_matches(query, limit)
+        if fuzzy and len(matches) < limit:
+            found = {index for index, _, _ in matches}
+            matches.extend(
+                match for match in self.fuzzy_matches(query, limit + len(found), min_similarity)
+                if match[0] not in found)
+
+        results = []
+        for index, score, match_type in matches:
+            rows = self._rows[self._row_bounds[index]:self._row_bounds[index + 1]]
+            results.extend((row, score, match_type) for row in rows.tolist())
+        return results[:limit]
+
+
+def search_plants(
+        snapshot: PlantCatalogSnapshot, index: PlantNameIndex, query: str, limit: int = 10,
+        fuzzy: bool = True) -> List[PlantSearchMatch]:
+    return [
+        PlantSearchMatch(plant=snapshot.plant(row), score=round(score, 4), matchType=match_type)
+        for row, score, match_type in index.search(query, limit, fuzzy)
+    ]
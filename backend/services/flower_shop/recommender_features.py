@@ -0,0 +1,198 @@
+from typing import Dict, Iterable, List, Sequence, Union
+
+import numpy as np
+
+from services.flower_shop.table_plant_data import PlantDataModel
+
+
+WATER_FREQUENCY_DAYS = {
+    "Daily": 1,
+    "Weekly": 7,
+    "Bi-weekly": 14,
+    "Monthly": 30
+}
+
+NUMERIC_FEATURES = ("sunlightHours", "temperature", "humidity")
+ORDINAL_FEATURES = {"waterFrequency": WATER_FREQUENCY_DAYS}
+CATEGORICAL_FEATURES = ("soilType", "fertilizerType", "location")
+# numeric columns read along with the features, without being part of them
+NUMERIC_ATTRIBUTES = ("plantRating", "age")
+
+PlantRecord = Union[PlantDataModel, dict]
+
+
+def plant_columns(
+        plants: Sequence[PlantRecord], fields: Iterable[str] = None) -> Dict[str, np.ndarray]:
+    """Reads a batch of plants (models or DynamoDB dicts) into one array per field."""
+    fields = fields or (
+        NUMERIC_FEATURES + tuple(ORDINAL_FEATURES) + CATEGORICAL_FEATURES + NUMERIC_ATTRIBUTES)
+    if not plants:
+        return {field: np.empty(0, dtype=object) for field in fields}
+
+    as_dict = isinstance(plants[0], dict)
+
+    def values(field):
+        if as_dict:
+            return (plant.get(field) for plant in plants)
+        return (getattr(plant, field) for plant in plants)
+
+    columns = {}
+    for field in fields:
+        if field in NUMERIC_FEATURES or field in NUMERIC_ATTRIBUTES:
+            # missing numeric values are loaded as None by DynamoDbModel
+            columns[field] = np.fromiter(
+                (value or 0 for value in values(field)), dtype=np.float64, count=len(plants))
+        else:
+            column = np.empty(len(plants), dtype=object)
+            column[:] = list(values(field))
+            columns[field] = column
+    return columns
+
+
+class PlantFeatureBuilder:
+    """Builds the feature matrix used by the plant recommender, for training and serving.
+
+    Numeric and ordinal features are standardized with the mean/scale fitted on the training
+    catalog, categorical features are one-hot encoded with the categories seen at fit time.
+    The fitted state is stored inside the model artifact (`to_dict`/`from_dict`), so the
+    serving path encodes plants exactly like the training path did.
+    """
+
+    def __init__(
+            self, mean: np.ndarray = None, scale: np.ndarray = None,
+            categories: Dict[str, List[str]] = None):
+        self.mean = mean
+        self.scale = scale
+        self.categories = categories or {}
+        self._codes = self._category_codes_map(self.categories)
+        # running statistics of `partial_fit`
+        self._count = 0
+        self._running_mean = np.zeros(self.scaled_width)
+        self._running_m2 = np.zeros(self.scaled_width)
+        self._seen = {field: set() for field in CATEGORICAL_FEATURES}
+
+    @staticmethod
+    def _category_codes_map(categories: Dict[str, List[str]]) -> Dict[str, dict]:
+        return {
+            field: {value: code for code, value in enumerate(values)}
+            for field, values in categories.items()
+        }
+
+    @property
+    def scaled_width(self) -> int:
+        return len(NUMERIC_FEATURES) + len(ORDINAL_FEATURES)
+
+    @property
+    def width(self) -> int:
+        return self.scaled_width + sum(len(values) for values in self.categories.values())
+
+    def feature_names(self) -> List[str]:
+        names = list(NUMERIC_FEATURES) + list(ORDINAL_FEATURES)
+        for field in CATEGORICAL_FEATURES:
+            names.extend(f"{field}={value}" for value in self.categories.get(field, []))
+        return names
+
+    def category_codes(self, field: str, column: np.ndarray) -> np.ndarray:
+        """Maps a categorical column to its fitted codes, -1 for unseen categories."""
+        codes = self._codes.get(field, {})
+        return np.fromiter(
+            (codes.get(value, -1) for value in column), dtype=np.int32, count=len(column))
+
+    def _raw_scaled(self, columns: Dict[str, np.ndarray], matrix: np.ndarray):
+        for index, field in enumerate(NUMERIC_FEATURES):
+            matrix[:, index] = columns[field]
+        for index, (field, mapping) in enumerate(ORDINAL_FEATURES.items(), len(NUMERIC_FEATURES)):
+            matrix[:, index] = np.fromiter(
+                (mapping.get(value, 0) for value in columns[field]),
+                dtype=np.float32, count=len(columns[field]))
+
+    def fit(self, columns: Dict[str, np.ndarray]) -> "PlantFeatureBuilder":
+        n_rows = len(columns[NUMERIC_FEATURES[0]])
+        raw = np.empty((n_rows, self.scaled_width), dtype=np.float64)
+        self._raw_scaled(columns, raw)
+        self.mean = raw.mean(axis=0)
+        scale = raw.std(axis=0)
+        # constant columns would otherwise divide by zero
+        scale[scale == 0] = 1.0
+        self.scale = scale
+
+        self.categories = {
+            field: sorted(str(value) for value in set(columns[field]) if value not in ("", None))
+            for field in CATEGORICAL_FEATURES
+        }
+        self._codes = self._category_codes_map(self.categories)
+        return self
+
+    def partial_fit(self, columns: Dict[str, np.ndarray]) -> "PlantFeatureBuilder":
+        """Accumulates the statistics of one block of rows, so a catalog can be fitted page by
+        page. `finish_fit` must be called after the last block."""
+        n_rows = len(columns[NUMERIC_FEATURES[0]])
+        if not n_rows:
+            return self
+        raw = np.empty((n_rows, self.scaled_width), dtype=np.float64)
+        self._raw_scaled(columns, raw)
+
+        # Chan et al. parallel variance: merge the block mean/M2 into the running ones
+        block_mean = raw.mean(axis=0)
+        block_m2 = ((raw - block_mean) ** 2).sum(axis=0)
+        total = self._count + n_rows
+        delta = block_mean - self._running_mean
+        self._running_mean += delta * n_rows / total
+        self._running_m2 += block_m2 + delta ** 2 * self._count * n_rows / total
+        self._count = total
+
+        for field in CATEGORICAL_FEATURES:
+            self._seen[field].update(
+                str(value) for value in set(columns[field]) if value not in ("", None))
+        return self
+
+    @property
+    def samples_seen(self) -> int:
+        """Rows accumulated by `partial_fit` so far."""
+        return self._count
+
+    def finish_fit(self) -> "PlantFeatureBuilder":
+        if not self._count:
+            raise ValueError("partial_fit was not called with any row")
+        self.mean = self._running_mean.copy()
+        scale = np.sqrt(self._running_m2 / self._count)
+        scale[scale == 0] = 1.0
+        self.scale = scale
+        self.categories = {field: sorted(values) for field, values in self._seen.items()}
+        self._codes = self._category_codes_map(self.categories)
+        return self
+
+    def transform(self, columns: Dict[str, np.ndarray], out: np.ndarray = None) -> np.ndarray:
+        """Encodes the columns into a float32 matrix, writing into `out` when given."""
+        n_rows = len(columns[NUMERIC_FEATURES[0]])
+        if out is None:
+            out = np.zeros((n_rows, self.width), dtype=np.float32)
+        else:
+            out[:] = 0
+
+        scaled = out[:, :self.scaled_width]
+        self._raw_scaled(columns, scaled)
+        scaled -= self.mean.astype(np.float32)
+        scaled /= self.scale.astype(np.float32)
+
+        offset = self.scaled_width
+        rows = np.arange(n_rows)
+        for field in CATEGORICAL_FEATURES:
+            codes = self.category_codes(field, columns[field])
+            known = codes >= 0
+            out[rows[known], offset + codes[known]] = 1.0
+            offset += len(self.categories.get(field, []))
+        return out
+
+    def fit_transform(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        return self.fit(columns).transform(columns)
+
+    def transform_plants(self, plants: Sequence[PlantRecord]) -> np.ndarray:
+        return self.transform(plant_columns(plants))
+
+    def to_dict(self) -> dict:
+        return {"mean": self.mean, "scale": self.scale, "categories": self.categories}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PlantFeatureBuilder":
+        return cls(mean=data["mean"], scale=data["scale"], categories=data.get("categories"))
@@ -0,0 +1,125 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.flower_shop.recommender_features import CATEGORICAL_FEATURES, PlantFeatureBuilder
+
+
+RATING_FIELD = "plantRating"
+AGE_FIELD = "age"
+FILTER_FIELDS = CATEGORICAL_FEATURES + (RATING_FIELD,)
+# numeric attributes used by the hybrid ranking, see recommender_ranking
+RANKING_FIELDS = (RATING_FIELD, AGE_FIELD)
+
+
+@dataclass
+class PlantFilters:
+    """Attributes the recommended plants must have. The categorical filters accept several
+    values (any of them matches), the rating filter is a lower bound."""
+    location: List[str] = field(default_factory=list)
+    soilType: List[str] = field(default_factory=list)
+    fertilizerType: List[str] = field(default_factory=list)
+    minRating: Optional[int] = None
+
+    @classmethod
+    def from_params(cls, params: dict) -> "PlantFilters":
+        """Reads the filters from query parameters, the values being comma separated, or from a
+        JSON body, the values being lists."""
+        def values(name):
+            value = params.get(name)
+            if value in (None, ""):
+                return []
+            if isinstance(value, str):
+                value = value.split(",")
+            return [str(item).strip() for item in value if str(item).strip()]
+
+        min_rating = params.get("minRating")
+        return cls(
+            location=values("location"),
+            soilType=values("soilType"),
+            fertilizerType=values("fertilizerType"),
+            minRating=int(min_rating) if min_rating not in (None, "") else None
+        )
+
+    def __bool__(self):
+        return bool(self.location or self.soilType or self.fertilizerType
+                    or self.minRating is not None)
+
+
+def attribute_columns(builder: PlantFeatureBuilder, columns: Dict[str, np.ndarray]) -> dict:
+    """Encodes the filterable and ranking attributes of a batch of plants: the fitted category
+    codes, the rating and the age, as stored in the model."""
+    attributes = {
+        name: builder.category_codes(name, columns[name]).astype(np.int16)
+        for name in CATEGORICAL_FEATURES
+    }
+    attributes[RATING_FIELD] = np.nan_to_num(columns[RATING_FIELD]).astype(np.int8)
+    attributes[AGE_FIELD] = np.nan_to_num(columns[AGE_FIELD]).astype(np.int32)
+    return attributes
+
+
+def concatenate_attributes(blocks: List[dict]) -> dict:
+    # the models trained before the age was stored keep only the attributes they have
+    names = [name for name in blocks[0] if all(name in block for block in blocks)]
+    return {name: np.concatenate([block[name] for block in blocks]) for name in names}
+
+
+class PlantAttributeIndex:
+    """Packed bitmaps (one bit per model row) of the plants having every attribute value.
+
+    A bitmap is built on the first filter using its value and cached for the lifetime of the
+    model, so a filter costs a few bitwise operations over n / 8 bytes. The rows that are
+    False in `live_rows`, dropped by the incremental updates, never match.
+    """
+
+    def __init__(self, attributes: dict, categories: Dict[str, List[str]],
+                 live_rows: np.ndarray = None):
+        self._attributes = attributes
+        self._live_rows = live_rows
+        self._codes = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in categories.items()
+        }
+        ratings = attributes[RATING_FIELD]
+        self._rows_count = len(ratings)
+        self._rating_range = (
+            (int(ratings.min()), int(ratings.max()) + 1) if self._rows_count else (0, 0))
+        self._bitmaps = {}
+
+    def _bitmap(self, key: tuple, rows: np.ndarray) -> np.ndarray:
+        if key not in self._bitmaps:
+            self._bitmaps[key] = np.packbits(rows)
+        return self._bitmaps[key]
+
+    def value_bitmap(self, name: str, value: str) -> np.ndarray:
+        code = self._codes.get(name, {}).get(value)
+        if code is None:
+            return np.zeros((self._rows_count + 7) // 8, dtype=np.uint8)
+        return self._bitmap((name, value), self._attributes[name] == code)
+
+    def rating_bitmap(self, min_rating: int) -> np.ndarray:
+        # every bound under the lowest rating selects all the rows, every one over the highest
+        # selects none, so at most one bitmap per rating of the model is cached
+        min_rating = min(max(min_rating, self._rating_range[0]), self._rating_range[1])
+        return self._bitmap(
+            (RATING_FIELD, min_rating), self._attributes[RATING_FIELD] >= min_rating)
+
+    def mask(self, filters: PlantFilters) -> Optional[np.ndarray]:
+        """Boolean mask of the rows matching `filters`, None when nothing is filtered."""
+        if not filters:
+            return None
+
+        bits = None
+        for name in CATEGORICAL_FEATURES:
+            values = getattr(filters, name)
+            if not values:
+                continue
+            field_bits = np.bitwise_or.reduce([self.value_bitmap(name, value) for value in values])
+            bits = field_bits if bits is None else bits & field_bits
+        if filters.minRating is not None:
+            rating_bits = self.rating_bitmap(filters.minRating)
+            bits = rating_bits if bits is None else bits & rating_bits
+
+        mask = np.unpackbits(bits, count=self._rows_count).astype(bool)
+        return mask if self._live_rows is None else mask & self._live_rows
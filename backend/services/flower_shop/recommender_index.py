@@ -0,0 +1,233 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+# max rows of a leaf, the leaves are ranked by brute force
+LEAF_SIZE = 32
+# queries searched at once, bounds the (query, node) pairs of the traversal
+QUERY_CHUNK_SIZE = 256
+# (query, node) pairs whose box distance is computed at once
+PAIR_BLOCK_SIZE = 65536
+# min rows searched to bound the distance to the k-th neighbour, before the traversal
+INITIAL_RADIUS_ROWS = 256
+# leaves ranked at once for every query, by the best first search
+LEAVES_PER_STEP = 4
+
+
+@dataclass
+class PlantNeighbourIndex:
+    """Balanced KD-tree over the feature rows of a model, for exact top-k searches.
+
+    The tree is complete: the node `i` has the children `2i + 1` and `2i + 2`, each internal
+    node splitting its rows at the median of its widest dimension, and the leaves are the
+    last `len(leafRows)` nodes. The index only holds the node boxes and the rows of every
+    leaf, not the features: the searches read the leaf rows from the features they are given,
+    e.g. the memory map of the model, so its arrays can be memory mapped as well.
+    """
+    # bounding box of the rows of every node
+    lower: np.ndarray
+    upper: np.ndarray
+    # split of every internal node: the rows whose value is under `splitValues` go left
+    splitDims: np.ndarray
+    splitValues: np.ndarray
+    # the rows of every leaf, padded with -1
+    leafRows: np.ndarray
+    rowsCount: int
+
+    @property
+    def depth(self) -> int:
+        return int(np.log2(len(self.leafRows)))
+
+    @classmethod
+    def build(cls, features: np.ndarray, leaf_size: int = LEAF_SIZE) -> PlantNeighbourIndex:
+        n_rows, n_dims = features.shape
+        depth = 0
+        while -(-n_rows // 2 ** depth) > leaf_size:
+            depth += 1
+        n_internal = 2 ** depth - 1
+        n_nodes = 2 * n_internal + 1
+
+        # the empty nodes get an empty box, infinitely far from every query
+        lower = np.full((n_nodes, n_dims), np.inf, dtype=np.float32)
+        upper = np.full((n_nodes, n_dims), -np.inf, dtype=np.float32)
+        split_dims = np.zeros(n_internal, dtype=np.int32)
+        split_values = np.zeros(n_internal, dtype=np.float32)
+        order = np.arange(n_rows)
+        ranges = [(0, n_rows)]
+        for node in range(n_nodes):
+            start, stop = ranges[node]
+            # sorted, to read the memory mapped features in order
+            rows = np.sort(order[start:stop])
+            points = np.asarray(features[rows], dtype=np.float32)
+            if len(points):
+                lower[node] = points.min(axis=0)
+                upper[node] = points.max(axis=0)
+            if node < n_internal:
+                middle = (start + stop) // 2
+                dim = int(np.argmax(upper[node] - lower[node])) if len(points) else 0
+                split = np.argpartition(points[:, dim], middle - start) if len(points) > 1 \
+                    else np.arange(len(points))
+                order[start:stop] = rows[split]
+                split_dims[node] = dim
+                split_values[node] = points[split[middle - start], dim] \
+                    if middle < stop else np.inf
+                ranges.extend(((start, middle), (middle, stop)))
+
+        leaf_ranges = ranges[n_internal:]
+        leaf_rows = np.full(
+            (len(leaf_ranges), max(stop - start for start, stop in leaf_ranges)), -1,
+            dtype=np.int64)
+        for leaf, (start, stop) in enumerate(leaf_ranges):
+            leaf_rows[leaf, :stop - start] = order[start:stop]
+        return cls(lower, upper, split_dims, split_values, leaf_rows, n_rows)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "lower": self.lower,
+            "upper": self.upper,
+            "splitDims": self.splitDims,
+            "splitValues": self.splitValues,
+            "leafRows": self.leafRows
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], rows_count: int) -> PlantNeighbourIndex:
+        return cls(rowsCount=rows_count, **arrays)
+
+    def query(
+            self, features: np.ndarray, queries: np.ndarray, k: int, exclude_rows: np.ndarray,
+            live_rows: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """The exact `k` nearest rows of every query and their distances, closest first, the
+        missing ones being -1 with an infinite distance. The row in `exclude_rows` of a query
+        (-1 for none) is never returned for it, nor the rows that are False in `live_rows`,
+        e.g. the plants removed since the tree was built."""
+        best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        best_distances = np.full((len(queries), k), np.inf)
+        for start in range(0, len(queries), QUERY_CHUNK_SIZE):
+            chunk = slice(start, start + QUERY_CHUNK_SIZE)
+            best_rows[chunk], best_distances[chunk] = self._query_chunk(
+                features, np.asarray(queries[chunk], dtype=np.float64), k,
+                exclude_rows[chunk], live_rows)
+        order = best_distances.argsort(axis=1, kind="stable")
+        return (np.take_along_axis(best_rows, order, axis=1),
+                np.sqrt(np.take_along_axis(best_distances, order, axis=1)))
+
+    def _rows_distances(
+            self, features: np.ndarray, queries: np.ndarray, rows: np.ndarray,
+            exclude_rows: np.ndarray, live_rows: Optional[np.ndarray]) -> np.ndarray:
+        # squared distances between every query and its row of `rows`, the -1 padding, the
+        # excluded and the dead rows being infinitely far
+        valid = (rows >= 0) & (rows != exclude_rows[:, np.newaxis])
+        if live_rows is not None:
+            valid[valid] = live_rows[rows[valid]]
+        offsets = np.zeros(rows.shape + (queries.shape[1],))
+        offsets[valid] = features[rows[valid]]
+        offsets -= queries[:, np.newaxis]
+        distances = np.einsum("ijk,ijk->ij", offsets, offsets)
+        distances[~valid] = np.inf
+        return distances
+
+    def _box_distances(
+            self, queries: np.ndarray, pair_queries: np.ndarray, pair_nodes: np.ndarray
+    ) -> np.ndarray:
+        # squared distances between the queries and the boxes of their nodes
+        points = queries[pair_queries]
+        gaps = (np.maximum(self.lower[pair_nodes] - points, 0)
+                + np.maximum(points - self.upper[pair_nodes], 0))
+        return np.einsum("ij,ij->i", gaps, gaps)
+
+    def _initial_radius(
+            self, features: np.ndarray, queries: np.ndarray, k: int, exclude_rows: np.ndarray,
+            live_rows: Optional[np.ndarray]) -> np.ndarray:
+        """An upper bound of the squared distance to the k-th neighbour of every query: the
+        k-th distance among the rows of the deepest node on its path holding k + 1 rows, and
+        at least `INITIAL_RADIUS_ROWS` for a tighter bound."""
+        node_rows = max(k + 1, INITIAL_RADIUS_ROWS)
+        level = 0
+        while level < self.depth and self.rowsCount // 2 ** (level + 1) >= node_rows:
+            level += 1
+        nodes = np.zeros(len(queries), dtype=np.int64)
+        for _ in range(level):
+            dims = self.splitDims[nodes]
+            right = queries[np.arange(len(queries)), dims] >= self.splitValues[nodes]
+            nodes = 2 * nodes + 1 + right
+
+        leaves_per_node = 2 ** (self.depth - level)
+        first_leaves = (nodes + 1) * leaves_per_node - len(self.leafRows)
+        rows = self.leafRows[first_leaves[:, np.newaxis] + np.arange(leaves_per_node)]
+        distances = self._rows_distances(
+            features, queries, rows.reshape(len(queries), -1), exclude_rows, live_rows)
+        if distances.shape[1] < k:
+            return np.full(len(queries), np.inf)
+        return np.partition(distances, k - 1, axis=1)[:, k - 1]
+
+    def _candidate_leaves(
+            self, queries: np.ndarray, squared_radius: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The (query, leaf) pairs whose box is within the radius of the query, sorted by
+        query then by box distance, with their squared box distances."""
+        pair_queries = np.arange(len(queries))
+        pair_nodes = np.zeros(len(queries), dtype=np.int64)
+        box_distances = np.zeros(len(queries))
+        for _ in range(self.depth):
+            pair_queries = np.repeat(pair_queries, 2)
+            pair_nodes = (2 * pair_nodes[:, np.newaxis] + np.array([1, 2])).ravel()
+            box_distances = np.concatenate([
+                self._box_distances(
+                    queries, pair_queries[start:start + PAIR_BLOCK_SIZE],
+                    pair_nodes[start:start + PAIR_BLOCK_SIZE])
+                for start in range(0, len(pair_queries), PAIR_BLOCK_SIZE)
+            ] or [np.zeros(0)])
+            within = box_distances <= squared_radius[pair_queries]
+            pair_queries = pair_queries[within]
+            pair_nodes, box_distances = pair_nodes[within], box_distances[within]
+
+        order = np.lexsort((box_distances, pair_queries))
+        return (pair_queries[order], pair_nodes[order] - (len(self.leafRows) - 1),
+                box_distances[order])
+
+    def _query_chunk(
+            self, features: np.ndarray, queries: np.ndarray, k: int, exclude_rows: np.ndarray,
+            live_rows: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        # with some slack, the box and row distances not being rounded the same way
+        squared_radius = self._initial_radius(features, queries, k, exclude_rows, live_rows)
+        squared_radius *= 1 + 1e-9
+        pair_queries, pair_leaves, box_distances = self._candidate_leaves(
+            queries, squared_radius)
+        counts = np.bincount(pair_queries, minlength=len(queries))
+        starts = np.cumsum(counts) - counts
+
+        # best first: the closest leaves of every query are ranked a few at a time, until the
+        # box of its next leaf is farther than its k-th row so far
+        best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        best_distances = np.full((len(queries), k), np.inf)
+        active = np.flatnonzero(counts)
+        position = 0
+        while len(active):
+            slots = position + np.arange(LEAVES_PER_STEP)
+            active_counts = counts[active, np.newaxis]
+            pairs = starts[active, np.newaxis] + np.minimum(slots, active_counts - 1)
+            bounds = np.minimum(squared_radius[active], best_distances[active].max(axis=1))
+            taken = (slots < active_counts) & (box_distances[pairs] <= bounds[:, np.newaxis])
+            rows = np.where(taken[:, :, np.newaxis], self.leafRows[pair_leaves[pairs]], -1)
+
+            candidate_rows = np.concatenate(
+                (best_rows[active], rows.reshape(len(active), -1)), axis=1)
+            candidates = np.concatenate((best_distances[active], self._rows_distances(
+                features, queries[active], candidate_rows[:, k:], exclude_rows[active],
+                live_rows)),
+                axis=1)
+            keep = np.argpartition(candidates, k - 1, axis=1)[:, :k]
+            best_distances[active] = np.take_along_axis(candidates, keep, axis=1)
+            best_rows[active] = np.take_along_axis(candidate_rows, keep, axis=1)
+
+            position += LEAVES_PER_STEP
+            remaining = position < counts[active]
+            next_pairs = starts[active] + np.minimum(position, counts[active] - 1)
+            bounds = np.minimum(squared_radius[active], best_distances[active].max(axis=1))
+            active = active[remaining & (box_distances[next_pairs] <= bounds)]
+        best_rows[~np.isfinite(best_distances)] = -1
+        return best_rows, best_distances
@@ -0,0 +1,893 @@
+from __future__ import annotations
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+import json
+import os
+import pickle
+import shutil
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+from bootcamp_lib.logger import Logger
+from bootcamp_lib.s3 import CavendishS3
+from services.flower_shop.recommender_features import PlantFeatureBuilder
+from services.flower_shop.recommender_filters import (
+    PlantAttributeIndex, RANKING_FIELDS, concatenate_attributes
+)
+from services.flower_shop.recommender_index import PlantNeighbourIndex
+
+
+MODELS_PREFIX = "FlowerShop/Recommender/Models"
+# the per-base pointer to the last incremental update, see RecommenderModelStore.save_delta
+UPDATES_FILE = "updates.json"
+DELTAS_DIR = "deltas"
+LATEST_MODEL_KEY = "FlowerShop/Recommender/latest.json"
+LOCAL_MODELS_DIR = "/tmp/flower_shop_recommender"
+# max cells of the query x candidate distance matrices of the brute force rankings
+DISTANCE_BLOCK_SIZE = 4_000_000
+# offset alignment of the arrays in the model blob, a cache line
+ARRAY_ALIGNMENT = 64
+
+
+def _pairwise_distances(queries: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Euclidean distances between every query and point, as one matrix product."""
+    queries = queries.astype(np.float64, copy=False)
+    points = points.astype(np.float64, copy=False)
+    squared = (
+        np.einsum("ij,ij->i", queries, queries)[:, np.newaxis]
+        + np.einsum("ij,ij->i", points, points)[np.newaxis, :]
+        - 2 * queries @ points.T
+    )
+    return np.sqrt(np.maximum(squared, 0, out=squared), out=squared)
+
+
+def _lookup(sorted_ids: np.ndarray, rows: np.ndarray, plant_ids: np.ndarray) -> np.ndarray:
+    """The rows of `plant_ids` in an ID map, -1 for the IDs that are not in it."""
+    if not len(sorted_ids):
+        return np.full(plant_ids.shape, -1, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(sorted_ids, plant_ids), len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == plant_ids, rows[positions], -1)
+
+
+def _top_k(
+        rows: np.ndarray, distances: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The `k` closest of the candidate `rows` of every query, unsorted."""
+    keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(rows, keep, axis=1), np.take_along_axis(distances, keep, axis=1)
+
+
+def write_arrays(arrays: Dict[str, np.ndarray], path: str) -> Dict[str, dict]:
+    """Writes the arrays back to back in one raw file, each at an ARRAY_ALIGNMENT offset, and
+    returns their layout (dtype, shape and offset by name) to open them with `open_arrays`."""
+    layout = {}
+    with open(path, "wb") as blob:
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            blob.write(b"\0" * (-blob.tell() % ARRAY_ALIGNMENT))
+            layout[name] = {
+                "dtype": array.dtype.str, "shape": list(array.shape), "offset": blob.tell()}
+            array.tofile(blob)
+    return layout
+
+
+def open_arrays(path: str, layout: Dict[str, dict]) -> Dict[str, np.ndarray]:
+    """Read-only memory maps of the arrays of a `write_arrays` file: nothing is read until the
+    pages are touched, and the pages are shared by the models opened from the same file."""
+    arrays = {}
+    for name, spec in layout.items():
+        dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+        if 0 in shape:
+            # an empty memory map is an error
+            arrays[name] = np.empty(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=spec["offset"],
+                                     shape=shape)
+    return arrays
+
+
+class ModelVersionConflict(Exception):
+    """Another model version was published while an update was computed from an older one."""
+
+
+def split_version(version: str) -> Tuple[str, int]:
+    """The base (trained) version and the number of incremental updates of `version`, e.g.
+    ("20240101T000000Z", 3) for "20240101T000000Z.3"."""
+    base_version, _, sequence = version.partition(".")
+    return base_version, int(sequence or 0)
+
+
+@dataclass
+class ModelDelta:
+    """An incremental update of a trained model: the upserted plants, assigned to their
+    nearest centroid, and the removed ones. Applying the deltas 1 to n of a base version, in
+    order, gives the version "<base>.<n>", see `PlantRecommenderModel.with_delta`."""
+    baseVersion: str
+    sequence: int
+    plantIds: np.ndarray
+    labels: np.ndarray
+    features: np.ndarray
+    removedIds: np.ndarray
+    attributes: dict = field(default_factory=dict)
+    # the update statistics after this delta, see recommender_updates.update_statistics
+    updates: dict = field(default_factory=dict)
+
+    @property
+    def version(self) -> str:
+        return f"{self.baseVersion}.{self.sequence}"
+
+    def to_arrays(self) -> Tuple[dict, Dict[str, np.ndarray]]:
+        arrays = {
+            "plantIds": self.plantIds,
+            "labels": self.labels,
+            "features": self.features,
+            "removedIds": self.removedIds
+        }
+        arrays.update({f"attributes.{name}": values for name, values in self.attributes.items()})
+        metadata = {
+            "baseVersion": self.baseVersion,
+            "sequence": self.sequence,
+            "updates": self.updates
+        }
+        return metadata, arrays
+
+    @classmethod
+    def from_arrays(cls, metadata: dict, arrays: Dict[str, np.ndarray]) -> ModelDelta:
+        return cls(
+            baseVersion=metadata["baseVersion"],
+            sequence=metadata["sequence"],
+            plantIds=arrays["plantIds"],
+            labels=arrays["labels"],
+            features=arrays["features"],
+            removedIds=arrays["removedIds"],
+            attributes={
+                name.split(".", 1)[1]: values for name, values in arrays.items()
+                if name.startswith("attributes.")
+            },
+            updates=metadata["updates"]
+        )
+
+
+@dataclass
+class ModelOverlay:
+    """The incremental updates applied to a trained model: the sorted rows of its arrays that
+    were removed or replaced, and the rows appended after them. The updates are kept apart
+    from the trained arrays, so those stay memory mapped."""
+    droppedRows: np.ndarray
+    plantIds: np.ndarray
+    labels: np.ndarray
+    features: np.ndarray
+    attributes: dict = field(default_factory=dict)
+
+
+@dataclass
+class PlantRecommenderModel:
+    """Fitted K-Means recommender, as persisted in the bootcamp bucket.
+
+    The rows of a model are the rows of its trained arrays, then the rows appended by its
+    `overlay` of incremental updates, if any. The rows dropped by the overlay are kept, but
+    never returned by the lookups and the rankings. The `*_of` accessors read either part.
+    """
+    version: str
+    trainedAt: str
+    plantIds: np.ndarray
+    labels: np.ndarray
+    centroids: np.ndarray
+    scaler: dict
+    features: np.ndarray
+    silhouetteScore: float = None
+    metadata: dict = field(default_factory=dict)
+    # filterable attributes per row, see recommender_filters.attribute_columns
+    attributes: dict = field(default_factory=dict, repr=False)
+    # the ID map: the sorted plant IDs and their rows, built on first use unless loaded
+    _rows: Tuple[np.ndarray, np.ndarray] = field(default=None, repr=False)
+    _attribute_index: PlantAttributeIndex = field(default=None, repr=False)
+    _ranking_columns: dict = field(default=None, repr=False)
+    # the incremental updates since the training, see with_delta
+    overlay: ModelOverlay = field(default=None, repr=False)
+    # the KD-tree of the trained features, built on first use unless loaded with the model
+    _index: PlantNeighbourIndex = field(default=None, repr=False)
+    _live_rows: np.ndarray = field(default=None, repr=False)
+    _row_attributes: dict = field(default=None, repr=False)
+
+    @property
+    def rows_count(self) -> int:
+        """The number of rows, the dropped ones included."""
+        return len(self.plantIds) + (0 if self.overlay is None else len(self.overlay.plantIds))
+
+    @property
+    def plants_count(self) -> int:
+        if self.overlay is None:
+            return len(self.plantIds)
+        return self.rows_count - len(self.overlay.droppedRows)
+
+    @property
+    def live_rows(self) -> Optional[np.ndarray]:
+        """Boolean mask of the rows that are not dropped, None without an overlay."""
+        if self.overlay is not None and self._live_rows is None:
+            live_rows = np.ones(self.rows_count, dtype=bool)
+            live_rows[self.overlay.droppedRows] = False
+            self._live_rows = live_rows
+        return self._live_rows
+
+    @property
+    def row_attributes(self) -> dict:
+        """The attributes of every row. With an overlay, they are concatenated on first use,
+        which only the filters and the hybrid ranking need."""
+        if self.overlay is None:
+            return self.attributes
+        if self._row_attributes is None:
+            self._row_attributes = concatenate_attributes(
+                [self.attributes, self.overlay.attributes]) if self.attributes else {}
+        return self._row_attributes
+
+    def _gather(self, base: np.ndarray, appended: np.ndarray, rows) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.overlay is None:
+            return base[rows]
+        is_appended = rows >= len(base)
+        values = np.empty(rows.shape + base.shape[1:], dtype=base.dtype)
+        values[~is_appended] = base[rows[~is_appended]]
+        values[is_appended] = appended[rows[is_appended] - len(base)]
+        return values
+
+    def plant_ids_of(self, rows) -> np.ndarray:
+        return self._gather(self.plantIds, getattr(self.overlay, "plantIds", None), rows)
+
+    def labels_of(self, rows) -> np.ndarray:
+        return self._gather(self.labels, getattr(self.overlay, "labels", None), rows)
+
+    def features_of(self, rows) -> np.ndarray:
+        return self._gather(self.features, getattr(self.overlay, "features", None), rows)
+
+    @property
+    def id_map(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._rows is None:
+            order = np.argsort(self.plantIds, kind="stable")
+            self._rows = (np.asarray(self.plantIds)[order], order)
+        return self._rows
+
+    @property
+    def neighbour_index(self) -> PlantNeighbourIndex:
+        if self._index is None:
+            self._index = PlantNeighbourIndex.build(self.features)
+        return self._index
+
+    @property
+    def attribute_index(self) -> PlantAttributeIndex:
+        if not self.attributes:
+            raise ValueError(f"Recommender model {self.version} has no attributes to filter on")
+        if self._attribute_index is None:
+            self._attribute_index = PlantAttributeIndex(
+                self.row_attributes, self.feature_builder.categories, self.live_rows)
+        return self._attribute_index
+
+    @property
+    def ranking_columns(self) -> Dict[str, np.ndarray]:
+        """The ranking attributes of every row min-max scaled to [0, 1], computed once per
+        model. The attributes missing from older models are left out."""
+        if self._ranking_columns is None:
+            columns = {}
+            attributes = self.row_attributes
+            for name in RANKING_FIELDS:
+                if name not in attributes:
+                    continue
+                values = attributes[name].astype(np.float64)
+                live_values = values if self.live_rows is None else values[self.live_rows]
+                low, high = (
+                    (live_values.min(), live_values.max()) if len(live_values) else (0, 0))
+                columns[name] = (values - low) / (high - low) if high > low else np.zeros_like(
+                    values)
+            self._ranking_columns = columns
+        return self._ranking_columns
+
+    @property
+    def feature_builder(self) -> PlantFeatureBuilder:
+        return PlantFeatureBuilder.from_dict(self.scaler)
+
+    def rows_of(self, plant_ids: np.ndarray) -> np.ndarray:
+        """The rows of `plant_ids`, -1 for the plants that are not in the model."""
+        sorted_ids, rows = self.id_map
+        plant_ids = np.asarray(plant_ids, dtype=sorted_ids.dtype)
+        found = _lookup(sorted_ids, rows, plant_ids)
+        if self.overlay is None:
+            return found
+        # the dropped rows are replaced by the appended ones, if upserted again
+        found[np.isin(found, self.overlay.droppedRows)] = -1
+        order = np.argsort(self.overlay.plantIds, kind="stable")
+        appended = _lookup(self.overlay.plantIds[order], order, plant_ids)
+        return np.where(appended >= 0, len(self.plantIds) + appended, found)
+
+    def row_of(self, plant_id: int) -> Optional[int]:
+        row = int(self.rows_of(np.array([plant_id]))[0])
+        return None if row < 0 else row
+
+    def feature_vector(self, plant_id: int) -> np.ndarray:
+        row = self.row_of(plant_id)
+        return None if row is None else self.features_of([row])
+
+    def nearest_cluster(self, vector: np.ndarray) -> int:
+        return int(self.nearest_clusters(vector)[0])
+
+    def nearest_clusters(self, vectors: np.ndarray) -> np.ndarray:
+        distances = np.linalg.norm(
+            vectors[:, np.newaxis, :] - self.centroids[np.newaxis], axis=2)
+        return distances.argmin(axis=1)
+
+    def cluster_members(
+            self, vector: np.ndarray, k: int, exclude_row: int = None) -> List[Tuple[int, float]]:
+        """Returns up to `k` plants from the cluster closest to `vector` as
+        (plantID, distance), closest first."""
+        return self.cluster_members_batch(vector, k, [exclude_row])[0]
+
+    def cluster_members_batch(
+            self, vectors: np.ndarray, k: int, exclude_rows: Sequence[int] = None,
+            mask: np.ndarray = None
+    ) -> List[List[Tuple[int, float]]]:
+        """`cluster_members` for every row of `vectors`, restricted to the rows of `mask` if
+        given. The queries are grouped by cluster and every group is ranked at once."""
+        if k <= 0:
+            return [[] for _ in vectors]
+        exclude_rows = self._exclude_rows(exclude_rows, len(vectors))
+        labels = self.nearest_clusters(vectors)
+        known = exclude_rows >= 0
+        labels[known] = self.labels_of(exclude_rows[known])
+
+        results = [None] * len(vectors)
+        for label in np.unique(labels):
+            members = self._cluster_rows(label)
+            if mask is not None:
+                members = members[mask[members]]
+            group = np.flatnonzero(labels == label)
+            ranked = self._rank_candidates(
+                vectors[group], members, k, exclude_rows[group])
+            for query, neighbours in zip(group, ranked):
+                results[query] = neighbours
+        return results
+
+    def _cluster_rows(self, label: int) -> np.ndarray:
+        rows = np.flatnonzero(self.labels == label)
+        if self.overlay is None:
+            return rows
+        return np.concatenate((
+            rows[self.live_rows[rows]],
+            len(self.plantIds) + np.flatnonzero(self.overlay.labels == label)))
+
+    def nearest(
+            self, vector: np.ndarray, k: int, exclude_row: int = None) -> List[Tuple[int, float]]:
+        """Returns the `k` plants closest to `vector` as (plantID, distance), closest first."""
+        return self.nearest_batch(vector, k, [exclude_row])[0]
+
+    def nearest_batch(
+            self, vectors: np.ndarray, k: int, exclude_rows: Sequence[int] = None,
+            mask: np.ndarray = None
+    ) -> List[List[Tuple[int, float]]]:
+        """`nearest` for every row of `vectors`, with one KD-tree query for the whole batch.
+
+        The tree only holds the node boxes and the leaf rows, the features of the visited
+        leaves are read from the memory mapped model. It covers the trained rows, the rows
+        appended by the overlay are ranked by brute force and merged in. With a `mask`, only
+        its rows are ranked, by brute force over the masked rows instead of the KD-tree, which
+        cannot skip the filtered out plants.
+        """
+        if k <= 0:
+            return [[] for _ in vectors]
+        exclude_rows = self._exclude_rows(exclude_rows, len(vectors))
+        if mask is not None:
+            return self._rank_candidates(vectors, np.flatnonzero(mask), k, exclude_rows)
+        live_rows = None if self.overlay is None else self.live_rows[:len(self.plantIds)]
+        best_rows, best_distances = self.neighbour_index.query(
+            self.features, vectors, k, exclude_rows, live_rows)
+        if self.overlay is not None and len(self.overlay.plantIds):
+            appended_rows, appended_distances = self._top_rows(
+                vectors, len(self.plantIds) + np.arange(len(self.overlay.plantIds)), k,
+                exclude_rows)
+            best_rows, best_distances = _top_k(
+                np.concatenate((best_rows, appended_rows), axis=1),
+                np.concatenate((best_distances, appended_distances), axis=1), k)
+            order = best_distances.argsort(axis=1, kind="stable")
+            best_rows = np.take_along_axis(best_rows, order, axis=1)
+            best_distances = np.take_along_axis(best_distances, order, axis=1)
+        return self._neighbours(best_rows, best_distances)
+
+    def _rank_candidates(
+            self, vectors: np.ndarray, candidates: Optional[np.ndarray], k: int,
+            exclude_rows: np.ndarray
+    ) -> List[List[Tuple[int, float]]]:
+        """Exact top `k` of every query among the `candidates` rows, every row when None."""
+        return self._neighbours(*self._top_rows(vectors, candidates, k, exclude_rows))
+
+    def _top_rows(
+            self, vectors: np.ndarray, candidates: Optional[np.ndarray], k: int,
+            exclude_rows: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """The sorted top `k` rows and distances of `_rank_candidates`. The candidates are read
+        in blocks of DISTANCE_BLOCK_SIZE cells, each merged into a running top `k`."""
+        best_distances = np.full((len(vectors), k), np.inf)
+        best_rows = np.full((len(vectors), k), -1, dtype=np.int64)
+        block_size = max(1, DISTANCE_BLOCK_SIZE // max(len(vectors), 1))
+
+        for rows, block in self._candidate_blocks(candidates, block_size):
+            distances = _pairwise_distances(vectors, block)
+            # the queried plant is not its own recommendation
+            distances[rows[np.newaxis, :] == exclude_rows[:, np.newaxis]] = np.inf
+            if candidates is None and self.overlay is not None:
+                distances[:, ~self.live_rows[rows]] = np.inf
+
+            best_rows, best_distances = _top_k(
+                np.concatenate(
+                    (best_rows, np.broadcast_to(rows, (len(vectors), len(rows)))), axis=1),
+                np.concatenate((best_distances, distances), axis=1), k)
+
+        order = best_distances.argsort(axis=1, kind="stable")
+        return (np.take_along_axis(best_rows, order, axis=1),
+                np.take_along_axis(best_distances, order, axis=1))
+
+    def _candidate_blocks(self, candidates: Optional[np.ndarray], block_size: int):
+        # (rows, features) blocks of the candidates, of every row when None
+        if candidates is None:
+            for start in range(0, len(self.plantIds), block_size):
+                # a slice of the memory map, only the block pages are read
+                rows = np.arange(start, min(start + block_size, len(self.plantIds)))
+                yield rows, self.features[start:start + block_size]
+            candidates = np.arange(len(self.plantIds), self.rows_count)
+        for start in range(0, len(candidates), block_size):
+            rows = candidates[start:start + block_size]
+            yield rows, self.features_of(rows)
+
+    def _neighbours(
+            self, best_rows: np.ndarray, best_distances: np.ndarray
+    ) -> List[List[Tuple[int, float]]]:
+        # the sorted top rows of every query as (plantID, distance), without the missing ones
+        found = np.isfinite(best_distances)
+        plant_ids = np.zeros(best_rows.shape, dtype=np.int64)
+        plant_ids[found] = self.plant_ids_of(best_rows[found])
+        return [
+            [
+                (plant_id, distance)
+                for plant_id, distance, is_found in zip(query_ids, query_distances, query_found)
+                if is_found
+            ]
+            for query_ids, query_distances, query_found in zip(
+                plant_ids.tolist(), best_distances.tolist(), found.tolist())
+        ]
+
+    def with_delta(self, delta: ModelDelta) -> PlantRecommenderModel:
+        """The model with the rows of the plants removed or upserted by `delta` dropped, then
+        the upserted plants appended. The centroids and the scaler are not refitted.
+
+        Only the overlay is rebuilt: the trained arrays, their ID map and their KD-tree are
+        shared with this model, so the memory mapped pages are not copied. The overlay grows
+        with the changes since the training, which the drift check bounds by retraining.
+        """
+        overlay = self.overlay or ModelOverlay(
+            droppedRows=np.empty(0, dtype=np.int64),
+            plantIds=np.empty(0, dtype=self.plantIds.dtype),
+            labels=np.empty(0, dtype=self.labels.dtype),
+            features=np.empty((0,) + self.features.shape[1:], dtype=self.features.dtype),
+            attributes={name: values[:0] for name, values in self.attributes.items()})
+        dropped = self.rows_of(np.concatenate((delta.removedIds, delta.plantIds)))
+        dropped = dropped[dropped >= 0]
+        keep = np.ones(len(overlay.plantIds), dtype=bool)
+        keep[dropped[dropped >= len(self.plantIds)] - len(self.plantIds)] = False
+        return replace(
+            self,
+            version=delta.version,
+            metadata={**self.metadata, "updates": delta.updates},
+            overlay=ModelOverlay(
+                droppedRows=np.union1d(
+                    overlay.droppedRows, dropped[dropped < len(self.plantIds)]),
+                plantIds=np.concatenate((
+                    overlay.plantIds[keep],
+                    delta.plantIds.astype(self.plantIds.dtype, copy=False))),
+                labels=np.concatenate((
+                    overlay.labels[keep], delta.labels.astype(self.labels.dtype, copy=False))),
+                features=np.concatenate((
+                    overlay.features[keep],
+                    delta.features.astype(self.features.dtype, copy=False))),
+                attributes=(
+                    concatenate_attributes([
+                        {name: values[keep] for name, values in overlay.attributes.items()},
+                        delta.attributes
+                    ]) if self.attributes else {}
+                )
+            ),
+            _attribute_index=None,
+            _ranking_columns=None,
+            _live_rows=None,
+            _row_attributes=None
+        )
+
+    def compacted(self) -> PlantRecommenderModel:
+        """The model with its overlay merged into its arrays, for the batch jobs reading every
+        row. The arrays are copied to the heap and the KD-tree is rebuilt on first use."""
+        if self.overlay is None:
+            return self
+        live_rows = self.live_rows[:len(self.plantIds)]
+        return replace(
+            self,
+            plantIds=np.concatenate((self.plantIds[live_rows], self.overlay.plantIds)),
+            labels=np.concatenate((self.labels[live_rows], self.overlay.labels)),
+            features=np.concatenate((self.features[live_rows], self.overlay.features)),
+            attributes=(
+                concatenate_attributes([
+                    {name: values[live_rows] for name, values in self.attributes.items()},
+                    self.overlay.attributes
+                ]) if self.attributes else {}
+            ),
+            overlay=None,
+            _rows=None,
+            _attribute_index=None,
+            _ranking_columns=None,
+            _index=None,
+            _live_rows=None,
+            _row_attributes=None
+        )
+
+    @staticmethod
+    def _exclude_rows(exclude_rows: Optional[Sequence[int]], n_queries: int) -> np.ndarray:
+        """Rows as an array, -1 standing for the queries that are not in the model."""
+        if exclude_rows is None:
+            return np.full(n_queries, -1, dtype=np.int64)
+        return np.array([-1 if row is None else row for row in exclude_rows], dtype=np.int64)
+
+    def to_dict(self) -> dict:
+        if self.overlay is not None:
+            return self.compacted().to_dict()
+        return {
+            "version": self.version,
+            "trainedAt": self.trainedAt,
+            "plantIds": self.plantIds,
+            "labels": self.labels,
+            "centroids": self.centroids,
+            "scaler": self.scaler,
+            "features": self.features,
+            "silhouetteScore": self.silhouetteScore,
+            "metadata": self.metadata,
+            "attributes": self.attributes
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> PlantRecommenderModel:
+        return cls(**data)
+
+    def to_arrays(self) -> Tuple[dict, Dict[str, np.ndarray]]:
+        """The model as JSON metadata and flat arrays, see `write_arrays`."""
+        if self.overlay is not None:
+            return self.compacted().to_arrays()
+        sorted_ids, rows = self.id_map
+        arrays = {
+            "plantIds": self.plantIds,
+            "labels": self.labels,
+            "centroids": self.centroids,
+            "features": self.features,
+            "idMap.plantIds": sorted_ids,
+            "idMap.rows": rows,
+            "scaler.mean": self.scaler["mean"],
+            "scaler.scale": self.scaler["scale"]
+        }
+        arrays.update({f"attributes.{name}": values for name, values in self.attributes.items()})
+        # the KD-tree is saved with the features, so the serving containers map it as well
+        arrays.update({
+            f"index.{name}": values for name, values in self.neighbour_index.to_arrays().items()
+        })
+        metadata = {
+            "version": self.version,
+            "trainedAt": self.trainedAt,
+            "silhouetteScore": self.silhouetteScore,
+            "metadata": self.metadata,
+            "categories": self.scaler.get("categories") or {}
+        }
+        return metadata, arrays
+
+    @classmethod
+    def from_arrays(cls, metadata: dict, arrays: Dict[str, np.ndarray]) -> PlantRecommenderModel:
+        return cls(
+            version=metadata["version"],
+            trainedAt=metadata["trainedAt"],
+            plantIds=arrays["plantIds"],
+            labels=arrays["labels"],
+            centroids=arrays["centroids"],
+            scaler={
+                "mean": arrays["scaler.mean"],
+                "scale": arrays["scaler.scale"],
+                "categories": metadata["categories"]
+            },
+            features=arrays["features"],
+            silhouetteScore=metadata["silhouetteScore"],
+            metadata=metadata["metadata"],
+            attributes={
+                name.split(".", 1)[1]: values for name, values in arrays.items()
+                if name.startswith("attributes.")
+            },
+            _rows=(arrays["idMap.plantIds"], arrays["idMap.rows"]),
+            # built on first use for the models saved without it
+            _index=PlantNeighbourIndex.from_arrays({
+                name.split(".", 1)[1]: values for name, values in arrays.items()
+                if name.startswith("index.")
+            }, len(arrays["plantIds"])) if "index.leafRows" in arrays else None
+        )
+
+
+def new_model_version() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+class RecommenderModelStore:
+    """Saves and loads versioned recommender artifacts in the bootcamp bucket.
+
+    Every training run writes the `Models/<version>/model.arrays` blob of the model arrays and
+    its `model.json` metadata (with the arrays layout), then moves the `latest.json` pointer,
+    so a serving container never sees a partially written model. Only the trainings move it.
+
+    The incremental updates of a trained version are stored next to it as small deltas,
+    `Models/<version>/deltas/<sequence>.arrays` and `.json`, and its `updates.json` points to
+    the last one: the version "<base>.<n>" is the base model with the deltas 1 to n applied.
+    A training rebuilds the whole model from the table, so it deletes the deltas of the
+    versions before the one it replaces.
+
+    The artifacts are kept in LOCAL_MODELS_DIR after the first download, and the arrays are
+    memory mapped from there instead of being read: loading a model costs a few page faults
+    and the memory grows with the pages the queries touch. Loading a version deletes the local
+    files of the others. The versions saved before, as a `model.pkl`, are still loaded by
+    unpickling them.
+    """
+
+    def __init__(self, bucket: str = None, s3: CavendishS3 = None):
+        self._s3 = s3 or CavendishS3(bucket or os.environ["BOOTCAMP_BUCKET"])
+        os.makedirs(LOCAL_MODELS_DIR, exist_ok=True)
+
+    @staticmethod
+    def model_key(version: str) -> str:
+        return f"{MODELS_PREFIX}/{version}/model.pkl"
+
+    @staticmethod
+    def arrays_key(version: str) -> str:
+        return f"{MODELS_PREFIX}/{version}/model.arrays"
+
+    @staticmethod
+    def metadata_key(version: str) -> str:
+        return f"{MODELS_PREFIX}/{version}/model.json"
+
+    @staticmethod
+    def delta_key(base_version: str, sequence: int, extension: str) -> str:
+        return f"{MODELS_PREFIX}/{base_version}/{DELTAS_DIR}/{sequence:06d}.{extension}"
+
+    @staticmethod
+    def updates_key(base_version: str) -> str:
+        return f"{MODELS_PREFIX}/{base_version}/{UPDATES_FILE}"
+
+    @staticmethod
+    def _local_files(version: str) -> Tuple[str, str]:
+        directory = os.path.join(LOCAL_MODELS_DIR, version)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, "model.arrays"), os.path.join(directory, "model.json")
+
+    @staticmethod
+    def _local_delta_files(base_version: str, sequence: int) -> Tuple[str, str]:
+        directory = os.path.join(LOCAL_MODELS_DIR, base_version, DELTAS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        return (os.path.join(directory, f"{sequence:06d}.arrays"),
+                os.path.join(directory, f"{sequence:06d}.json"))
+
+    @staticmethod
+    def _remove_local_versions(keep_version: str):
+        """Deletes the files of the other versions from LOCAL_MODELS_DIR, which is limited to the
+        /tmp of the container. The models still mapping them keep reading the deleted files
+        until they are released."""
+        for name in os.listdir(LOCAL_MODELS_DIR):
+            path = os.path.join(LOCAL_MODELS_DIR, name)
+            if name == keep_version or name == "latest.json":
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    def _read_json(self, key: str, local_file: str) -> Optional[dict]:
+        """Downloads a JSON file of the bucket, None when it does not exist."""
+        try:
+            self._s3.download_file(key, local_file)
+        except ClientError as ex:
+            if ex.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return None
+            raise
+        with open(local_file) as json_input:
+            return json.load(json_input)
+
+    def save(self, model: PlantRecommenderModel):
+        arrays_file, metadata_file = self._local_files(model.version)
+        metadata, arrays = model.to_arrays()
+        metadata["arrays"] = write_arrays(arrays, arrays_file)
+        with open(metadata_file, "w") as metadata_output:
+            json.dump(metadata, metadata_output)
+        self._s3.upload_file(arrays_file, self.arrays_key(model.version))
+        self._s3.upload_file(metadata_file, self.metadata_key(model.version))
+
+        pointer_file = os.path.join(LOCAL_MODELS_DIR, "latest.json")
+        previous = self._read_json(LATEST_MODEL_KEY, pointer_file)
+        with open(pointer_file, "w") as pointer:
+            json.dump({
+                "version": model.version,
+                "key": self.metadata_key(model.version),
+                "silhouetteScore": model.silhouetteScore,
+                "metadata": model.metadata
+            }, pointer)
+        self._s3.upload_file(pointer_file, LATEST_MODEL_KEY)
+
+        # the containers which just read the previous pointer may still load its deltas
+        self._delete_deltas(
+            {model.version} | ({split_version(previous["version"])[0]} if previous else set()))
+
+    def _delete_deltas(self, keep_versions: set):
+        prefix = f"{MODELS_PREFIX}/"
+        keys = []
+        for key in self._s3.list_files(prefix):
+            base_version, _, name = key[len(prefix):].partition("/")
+            if base_version not in keep_versions and (
+                    name == UPDATES_FILE or name.startswith(f"{DELTAS_DIR}/")):
+                keys.append(key)
+        if keys:
+            errors = self._s3.delete_files(keys)
+            if errors:
+                Logger().warning("Could not delete %d recommender model deltas", len(errors))
+
+    def latest_base_version(self) -> str:
+        """The version of the last training, without its incremental updates."""
+        pointer_file = os.path.join(LOCAL_MODELS_DIR, "latest.json")
+        self._s3.download_file(LATEST_MODEL_KEY, pointer_file)
+        with open(pointer_file) as pointer:
+            return json.load(pointer)["version"]
+
+    def latest_sequence(self, base_version: str) -> int:
+        """The number of incremental updates published for `base_version`."""
+        directory = os.path.dirname(self._local_files(base_version)[0])
+        updates = self._read_json(
+            self.updates_key(base_version), os.path.join(directory, UPDATES_FILE))
+        return updates["sequence"] if updates else 0
+
+    def latest_version(self) -> str:
+        base_version = self.latest_base_version()
+        sequence = self.latest_sequence(base_version)
+        return f"{base_version}.{sequence}" if sequence else base_version
+
+    def save_delta(self, delta: ModelDelta):
+        """Publishes the incremental update `delta` of the version it was computed from.
+
+        The delta files are uploaded first, then the `updates.json` pointer of the base is
+        moved, only if the latest version is still the one the delta follows. Otherwise, e.g.
+        when a training published a new base meanwhile, ModelVersionConflict is raised and the
+        unreferenced delta is left for the next training to delete.
+        """
+        arrays_file, metadata_file = self._local_delta_files(delta.baseVersion, delta.sequence)
+        metadata, arrays = delta.to_arrays()
+        metadata["arrays"] = write_arrays(arrays, arrays_file)
+        with open(metadata_file, "w") as metadata_output:
+            json.dump(metadata, metadata_output)
+        self._s3.upload_file(
+            arrays_file, self.delta_key(delta.baseVersion, delta.sequence, "arrays"))
+        self._s3.upload_file(
+            metadata_file, self.delta_key(delta.baseVersion, delta.sequence, "json"))
+
+        expected = (
+            f"{delta.baseVersion}.{delta.sequence - 1}" if delta.sequence > 1
+            else delta.baseVersion)
+        latest = self.latest_version()
+        if latest != expected:
+            raise ModelVersionConflict(
+                f"Recommender model {delta.version} follows {expected}, the latest is {latest}")
+
+        updates_file = os.path.join(LOCAL_MODELS_DIR, delta.baseVersion, UPDATES_FILE)
+        with open(updates_file, "w") as updates_output:
+            json.dump({
+                "version": delta.version,
+                "sequence": delta.sequence,
+                "updates": delta.updates
+            }, updates_output)
+        self._s3.upload_file(updates_file, self.updates_key(delta.baseVersion))
+
+    def load(
+            self, version: str = None, previous: PlantRecommenderModel = None
+    ) -> PlantRecommenderModel:
+        """Loads `version`, by default the latest: its base model with its deltas applied.
+
+        When `previous` is an older version of the same base, e.g. the model of a warm
+        container, only the deltas after it are read and applied to it.
+        """
+        version = version or self.latest_version()
+        base_version, sequence = split_version(version)
+        model = None
+        if previous is not None:
+            previous_base, previous_sequence = split_version(previous.version)
+            if previous_base == base_version and previous_sequence <= sequence:
+                model = previous
+        if model is None:
+            model = self._load_base(base_version)
+
+        for delta_sequence in range(split_version(model.version)[1] + 1, sequence + 1):
+            model = model.with_delta(self._load_delta(base_version, delta_sequence))
+        self._remove_local_versions(base_version)
+        return model
+
+    def _load_base(self, version: str) -> PlantRecommenderModel:
+        arrays_file, metadata_file = self._local_files(version)
+        # the metadata is downloaded last, so its presence means the blob is complete
+        if not os.path.exists(metadata_file):
+            try:
+                self._s3.download_file(self.arrays_key(version), arrays_file)
+            except ClientError:
+                return self._load_pickle(version)
+            self._s3.download_file(self.metadata_key(version), metadata_file)
+
+        with open(metadata_file) as metadata_input:
+            metadata = json.load(metadata_input)
+        return PlantRecommenderModel.from_arrays(
+            metadata, open_arrays(arrays_file, metadata.pop("arrays")))
+
+    def _load_delta(self, base_version: str, sequence: int) -> ModelDelta:
+        arrays_file, metadata_file = self._local_delta_files(base_version, sequence)
+        if not os.path.exists(metadata_file):
+            self._s3.download_file(self.delta_key(base_version, sequence, "arrays"), arrays_file)
+            self._s3.download_file(self.delta_key(base_version, sequence, "json"), metadata_file)
+
+        with open(metadata_file) as metadata_input:
+            metadata = json.load(metadata_input)
+        return ModelDelta.from_arrays(metadata, open_arrays(arrays_file, metadata.pop("arrays")))
+
+    def _load_pickle(self, version: str) -> PlantRecommenderModel:
+        local_file = os.path.join(LOCAL_MODELS_DIR, version, "model.pkl")
+        if not os.path.exists(local_file):
+            self._s3.download_file(self.model_key(version), local_file)
+        with open(local_file, "rb") as model_file:
+            return PlantRecommenderModel.from_dict(pickle.load(model_file))
+
+
+class CachedRecommenderModel:
+    """Keeps the loaded model for the lifetime of a warm container.
+
+    The latest version is re-checked at most every `refresh_seconds`. A new training is
+    downloaded again, while only the new deltas of the cached base version are.
+    """
+
+    def __init__(self, store: RecommenderModelStore = None, refresh_seconds: int = None):
+        self._store = store
+        self._model = None
+        self._checked_at = 0
+        self._refresh_seconds = (
+            refresh_seconds if refresh_seconds is not None
+            else int(os.getenv("RECOMMENDER_MODEL_REFRESH_SECONDS", "900"))
+        )
+
+    def get(self) -> PlantRecommenderModel:
+        if self._model is not None and self._checked_at + self._refresh_seconds > time.time():
+            return self._model
+
+        pinned_version = os.getenv("RECOMMENDER_MODEL_VERSION")
+        try:
+            version = pinned_version or self.store.latest_version()
+        except Exception:
+            if self._model is None:
+                raise
+            Logger().exception("Could not check the latest recommender model version")
+            return self._model
+        finally:
+            self._checked_at = time.time()
+
+        if self._model is None or self._model.version != version:
+            Logger().info("Loading recommender model %s", version)
+            self._model = self.store.load(version, previous=self._model)
+
+        return self._model
+
+    @property
+    def store(self) -> RecommenderModelStore:
+        if self._store is None:
+            self._store = RecommenderModelStore()
+        return self._store
+
+    def update(self, model: PlantRecommenderModel):
+        """Caches a version this container published, instead of loading it again."""
+        self._model = model
+        self._checked_at = time.time()
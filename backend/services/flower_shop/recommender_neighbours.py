@@ -0,0 +1,222 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import os
+import threading
+from typing import Iterator, Sequence, Tuple
+
+import numpy as np
+from boto3.dynamodb.conditions import Attr
+from threadpoolctl import threadpool_limits
+
+from bootcamp_lib.logger import Logger
+from services.flower_shop.recommender_model import PlantRecommenderModel, split_version
+from services.flower_shop.table_plant_neighbours import (
+    PlantNeighbourModel, PlantNeighboursModel, PlantNeighboursTable
+)
+
+
+DEFAULT_NEIGHBOURS = 20
+# the distance blocks are QUERY_BLOCK_SIZE x POINT_BLOCK_SIZE float32 matrices (32 MB)
+QUERY_BLOCK_SIZE = 256
+POINT_BLOCK_SIZE = 32768
+
+
+def neighbours_count_from_env() -> int:
+    """RECOMMENDER_NEIGHBOURS, the length of the precomputed lists, shared by the full
+    materialization and the incremental updates."""
+    return int(os.getenv("RECOMMENDER_NEIGHBOURS", DEFAULT_NEIGHBOURS))
+
+
+class _SharedBlasLimit:
+    """BLAS limited to one thread while at least one neighbours block is computed.
+
+    The BLAS limit is process wide: the blocks running at the same time share it, the first
+    one setting it and the last one restoring the original limits, instead of each restoring
+    what another one set.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = 0
+        self._limits = None
+
+    @contextmanager
+    def __call__(self):
+        with self._lock:
+            if not self._users:
+                self._limits = threadpool_limits(1)
+            self._users += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._users -= 1
+                if not self._users:
+                    self._limits.restore_original_limits()
+                    self._limits = None
+
+
+_single_threaded_blas = _SharedBlasLimit()
+
+
+def _neighbours_block(
+        features: np.ndarray, norms: np.ndarray, start: int, stop: int, n_neighbours: int,
+        point_block_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top `n_neighbours` rows of the queries in [start, stop), excluding the query itself.
+
+    The points are processed in blocks of `point_block_size`, merging every block into the
+    running top-N, so the memory stays at O(query block * point block).
+    """
+    queries = features[start:stop]
+    n_queries = len(queries)
+    best_distances = np.full((n_queries, n_neighbours), np.inf, dtype=np.float32)
+    best_rows = np.full((n_queries, n_neighbours), -1, dtype=np.int64)
+    query_rows = np.arange(start, stop)
+
+    for point_start in range(0, len(features), point_block_size):
+        points = features[point_start:point_start + point_block_size]
+        # ||q - p||^2 = ||q||^2 + ||p||^2 - 2 q.p, the product being the only O(n^2) part
+        squared = queries @ points.T
+        squared *= -2
+        squared += norms[start:stop, np.newaxis]
+        squared += norms[np.newaxis, point_start:point_start + len(points)]
+        np.maximum(squared, 0, out=squared)
+
+        point_rows = np.arange(point_start, point_start + len(points))
+        squared[query_rows[:, np.newaxis] == point_rows[np.newaxis, :]] = np.inf
+
+        candidates = np.concatenate((best_distances, squared), axis=1)
+        candidate_rows = np.concatenate(
+            (best_rows, np.broadcast_to(point_rows, squared.shape)), axis=1)
+        if candidates.shape[1] > n_neighbours:
+            keep = np.argpartition(candidates, n_neighbours - 1, axis=1)[:, :n_neighbours]
+            best_distances = np.take_along_axis(candidates, keep, axis=1)
+            best_rows = np.take_along_axis(candidate_rows, keep, axis=1)
+
+    order = best_distances.argsort(axis=1, kind="stable")
+    best_distances = np.sqrt(np.take_along_axis(best_distances, order, axis=1))
+    return np.take_along_axis(best_rows, order, axis=1), best_distances
+
+
+def compute_neighbours(
+        features: np.ndarray, n_neighbours: int = DEFAULT_NEIGHBOURS, max_workers: int = None,
+        query_block_size: int = QUERY_BLOCK_SIZE, point_block_size: int = POINT_BLOCK_SIZE
+) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """Computes the exact top-N neighbours of every row with blocked matrix products.
+
+    The query blocks run on a thread pool (NumPy releases the GIL during the products) with
+    BLAS limited to one thread each, so every core works on its own block. The limit is only
+    set while blocks are computed, not while the caller consumes the results.
+
+    Yields:
+        (first row, neighbour rows, distances) per query block, in row order. Missing
+        neighbours (catalogs smaller than N + 1 plants) have the row -1.
+    """
+    features = np.ascontiguousarray(features, dtype=np.float32)
+    norms = np.einsum("ij,ij->i", features, features)
+    n_neighbours = max(1, n_neighbours)
+    starts = range(0, len(features), query_block_size)
+
+    def block(start):
+        with _single_threaded_blas():
+            return start, *_neighbours_block(
+                features, norms, start, min(start + query_block_size, len(features)),
+                n_neighbours, point_block_size)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # a bounded window of pending blocks, so slow consumers (the table writes) do not let
+        # the results of the whole catalog pile up in memory
+        pending = deque()
+        for start in starts:
+            pending.append(executor.submit(block, start))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def materialize_neighbours(
+        model: PlantRecommenderModel, table: PlantNeighboursTable,
+        n_neighbours: int = DEFAULT_NEIGHBOURS, max_workers: int = None) -> int:
+    """Writes the top-N neighbours of every plant of `model` into the neighbours table, then
+    removes the items left by previous trained versions (plants deleted since). The items
+    written by the incremental updates of the same trained version, tagged "<base>.<n>", are
+    kept: they may be newer than `model`. Returns the number of plants written."""
+    # every row is read, the incremental updates are merged into the arrays first
+    model = model.compacted()
+    written = 0
+    for start, rows, distances in compute_neighbours(model.features, n_neighbours, max_workers):
+        items = []
+        for offset, (neighbour_rows, neighbour_distances) in enumerate(zip(rows, distances)):
+            found = neighbour_rows >= 0
+            items.append(PlantNeighboursModel(
+                plantID=int(model.plantIds[start + offset]),
+                modelVersion=model.version,
+                neighbours=[
+                    PlantNeighbourModel(plantID=int(plant_id), distance=round(float(distance), 6))
+                    for plant_id, distance in zip(
+                        model.plantIds[neighbour_rows[found]], neighbour_distances[found])
+                ]
+            ))
+        # batch_writer sends batches of 25 items and resends the unprocessed ones
+        table.put_items(items)
+        written += len(items)
+
+    base_version, _ = split_version(model.version)
+    current = (
+        Attr("modelVersion").eq(base_version)
+        | Attr("modelVersion").begins_with(f"{base_version}.")
+    )
+    stale_keys = [
+        {"plantID": item["plantID"]}
+        for item in table.scan_generator(projection="plantID", as_dict=True, filter=~current)
+    ]
+    if stale_keys:
+        table.delete_items(stale_keys)
+
+    Logger().info(
+        "Materialized %d neighbours for %d plants from model %s, removed %d stale plants",
+        n_neighbours, written, model.version, len(stale_keys))
+    return written
+
+
+def refresh_neighbours(
+        model: PlantRecommenderModel, table: PlantNeighboursTable, changed_vectors: np.ndarray,
+        upsert_ids: Sequence[int], removed_ids: Sequence[int], n_neighbours: int = None) -> int:
+    """Patches the precomputed neighbours after an incremental model update.
+
+    The removed plants lose their item, and the lists of the upserted plants and of the
+    plants around every changed vector are recomputed with the model KD-tree. The plants close
+    to a change are the ones whose top-N it can enter or leave, which approximates the exact
+    reverse neighbours without a full materialization. Returns the number of lists rewritten.
+    """
+    n_neighbours = n_neighbours or neighbours_count_from_env()
+    if removed_ids:
+        table.delete_items([{"plantID": int(plant_id)} for plant_id in removed_ids])
+
+    affected_ids = set(int(plant_id) for plant_id in upsert_ids)
+    if len(changed_vectors):
+        for neighbours in model.nearest_batch(changed_vectors, n_neighbours):
+            affected_ids.update(plant_id for plant_id, _ in neighbours)
+    affected_ids.difference_update(int(plant_id) for plant_id in removed_ids)
+    rows = [row for row in (model.row_of(plant_id) for plant_id in affected_ids)
+            if row is not None]
+    if not rows:
+        return 0
+
+    batch_neighbours = model.nearest_batch(
+        model.features_of(rows), n_neighbours, exclude_rows=rows)
+    table.put_items([
+        PlantNeighboursModel(
+            plantID=int(plant_id),
+            modelVersion=model.version,
+            neighbours=[
+                PlantNeighbourModel(plantID=plant_id, distance=round(distance, 6))
+                for plant_id, distance in neighbours
+            ]
+        )
+        for plant_id, neighbours in zip(model.plant_ids_of(rows), batch_neighbours)
+    ])
+    return len(rows)
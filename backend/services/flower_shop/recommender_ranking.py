@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+from services.flower_shop.recommender_filters import AGE_FIELD, RATING_FIELD
+from services.flower_shop.recommender_model import PlantRecommenderModel
+
+
+# number of nearest candidates re-ranked per requested recommendation, i.e. 5 x k candidates
+# for k recommendations, up to 500 (5 x the 100 recommendations allowed per plant)
+CANDIDATE_POOL_FACTOR = 5
+MAX_CANDIDATE_POOL = 500
+WEIGHT_PARAMS = {"distance": "distanceWeight", "rating": "ratingWeight", "age": "ageWeight"}
+
+
+@dataclass
+class RankingWeights:
+    """Weights of the hybrid ranking score of a candidate:
+
+        distance / (1 + euclidean distance) + rating * scaled rating + age * scaled age
+
+    the rating and the age being min-max scaled over the model catalog. A negative age weight
+    favours the young plants. With the default weights, the ranking is by distance only.
+    """
+    distance: float = 1.0
+    rating: float = 0.0
+    age: float = 0.0
+
+    @classmethod
+    def from_params(cls, params: dict) -> "RankingWeights":
+        """Reads the "distanceWeight", "ratingWeight" and "ageWeight" parameters, from query
+        parameters or a JSON body."""
+        weights = {}
+        for name, param in WEIGHT_PARAMS.items():
+            value = (params or {}).get(param)
+            if value in (None, ""):
+                continue
+            try:
+                weights[name] = float(value)
+            except (TypeError, ValueError):
+                weights[name] = math.nan
+            if not math.isfinite(weights[name]):
+                raise ValueError(f"Parameter '{param}' must be a number.")
+            if name == "distance" and weights[name] < 0:
+                raise ValueError(f"Parameter '{param}' must not be negative.")
+        return cls(**weights)
+
+    @property
+    def hybrid(self) -> bool:
+        return bool(self.rating or self.age)
+
+    def candidates_count(self, k: int) -> int:
+        """The number of nearest plants to re-rank for `k` recommendations."""
+        return max(k, min(k * CANDIDATE_POOL_FACTOR, MAX_CANDIDATE_POOL))
+
+
+def rank_hybrid(
+        model: PlantRecommenderModel, neighbours: List[List[Tuple[int, float]]], k: int,
+        weights: RankingWeights
+) -> List[List[Tuple[int, float, float]]]:
+    """Re-ranks the (plantID, distance) candidates of every query by their hybrid score.
+
+    The candidates of the whole batch are scored at once, as a query x candidate matrix padded
+    with -inf, and the top `k` of every row are picked with argpartition.
+    Returns (plantID, distance, score) lists, best score first.
+    """
+    width = max((len(candidates) for candidates in neighbours), default=0)
+    if not width or k <= 0:
+        return [[] for _ in neighbours]
+
+    plant_ids = np.zeros((len(neighbours), width), dtype=np.int64)
+    distances = np.full((len(neighbours), width), np.inf)
+    for query, candidates in enumerate(neighbours):
+        if candidates:
+            plant_ids[query, :len(candidates)], distances[query, :len(candidates)] = zip(
+                *candidates)
+    valid = np.isfinite(distances)
+    rows = np.zeros(plant_ids.shape, dtype=np.int64)
+    rows[valid] = model.rows_of(plant_ids[valid])
+
+    scores = np.where(valid, weights.distance / (1 + np.where(valid, distances, 0)), -np.inf)
+    columns = model.ranking_columns
+    for name, weight in ((RATING_FIELD, weights.rating), (AGE_FIELD, weights.age)):
+        if weight and name in columns:
+            scores += weight * columns[name][rows]
+
+    if width > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        distances = np.take_along_axis(distances, keep, axis=1)
+        plant_ids = np.take_along_axis(plant_ids, keep, axis=1)
+    # best score first, the closest plant breaking the ties
+    order = np.lexsort((distances, -scores), axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    distances = np.take_along_axis(distances, order, axis=1)
+    plant_ids = np.take_along_axis(plant_ids, order, axis=1)
+    return [
+        [
+            (plant_id, distance, score)
+            for plant_id, distance, score in zip(query_ids, query_distances, query_scores)
+            if math.isfinite(distance)
+        ]
+        for query_ids, query_distances, query_scores in zip(
+            plant_ids.tolist(), distances.tolist(), scores.tolist())
+    ]
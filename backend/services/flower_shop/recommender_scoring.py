@@ -0,0 +1,84 @@
+from dataclasses import dataclass, asdict
+import os
+
+import numpy as np
+from sklearn.metrics import silhouette_score
+
+
+SILHOUETTE_METHODS = ("sampled", "simplified", "exact")
+
+
+@dataclass
+class ScoringConfig:
+    """How the clustering quality is scored at training time.
+
+    - sampled: exact silhouette on a random sample of `sampleSize` rows, O(sampleSize^2)
+    - simplified: distances to the centroids instead of to every point, O(n * k)
+    - exact: silhouette on the whole matrix, O(n^2), only for small catalogs
+    """
+    method: str = "sampled"
+    sampleSize: int = 10000
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "ScoringConfig":
+        return cls(
+            method=os.getenv("RECOMMENDER_SILHOUETTE_METHOD", cls.method),
+            sampleSize=int(os.getenv("RECOMMENDER_SILHOUETTE_SAMPLE_SIZE", cls.sampleSize)),
+            seed=int(os.getenv("RECOMMENDER_SILHOUETTE_SEED", cls.seed))
+        )
+
+
+def simplified_silhouette(
+        data_matrix: np.ndarray, labels: np.ndarray, centroids: np.ndarray,
+        chunk_size: int = 65536) -> float:
+    """Silhouette computed against the centroids: a = distance to the own centroid,
+    b = distance to the closest other centroid. Runs in chunks to keep memory at O(chunk * k).
+    """
+    n_rows = len(data_matrix)
+    total = 0.0
+    for start in range(0, n_rows, chunk_size):
+        block = data_matrix[start:start + chunk_size]
+        block_labels = labels[start:start + chunk_size]
+        distances = np.linalg.norm(block[:, np.newaxis, :] - centroids[np.newaxis], axis=2)
+
+        rows = np.arange(len(block))
+        own = distances[rows, block_labels]
+        distances[rows, block_labels] = np.inf
+        other = distances.min(axis=1)
+
+        denominator = np.maximum(own, other)
+        scores = np.divide(
+            other - own, denominator, out=np.zeros_like(own), where=denominator > 0)
+        total += float(scores.sum())
+    return total / n_rows
+
+
+def score_clustering(
+        data_matrix: np.ndarray, labels: np.ndarray, centroids: np.ndarray,
+        config: ScoringConfig = None) -> dict:
+    """Scores a fitted clustering and returns the score with the settings used to compute it,
+    so they can be stored in the model metadata."""
+    config = config or ScoringConfig()
+    if config.method not in SILHOUETTE_METHODS:
+        raise ValueError(f"Unknown silhouette method {config.method}")
+
+    n_rows = len(data_matrix)
+    n_clusters = len(np.unique(labels))
+    result = asdict(config)
+    if not 1 < n_clusters < n_rows:
+        result["silhouetteScore"] = None
+        return result
+
+    if config.method == "simplified":
+        score = simplified_silhouette(data_matrix, labels, centroids)
+        result["sampleSize"] = n_rows
+    elif config.method == "sampled" and n_rows > config.sampleSize:
+        score = silhouette_score(
+            data_matrix, labels, sample_size=config.sampleSize, random_state=config.seed)
+    else:
+        score = silhouette_score(data_matrix, labels)
+        result["sampleSize"] = n_rows
+
+    result["silhouetteScore"] = float(score)
+    return result
@@ -0,0 +1,125 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+from typing import Iterable, List
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+from bootcamp_lib.logger import Logger
+from services.flower_shop.recommender_scoring import ScoringConfig, score_clustering
+
+
+# Candidates whose silhouette is within this distance of the best one are considered equally
+# good, and the one closest to the inertia elbow wins
+SILHOUETTE_TOLERANCE = 0.02
+
+# Data shared with the worker processes, set once per process by `_init_worker`
+_worker_matrix = None
+_worker_scoring = None
+
+
+def _init_worker(data_matrix: np.ndarray, scoring: ScoringConfig):
+    global _worker_matrix, _worker_scoring
+    _worker_matrix = data_matrix
+    _worker_scoring = scoring
+
+    # every process fits its own candidate, so BLAS/OpenMP must not spawn threads on top
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+
+
+def _evaluate_worker(n_clusters: int) -> dict:
+    return evaluate_cluster_count(_worker_matrix, n_clusters, _worker_scoring)
+
+
+def evaluate_cluster_count(
+        data_matrix: np.ndarray, n_clusters: int, scoring: ScoringConfig = None) -> dict:
+    kmeans = KMeans(n_clusters=n_clusters, random_state=0, n_init=10)
+    kmeans.fit(data_matrix)
+    scores = score_clustering(data_matrix, kmeans.labels_, kmeans.cluster_centers_, scoring)
+
+    return {
+        "nClusters": n_clusters,
+        "inertia": float(kmeans.inertia_),
+        "silhouetteScore": scores["silhouetteScore"],
+        "silhouette": scores,
+        "centroids": kmeans.cluster_centers_
+    }
+
+
+def assign_clusters(
+        data_matrix: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """Labels every row with its closest centroid, in chunks of `chunk_size` rows."""
+    labels = np.empty(len(data_matrix), dtype=np.int32)
+    for start in range(0, len(data_matrix), chunk_size):
+        block = data_matrix[start:start + chunk_size]
+        distances = np.linalg.norm(block[:, np.newaxis, :] - centroids[np.newaxis], axis=2)
+        labels[start:start + chunk_size] = distances.argmin(axis=1)
+    return labels
+
+
+def elbow_cluster_count(candidates: List[dict]) -> int:
+    """Returns the k farthest from the line joining the first and last (k, inertia) points."""
+    if len(candidates) < 3:
+        return candidates[0]["nClusters"]
+
+    ks = np.array([candidate["nClusters"] for candidate in candidates], dtype=np.float64)
+    inertias = np.array([candidate["inertia"] for candidate in candidates], dtype=np.float64)
+    # normalize both axes, otherwise the inertia scale dominates the distance
+    ks = (ks - ks[0]) / (ks[-1] - ks[0])
+    span = inertias[0] - inertias[-1]
+    inertias = (inertias - inertias[-1]) / span if span > 0 else np.zeros_like(inertias)
+
+    distances = np.abs(ks + inertias - 1) / np.sqrt(2)
+    return candidates[int(np.argmax(distances))]["nClusters"]
+
+
+def select_cluster_count(
+        data_matrix: np.ndarray, cluster_counts: Iterable[int], scoring: ScoringConfig = None,
+        max_workers: int = None) -> dict:
+    """Fits K-Means for every candidate k on a process pool and picks the best one.
+
+    The best k has the highest silhouette score, ties (within SILHOUETTE_TOLERANCE) being
+    broken by the distance to the inertia elbow.
+
+    Returns:
+        {"nClusters": best k, "elbow": elbow k, "centroids", "inertia" and "silhouette" of
+         the best k, "candidates": [{"nClusters", "inertia", "silhouetteScore"}, ...]}
+    """
+    cluster_counts = sorted({k for k in cluster_counts if 1 < k < len(data_matrix)})
+    if not cluster_counts:
+        raise ValueError("No valid cluster count to evaluate")
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(cluster_counts))
+    try:
+        with ProcessPoolExecutor(
+                max_workers=max_workers, initializer=_init_worker,
+                initargs=(data_matrix, scoring)) as executor:
+            candidates = list(executor.map(_evaluate_worker, cluster_counts))
+    except (OSError, NotImplementedError) as ex:
+        # AWS Lambda has no /dev/shm, so multiprocessing primitives are not available there
+        Logger().warning("Process pool unavailable (%s), evaluating candidates serially", ex)
+        candidates = [evaluate_cluster_count(data_matrix, k, scoring) for k in cluster_counts]
+
+    elbow = elbow_cluster_count(candidates)
+    scored = [c for c in candidates if c["silhouetteScore"] is not None]
+    if scored:
+        best_score = max(c["silhouetteScore"] for c in scored)
+        close_to_best = [
+            c for c in scored if c["silhouetteScore"] >= best_score - SILHOUETTE_TOLERANCE]
+        best = min(close_to_best, key=lambda c: (abs(c["nClusters"] - elbow), c["nClusters"]))
+    else:
+        best = next(c for c in candidates if c["nClusters"] == elbow)
+
+    Logger().info("Selected %d clusters (elbow at %d)", best["nClusters"], elbow)
+    return {
+        "nClusters": best["nClusters"],
+        "elbow": elbow,
+        "centroids": best["centroids"],
+        "inertia": best["inertia"],
+        "silhouette": best["silhouette"],
+        "candidates": [
+            {key: candidate[key] for key in ("nClusters", "inertia", "silhouetteScore")}
+            for candidate in candidates
+        ]
+    }
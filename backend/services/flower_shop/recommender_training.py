@@ -0,0 +1,267 @@
+from datetime import datetime, timezone
+from itertools import islice
+import os
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from bootcamp_lib.logger import Logger
+from services.flower_shop.recommender_features import (
+    CATEGORICAL_FEATURES, NUMERIC_ATTRIBUTES, NUMERIC_FEATURES, ORDINAL_FEATURES,
+    PlantFeatureBuilder, plant_columns
+)
+from services.flower_shop.recommender_filters import attribute_columns, concatenate_attributes
+from services.flower_shop.recommender_model import PlantRecommenderModel, new_model_version
+from services.flower_shop.recommender_scoring import ScoringConfig, score_clustering
+from services.flower_shop.recommender_selection import assign_clusters, select_cluster_count
+from services.flower_shop.table_plant_data import PlantDataTable, PlantDataModel
+
+
+DEFAULT_CLUSTERS = 3
+DEFAULT_CLUSTER_RANGE = (2, 10)
+DEFAULT_PAGE_SIZE = 5000
+TRAINING_MODES = ("batch", "streaming")
+
+TRAINING_FIELDS = (
+    ("plantID",) + NUMERIC_FEATURES + tuple(ORDINAL_FEATURES) + CATEGORICAL_FEATURES
+    + NUMERIC_ATTRIBUTES
+)
+
+
+def cluster_range_from_env() -> Tuple[int, int]:
+    """Reads RECOMMENDER_CLUSTER_RANGE, formatted as "<min>-<max>" (e.g. "2-10")."""
+    value = os.getenv("RECOMMENDER_CLUSTER_RANGE")
+    if not value:
+        return DEFAULT_CLUSTER_RANGE
+    min_clusters, max_clusters = (int(bound) for bound in value.split("-"))
+    return min_clusters, max_clusters
+
+
+def training_mode_from_env() -> str:
+    mode = os.getenv("RECOMMENDER_TRAINING_MODE", "batch")
+    if mode not in TRAINING_MODES:
+        raise ValueError(f"Unknown training mode {mode}")
+    return mode
+
+
+def fetch_training_plants(table: PlantDataTable) -> List[PlantDataModel]:
+    return table.scan(wire=True)
+
+
+def iter_training_pages(
+        table: PlantDataTable, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[dict]]:
+    """Scans the plant table lazily, yielding the training fields in pages of `page_size`."""
+    names = {f"#{field}": field for field in TRAINING_FIELDS}
+    items = table.scan_generator(projection=",".join(names), as_dict=True, names=names)
+    return iter_pages(items, page_size)
+
+
+def iter_pages(items: Iterable, page_size: int) -> Iterator[list]:
+    items = iter(items)
+    while True:
+        page = list(islice(items, page_size))
+        if not page:
+            return
+        yield page
+
+
+def apply_kmeans(
+        data_matrix: np.ndarray, n_clusters: int = DEFAULT_CLUSTERS,
+        scoring: ScoringConfig = None) -> dict:
+    kmeans = KMeans(n_clusters=n_clusters, random_state=0, n_init=10)
+    kmeans.fit(data_matrix)
+
+    return {
+        "centroids": kmeans.cluster_centers_,
+        "labels": kmeans.labels_,
+        "inertia": float(kmeans.inertia_),
+        "scoring": score_clustering(
+            data_matrix, kmeans.labels_, kmeans.cluster_centers_, scoring)
+    }
+
+
+def train_model(
+        plants: List[PlantDataModel], n_clusters: int = None,
+        cluster_range: Tuple[int, int] = None, scoring: ScoringConfig = None,
+        max_workers: int = None
+) -> PlantRecommenderModel:
+    """Fits the recommender on the given plants and returns a new model version.
+
+    When `n_clusters` is not given, every k in `cluster_range` (inclusive) is evaluated on a
+    process pool and the best one is kept, see `select_cluster_count`.
+    """
+    plant_ids = np.fromiter(
+        (plant.plantID for plant in plants), dtype=np.int64, count=len(plants))
+    return train_model_from_columns(
+        plant_ids, plant_columns(plants), n_clusters, cluster_range, scoring, max_workers)
+
+
+def train_model_from_columns(
+        plant_ids: np.ndarray, columns: Dict[str, np.ndarray], n_clusters: int = None,
+        cluster_range: Tuple[int, int] = None, scoring: ScoringConfig = None,
+        max_workers: int = None
+) -> PlantRecommenderModel:
+    """`train_model` for plants already read into columns, see `plant_columns`."""
+    scoring = scoring or ScoringConfig.from_env()
+    min_clusters = n_clusters or (cluster_range or cluster_range_from_env())[0]
+    if len(plant_ids) <= min_clusters:
+        raise ValueError(
+            f"More than {min_clusters} plants are required for training, got {len(plant_ids)}")
+
+    builder = PlantFeatureBuilder()
+    data_matrix = builder.fit_transform(columns)
+
+    if n_clusters:
+        kmeans_result = apply_kmeans(data_matrix, n_clusters, scoring)
+        metadata = {
+            "nClusters": n_clusters,
+            "inertia": kmeans_result["inertia"],
+            "silhouette": kmeans_result["scoring"]
+        }
+        labels, centroids = kmeans_result["labels"], kmeans_result["centroids"]
+    else:
+        min_clusters, max_clusters = cluster_range or cluster_range_from_env()
+        selection = select_cluster_count(
+            data_matrix, range(min_clusters, max_clusters + 1), scoring, max_workers)
+        metadata = {
+            "nClusters": selection["nClusters"],
+            "inertia": selection["inertia"],
+            "silhouette": selection["silhouette"],
+            "clusterSelection": {
+                "elbow": selection["elbow"],
+                "candidates": selection["candidates"]
+            }
+        }
+        centroids = selection["centroids"]
+        labels = assign_clusters(data_matrix, centroids)
+
+    model = PlantRecommenderModel(
+        version=new_model_version(),
+        trainedAt=datetime.now(timezone.utc).isoformat(),
+        plantIds=plant_ids,
+        labels=labels.astype(np.int32),
+        centroids=centroids,
+        scaler=builder.to_dict(),
+        features=data_matrix,
+        silhouetteScore=metadata["silhouette"]["silhouetteScore"],
+        metadata=metadata,
+        attributes=attribute_columns(builder, columns)
+    )
+    Logger().info(
+        "Trained recommender model %s on %d plants with %d clusters (silhouette score %s)",
+        model.version, len(plant_ids), metadata["nClusters"], model.silhouetteScore)
+    return model
+
+
+def train_model_streaming(
+        table: PlantDataTable, n_clusters: int = None, page_size: int = DEFAULT_PAGE_SIZE,
+        scoring: ScoringConfig = None, epochs: int = 1, work_dir: str = None
+) -> PlantRecommenderModel:
+    """Fits the recommender with MiniBatchKMeans without loading the whole table in memory.
+
+    The table is scanned twice: the first scan fits the feature scaler and categories, the
+    second one encodes every page, updates the clusters with `partial_fit` and appends the
+    features to a memory mapped file under `work_dir`. Further epochs and the final labelling
+    read that file back in pages, so the resident memory is bounded by `page_size`.
+    Without a `work_dir`, the files go to a temporary directory deleted before returning: the
+    returned model keeps reading its memory maps, the space being freed once they are closed.
+
+    The cluster count is not selected in this mode, `n_clusters` defaults to DEFAULT_CLUSTERS.
+    """
+    n_clusters = n_clusters or DEFAULT_CLUSTERS
+    builder = PlantFeatureBuilder()
+    for page in iter_training_pages(table, page_size):
+        builder.partial_fit(plant_columns(page))
+    if builder.samples_seen <= n_clusters:
+        raise ValueError(
+            f"More than {n_clusters} plants are required for training, got {builder.samples_seen}")
+    builder.finish_fit()
+
+    if work_dir is not None:
+        return _fit_streaming(table, builder, n_clusters, page_size, scoring, epochs, work_dir)
+    with tempfile.TemporaryDirectory(prefix="recommender_") as work_dir:
+        return _fit_streaming(table, builder, n_clusters, page_size, scoring, epochs, work_dir)
+
+
+def _fit_streaming(
+        table: PlantDataTable, builder: PlantFeatureBuilder, n_clusters: int, page_size: int,
+        scoring: ScoringConfig, epochs: int, work_dir: str
+) -> PlantRecommenderModel:
+    features_file = os.path.join(work_dir, "features.f32")
+    ids_file = os.path.join(work_dir, "plant_ids.i64")
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_clusters, random_state=0, batch_size=page_size, n_init=3)
+
+    # the centroids are initialized on the first `partial_fit` batch, which therefore buffers
+    # pages until it holds a few rows per cluster (3 * k, like the sklearn init_size)
+    init_size = 3 * n_clusters
+    pending = np.empty((0, builder.width), dtype=np.float32)
+    kmeans_initialized = False
+    attribute_blocks = []
+    n_rows = 0
+    with open(features_file, "wb") as features_out, open(ids_file, "wb") as ids_out:
+        for page in iter_training_pages(table, page_size):
+            columns = plant_columns(page)
+            block = builder.transform(columns)
+            block.tofile(features_out)
+            # a few bytes per plant, small enough to stay in memory
+            attribute_blocks.append(attribute_columns(builder, columns))
+            np.fromiter(
+                (int(item["plantID"]) for item in page), dtype=np.int64, count=len(page)
+            ).tofile(ids_out)
+            n_rows += len(page)
+
+            if kmeans_initialized:
+                kmeans.partial_fit(block)
+                continue
+            pending = np.concatenate((pending, block))
+            if len(pending) >= init_size:
+                kmeans.partial_fit(pending)
+                kmeans_initialized = True
+                pending = pending[:0]
+    if len(pending):
+        kmeans.partial_fit(pending)
+
+    data_matrix = np.memmap(
+        features_file, dtype=np.float32, mode="r", shape=(n_rows, builder.width))
+    plant_ids = np.memmap(ids_file, dtype=np.int64, mode="r", shape=(n_rows,))
+
+    for _ in range(epochs - 1):
+        for start in range(0, n_rows, page_size):
+            kmeans.partial_fit(data_matrix[start:start + page_size])
+
+    centroids = kmeans.cluster_centers_
+    labels = np.empty(n_rows, dtype=np.int32)
+    inertia = 0.0
+    for start in range(0, n_rows, page_size):
+        block = data_matrix[start:start + page_size]
+        distances = np.linalg.norm(block[:, np.newaxis, :] - centroids[np.newaxis], axis=2)
+        labels[start:start + page_size] = distances.argmin(axis=1)
+        inertia += float((distances.min(axis=1) ** 2).sum())
+
+    silhouette = score_clustering(
+        data_matrix, labels, centroids, scoring or ScoringConfig.from_env())
+    metadata = {
+        "nClusters": n_clusters,
+        "inertia": inertia,
+        "silhouette": silhouette,
+        "training": {"mode": "streaming", "pageSize": page_size, "epochs": epochs}
+    }
+    model = PlantRecommenderModel(
+        version=new_model_version(),
+        trainedAt=datetime.now(timezone.utc).isoformat(),
+        plantIds=plant_ids,
+        labels=labels,
+        centroids=centroids,
+        scaler=builder.to_dict(),
+        features=data_matrix,
+        silhouetteScore=silhouette["silhouetteScore"],
+        metadata=metadata,
+        attributes=concatenate_attributes(attribute_blocks)
+    )
+    Logger().info(
+        "Trained recommender model %s on %d streamed plants with %d clusters "
+        "(silhouette score %s)", model.version, n_rows, n_clusters, model.silhouetteScore)
+    return model
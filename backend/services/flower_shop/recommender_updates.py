@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+import os
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from dynamodb_json import json_util
+
+from bootcamp_lib.logger import Logger
+from services.flower_shop.recommender_features import PlantRecord, plant_columns
+from services.flower_shop.recommender_filters import attribute_columns
+from services.flower_shop.recommender_model import ModelDelta, PlantRecommenderModel
+
+
+@dataclass
+class DriftConfig:
+    """When the incremental updates stop approximating a refit well enough.
+
+    - maxChangeRatio: plants inserted, modified or removed since the training, over the number
+      of plants the model was trained on
+    - maxCostRatio: mean squared distance of the incrementally assigned plants to their
+      centroid, over the same mean for the trained plants
+    """
+    maxChangeRatio: float = 0.2
+    maxCostRatio: float = 1.5
+
+    @classmethod
+    def from_env(cls) -> "DriftConfig":
+        return cls(
+            maxChangeRatio=float(
+                os.getenv("RECOMMENDER_DRIFT_MAX_CHANGE_RATIO", cls.maxChangeRatio)),
+            maxCostRatio=float(os.getenv("RECOMMENDER_DRIFT_MAX_COST_RATIO", cls.maxCostRatio))
+        )
+
+
+@dataclass
+class PlantChanges:
+    upserts: Dict[int, PlantRecord]
+    removedIds: List[int]
+
+
+def plant_changes_from_stream(records: Sequence[dict]) -> PlantChanges:
+    """Reduces a batch of DynamoDB stream records to the latest state of every plant."""
+    upserts = {}
+    removed = {}
+    for record in records:
+        image = record.get("dynamodb", {})
+        if record.get("eventName") == "REMOVE":
+            plant_id = int(json_util.loads(image["Keys"], as_dict=True)["plantID"])
+            upserts.pop(plant_id, None)
+            removed[plant_id] = True
+        elif "NewImage" in image:
+            plant = json_util.loads(image["NewImage"], as_dict=True)
+            upserts[int(plant["plantID"])] = plant
+            removed.pop(int(plant["plantID"]), None)
+    return PlantChanges(upserts=upserts, removedIds=list(removed))
+
+
+def update_statistics(model: PlantRecommenderModel) -> dict:
+    """The incremental update counters of `model`, starting from its training statistics."""
+    if "updates" in model.metadata:
+        return dict(model.metadata["updates"])
+    trained_plants = model.plants_count
+    return {
+        "baseVersion": model.version,
+        "sequence": 0,
+        "trainedPlants": trained_plants,
+        "trainedCost": model.metadata.get("inertia", 0.0) / max(trained_plants, 1),
+        "changedPlants": 0,
+        "assignedPlants": 0,
+        "assignedCost": 0.0,
+        "retrainRequested": False
+    }
+
+
+def apply_plant_changes(
+        model: PlantRecommenderModel, changes: PlantChanges
+) -> Tuple[PlantRecommenderModel, np.ndarray, ModelDelta]:
+    """Computes the delta assigning the changed plants to their nearest centroid and dropping
+    the removed ones, and returns the model with the delta applied. The centroids and the
+    scaler are not refitted.
+
+    Also returns the feature vectors of every changed plant, as they were before the removals
+    and after the upserts, to find the plants whose neighbours may have changed.
+    """
+    builder = model.feature_builder
+    upsert_ids = list(changes.upserts)
+    columns = plant_columns(list(changes.upserts.values()))
+    vectors = (
+        builder.transform(columns) if upsert_ids
+        else np.empty((0, builder.width), dtype=np.float32)
+    )
+    labels = model.nearest_clusters(vectors) if upsert_ids else np.empty(0, dtype=np.int32)
+    costs = ((vectors - model.centroids[labels]) ** 2).sum(axis=1)
+
+    removed_rows = [
+        row for row in (model.row_of(plant_id) for plant_id in changes.removedIds)
+        if row is not None
+    ]
+
+    statistics = update_statistics(model)
+    statistics["sequence"] += 1
+    statistics["changedPlants"] += len(upsert_ids) + len(removed_rows)
+    statistics["assignedPlants"] += len(upsert_ids)
+    statistics["assignedCost"] += float(costs.sum())
+
+    delta = ModelDelta(
+        baseVersion=statistics["baseVersion"],
+        sequence=statistics["sequence"],
+        plantIds=np.array(upsert_ids, dtype=np.int64),
+        labels=labels.astype(model.labels.dtype),
+        features=vectors.astype(model.features.dtype, copy=False),
+        removedIds=np.array(changes.removedIds, dtype=np.int64),
+        attributes=attribute_columns(builder, columns) if model.attributes else {},
+        updates=statistics
+    )
+    updated = model.with_delta(delta)
+    changed_vectors = np.concatenate((model.features_of(removed_rows), delta.features))
+
+    Logger().info(
+        "Updated recommender model %s to %s: %d plants upserted, %d removed",
+        model.version, updated.version, len(upsert_ids), len(removed_rows))
+    return updated, changed_vectors, delta
+
+
+def drift_ratios(statistics: dict) -> dict:
+    change_ratio = statistics["changedPlants"] / max(statistics["trainedPlants"], 1)
+    cost_ratio = 0.0
+    if statistics["assignedPlants"] and statistics["trainedCost"] > 0:
+        cost_ratio = (
+            statistics["assignedCost"] / statistics["assignedPlants"] / statistics["trainedCost"])
+    return {"changeRatio": change_ratio, "costRatio": cost_ratio}
+
+
+def drift_exceeded(model: PlantRecommenderModel, config: DriftConfig = None) -> bool:
+    config = config or DriftConfig.from_env()
+    ratios = drift_ratios(update_statistics(model))
+    return (ratios["changeRatio"] > config.maxChangeRatio
+            or ratios["costRatio"] > config.maxCostRatio)
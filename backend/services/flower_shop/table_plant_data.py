@@ -56,7 +56,7 @@ class PlantDataModel(DynamoDbModel):
 
 
 class PlantDataTable(DynamodbTable[PlantDataModel]):
-    table = "plant"
+    table = "plant-new"
     model_type = PlantDataModel
 
 
@@ -67,6 +67,9 @@ class PlantDataCache(DynamodbCachedTable[PlantDataModel]):
         self._table = PlantDataTable(dynamodb_resource)
         self._items = dict()
 
+    def _scan(self):
+        self._items = {plant.plantID: plant for plant in self._table.scan_generator(wire=True)}
+
     def _get_items(self, keys: List[dict]):
         plants = self._table.get_items(keys)
         for plant in plants:
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+
+from bootcamp_lib.dynamodb import DynamodbTable
+from services.flower_shop.table_plant_data import PlantDataModel
+
+
+@dataclass
+class PlantDataModelDeprecated(PlantDataModel):
+    idPlant: str = ""
+
+
+class PlantDataTableDeprecated(DynamodbTable[PlantDataModelDeprecated]):
+    """The plant table keyed by the idPlant string, replaced by `PlantDataTable`."""
+    table = "plant"
+    model_type = PlantDataModelDeprecated
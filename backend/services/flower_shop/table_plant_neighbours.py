@@ -0,0 +1,33 @@
+from typing import ClassVar, List
+from dataclasses import dataclass, field
+
+from bootcamp_lib.dynamodb_model import DynamoDbModel
+from bootcamp_lib.dynamodb import DynamodbTable
+
+
+@dataclass
+class PlantNeighbourModel(DynamoDbModel):
+    plantID: int = 0
+    distance: float = 0.0
+
+
+@dataclass
+class PlantNeighboursModel(DynamoDbModel):
+    plantID: int = 0
+    modelVersion: str = ""
+    neighbours: List[PlantNeighbourModel] = field(default_factory=list)
+
+    _validations: ClassVar[dict] = {
+        "plantID": {
+            "required": True
+        },
+        "modelVersion": {
+            "required": True
+        }
+    }
+
+
+class PlantNeighboursTable(DynamodbTable[PlantNeighboursModel]):
+    """Top-N neighbours of every plant, materialized offline from the recommender model."""
+    table = "plant_neighbours"
+    model_type = PlantNeighboursModel
@@ -10,3 +10,7 @@ def generate_signed_url(bucket_name, object_key, expiration=3600):
         Params={'Bucket': bucket_name, 'Key': object_key},
         ExpiresIn=expiration
     )
+
+
+def plant_image_key(plant_name: str) -> str:
+    return f"FlowerShop/PlantImages/{plant_name.replace(' ', '')}.png"
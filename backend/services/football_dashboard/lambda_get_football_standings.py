@@ -33,7 +33,7 @@ def compute_standings() -> List[FootballStanding]:
     football_games_table = FootballGamesTable(dynamodb_res)
 
     try:
-        games = football_games_table.scan(as_dict=True)
+        games = football_games_table.parallel_scan(as_dict=True)
     except Exception as e:
         Logger().exception("Failed to scan football games from DynamoDB: " + e)
         raise InternalServerErrorException("Unable to retrieve football games from the database.")
@@ -69,9 +69,9 @@ def compute_standings() -> List[FootballStanding]:
 
     standings_list = list(standings.values())
 
+    # the parallel scan returns the games in no particular order, the team id breaks the ties
     standings_list.sort(
-        key=lambda x: (x['points'], x['goals_scored'] - x['goals_conceded']),
-        reverse=True
+        key=lambda x: (-x['points'], x['goals_conceded'] - x['goals_scored'], x['team_id'])
     )
 
     for idx, team in enumerate(standings_list):
@@ -29,7 +29,7 @@ def compute_top_goal_scorers() -> List[TopGoalScorer]:
     football_games_table = FootballGamesTable(dynamodb_res)
 
     try:
-        games = football_games_table.scan(as_dict=True)
+        games = football_games_table.parallel_scan(as_dict=True)
     except Exception as e:
         Logger().exception("Failed to retrieve football games from DynamoDB: " + e)
         raise InternalServerErrorException("Error retrieving football games from the database.")
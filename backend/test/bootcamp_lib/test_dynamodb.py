@@ -0,0 +1,319 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import List, Optional
+
+import boto3
+import pytest
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.config import Config
+from moto import mock_dynamodb
+
+from bootcamp_lib.dynamodb import DynamodbTable
+from bootcamp_lib.dynamodb_model import DynamoDbModel
+
+
+@dataclass
+class ItemModel(DynamoDbModel):
+    itemId: int = 0
+    category: str = ""
+
+
+class ItemsTable(DynamodbTable[ItemModel]):
+    table = "items"
+    model_type = ItemModel
+
+
+class SegmentedTable:
+    """The moto version in use returns the whole table for every segment: the items are split
+    by itemId here, as DynamoDB splits them by key hash."""
+
+    def __init__(self, table):
+        self._table = table
+
+    def __getattr__(self, name):
+        return getattr(self._table, name)
+
+    def scan(self, Segment, TotalSegments, **params):
+        result = self._table.scan(**params)
+        result["Items"] = [
+            item for item in result["Items"] if int(item["itemId"]) % TotalSegments == Segment]
+        return result
+
+
+@pytest.fixture(scope="function")
+def items_table(aws_credentials, monkeypatch):
+    with mock_dynamodb():
+        dynamodb = boto3.resource("dynamodb", region_name="eu-west-1")
+        dynamodb.create_table(
+            TableName="test-items",
+            AttributeDefinitions=[{"AttributeName": "itemId", "AttributeType": "N"}],
+            KeySchema=[{"AttributeName": "itemId", "KeyType": "HASH"}],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        table = ItemsTable(dynamodb)
+        table.put_items([
+            {"itemId": item_id, "category": "even" if item_id % 2 == 0 else "odd"}
+            for item_id in range(1, 201)
+        ])
+        segment_table = table._thread_table
+        monkeypatch.setattr(table, "_thread_table", lambda: SegmentedTable(segment_table()))
+        yield table
+
+
+def test_parallel_scan(items_table):
+    items = items_table.parallel_scan(total_segments=4, max_workers=2)
+
+    assert sorted(item.itemId for item in items) == list(range(1, 201))
+    assert all(isinstance(item, ItemModel) for item in items)
+
+
+def test_parallel_scan_filter_and_projection(items_table):
+    items = items_table.parallel_scan(
+        total_segments=3, projection="itemId", as_dict=True, filter=Attr("category").eq("even"))
+
+    assert sorted(int(item["itemId"]) for item in items) == list(range(2, 201, 2))
+    assert all(list(item) == ["itemId"] for item in items)
+
+
+def test_parallel_scan_generator_stops_early(items_table):
+    items = items_table.parallel_scan_generator(total_segments=4, max_pages=1)
+    first = [next(items) for _ in range(5)]
+    items.close()
+
+    assert len({item.itemId for item in first}) == 5
+
+
+def test_parallel_scan_threads_share_the_table_client(aws_credentials):
+    with mock_dynamodb():
+        dynamodb = boto3.resource(
+            "dynamodb", region_name="eu-west-1", endpoint_url="https://localhost:8000",
+            config=Config(read_timeout=7))
+        table = ItemsTable(dynamodb)
+
+        thread_table = table._thread_table()
+        client = thread_table._client
+        assert table._thread_table() is thread_table and table._wire_table()._client is client
+        # a wire format client, not the one of the resource, with the resource configuration
+        assert client is not dynamodb.meta.client
+        assert client.meta.config.read_timeout == 7
+        assert client.meta.region_name == "eu-west-1"
+        assert client.meta.endpoint_url == "https://localhost:8000"
+
+
+def test_get_items_ordered(items_table):
+    keys = [{"itemId": item_id} for item_id in (150, 3, 999, 3, 42)]
+
+    items = items_table.get_items(keys, ordered=True)
+
+    assert [item.itemId if item else None for item in items] == [150, 3, None, 42]
+
+
+def test_get_items_concurrent_batches(items_table):
+    items = items_table.get_items(
+        [{"itemId": item_id} for item_id in range(1, 251)], as_dict=True, max_workers=3)
+
+    assert sorted(int(item["itemId"]) for item in items) == list(range(1, 201))
+
+
+def test_get_items_retries_unprocessed_keys(items_table, monkeypatch):
+    import bootcamp_lib.dynamodb as dynamodb
+    client = items_table._client()
+    batch_get_item = client.batch_get_item
+    calls = []
+
+    def throttled_batch_get_item(RequestItems):
+        # the first call only processes the first key
+        calls.append(RequestItems)
+        request = RequestItems["test-items"]
+        if len(calls) > 1:
+            return batch_get_item(RequestItems=RequestItems)
+        response = batch_get_item(
+            RequestItems={"test-items": dict(request, Keys=request["Keys"][:1])})
+        response["UnprocessedKeys"] = {"test-items": dict(request, Keys=request["Keys"][1:])}
+        return response
+
+    monkeypatch.setattr(client, "batch_get_item", throttled_batch_get_item)
+    monkeypatch.setattr(dynamodb, "BATCH_GET_BASE_DELAY", 0)
+
+    items = items_table.get_items([{"itemId": item_id} for item_id in (1, 2, 3)])
+
+    assert sorted(item.itemId for item in items) == [1, 2, 3]
+    assert [len(call["test-items"]["Keys"]) for call in calls] == [3, 2]
+
+
+def test_get_items_raises_when_keys_stay_unprocessed(items_table, monkeypatch):
+    import bootcamp_lib.dynamodb as dynamodb
+    client = items_table._client()
+    monkeypatch.setattr(client, "batch_get_item", lambda RequestItems: {
+        "Responses": {}, "UnprocessedKeys": RequestItems})
+    monkeypatch.setattr(dynamodb, "BATCH_GET_BASE_DELAY", 0)
+
+    with pytest.raises(dynamodb.UnprocessedKeysError):
+        items_table.get_items([{"itemId": 1}])
+
+
+@dataclass
+class EventModel(DynamoDbModel):
+    userId: str = ""
+    eventId: int = 0
+
+
+class EventsTable(DynamodbTable[EventModel]):
+    table = "events"
+    model_type = EventModel
+
+
+@pytest.fixture(scope="function")
+def events_table(aws_credentials):
+    with mock_dynamodb():
+        dynamodb = boto3.resource("dynamodb", region_name="eu-west-1")
+        dynamodb.create_table(
+            TableName="test-events",
+            AttributeDefinitions=[
+                {"AttributeName": "userId", "AttributeType": "S"},
+                {"AttributeName": "eventId", "AttributeType": "N"}
+            ],
+            KeySchema=[
+                {"AttributeName": "userId", "KeyType": "HASH"},
+                {"AttributeName": "eventId", "KeyType": "RANGE"}
+            ],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        table = EventsTable(dynamodb)
+        table.put_items([
+            {"userId": user_id, "eventId": event_id}
+            for user_id in ("a", "b") for event_id in range(1, 31)
+        ])
+        yield table
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_query_generator(events_table, prefetch):
+    events = events_table.query_generator(Key("userId").eq("a"), page_size=7, prefetch=prefetch)
+
+    assert [(event.userId, event.eventId) for event in events] == [
+        ("a", event_id) for event_id in range(1, 31)]
+
+
+def test_query_generator_reuses_the_table_client(events_table, monkeypatch):
+    from bootcamp_lib import dynamodb
+    created = []
+    make_client = dynamodb.plain_client
+    monkeypatch.setattr(
+        dynamodb, "plain_client",
+        lambda *args: created.append(1) or make_client(*args))
+
+    for user_id in ("a", "b", "a"):
+        events = list(events_table.query_generator(Key("userId").eq(user_id), page_size=7))
+        assert [event.eventId for event in events] == list(range(1, 31))
+
+    assert created == [1]
+
+
+def test_query_generator_size(events_table):
+    events = list(events_table.query_generator(
+        Key("userId").eq("b"), as_dict=True, size=10, page_size=7, sort_desc=True))
+
+    # the fetching stops after the page going over `size`
+    assert [int(event["eventId"]) for event in events] == list(range(30, 16, -1))
+
+
+def test_query_generator_close(events_table):
+    events = events_table.query_generator(Key("userId").eq("a"), page_size=5)
+
+    assert next(events).eventId == 1
+    events.close()
+
+
+def test_query_cursor(events_table):
+    pages = []
+    cursor = None
+    while True:
+        page = events_table.query(Key("userId").eq("a"), limit=12, cursor=cursor)
+        pages.append([event.eventId for event in page.items])
+        cursor = page.nextCursor
+        if not cursor:
+            break
+
+    assert pages == [list(range(1, 13)), list(range(13, 25)), list(range(25, 31))]
+
+
+def test_scan_page_cursor(items_table):
+    first = items_table.scan_page(150, as_dict=True)
+    second = items_table.scan_page(150, as_dict=True, cursor=first.nextCursor)
+
+    assert first.nextCursor
+    assert second.nextCursor is None
+    assert sorted(int(item["itemId"]) for item in first.items + second.items) == list(
+        range(1, 201))
+
+
+@dataclass
+class ProductModel(DynamoDbModel):
+    itemId: int = 0
+    category: str = ""
+    price: Optional[float] = None
+    stock: int = 0
+    available: bool = False
+    ratings: List[int] = field(default_factory=list)
+    details: dict = field(default_factory=dict)
+
+
+class ProductsTable(DynamodbTable[ProductModel]):
+    table = "items"
+    model_type = ProductModel
+
+
+@pytest.fixture(scope="function")
+def products_table(items_table):
+    table = ProductsTable(items_table._dynamo_resource)
+    for item_id in range(1, 201):
+        table._table.put_item(Item={
+            "itemId": item_id, "category": "even" if item_id % 2 == 0 else "odd",
+            "price": Decimal(item_id) / 4, "stock": item_id % 3, "available": item_id % 5 == 0,
+            "ratings": [item_id, 2], "details": {"size": Decimal("1.5"), "tags": {"a", "b"}},
+            "extra": "not a model field"
+        })
+    return table
+
+
+def test_wire_scan(products_table):
+    items = products_table.scan(wire=True, filter=Attr("category").eq("odd"))
+    expected = products_table.scan(filter=Attr("category").eq("odd"))
+
+    assert [item.to_dict() for item in items] == [item.to_dict() for item in expected]
+    assert len(items) == 100
+    item = next(item for item in items if item.itemId == 7)
+    assert (item.price, item.stock, item.available, item.ratings) == (1.75, 1, False, [7, 2])
+    assert item.details == {"size": Decimal("1.5"), "tags": {"a", "b"}}
+    # zero is read as None, as with the resource reads
+    assert next(item for item in items if item.itemId == 9).stock is None
+
+
+def test_wire_scan_page(products_table):
+    first = products_table.scan_page(150, wire=True)
+    second = products_table.scan_page(150, wire=True, cursor=first.nextCursor)
+
+    assert sorted(item.itemId for item in first.items + second.items) == list(range(1, 201))
+    assert second.nextCursor is None
+
+
+def test_wire_query(events_table):
+    events = events_table.query(
+        Key("userId").eq("b") & Key("eventId").gt(20), limit=4, wire=True)
+    descending = list(events_table.query_generator(
+        Key("userId").eq("b"), page_size=7, wire=True, sort_desc=True))
+
+    assert [(event.userId, event.eventId) for event in events.items] == [
+        ("b", event_id) for event_id in range(21, 25)]
+    assert events.lastEvaluatedKey == {"userId": "b", "eventId": Decimal(24)}
+    assert [event.eventId for event in descending] == list(range(30, 0, -1))
+
+
+def test_wire_from_wire_numbers():
+    item = ProductModel.from_wire({
+        "itemId": {"N": "1E+2"}, "price": {"N": "0.1"}, "stock": {"S": "12"},
+        "ratings": {"L": [{"N": "1"}, {"N": "2.0"}]}, "unknown": {"N": "1"}
+    })
+
+    assert (item.itemId, item.price, item.stock, item.ratings) == (100, 0.1, 12, [1, 2])
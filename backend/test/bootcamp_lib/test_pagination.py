@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+import pytest
+
+from bootcamp_lib.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+
+KEY = {"userId": "a/b+c", "eventId": Decimal("12"), "score": Decimal("0.5"), "blob": b"\x00\xff"}
+
+
+def test_cursor_round_trip(monkeypatch):
+    monkeypatch.delenv("PAGINATION_CURSOR_SECRET", raising=False)
+    cursor = encode_cursor(KEY)
+
+    assert "=" not in cursor and "." not in cursor
+    assert decode_cursor(cursor) == KEY
+    assert decode_cursor(cursor, key_names=KEY.keys()) == KEY
+    assert encode_cursor(None) is None
+    assert decode_cursor("") is None
+
+
+def test_signed_cursor(monkeypatch):
+    monkeypatch.setenv("PAGINATION_CURSOR_SECRET", "secret")
+    cursor = encode_cursor({"plantID": 7})
+    payload, signature = cursor.split(".")
+
+    assert decode_cursor(cursor) == {"plantID": 7}
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(payload)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, secret="other")
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(encode_cursor({"plantID": 8}, secret="other"))
+
+
+# the last ones decode to {"a": {"N": "abc"}} and {"a": {"B": "a"}}
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor", "e30", "WzFd", "eyJhIjpudWxsfQ", "eyJhIjp7Ik4iOiJhYmMifX0",
+    "eyJhIjp7IkIiOiJhIn19"
+])
+def test_invalid_cursor(cursor, monkeypatch):
+    monkeypatch.delenv("PAGINATION_CURSOR_SECRET", raising=False)
+
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+def test_cursor_key_names(monkeypatch):
+    monkeypatch.delenv("PAGINATION_CURSOR_SECRET", raising=False)
+
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(encode_cursor({"plantID": 7, "other": "x"}), key_names={"plantID"})
@@ -1,7 +1,10 @@
 import os
 
+import boto3
 import pytest
 
+from test.utils import build_plant
+
 
 @pytest.fixture(scope="module")
 def aws_credentials():
@@ -14,3 +17,72 @@ def aws_credentials():
     os.environ["AWS_SESSION_TOKEN"] = "testing"
     os.environ["AWS_DEFAULT_REGION"] = "eu-west-1"
     os.environ["MCPR_BUCKET"] = "test"
+
+
+@pytest.fixture(autouse=True)
+def recommender_models_dir(tmp_path, monkeypatch):
+    # the model versions are timestamps, the tests must not share the local files
+    from services.flower_shop import recommender_model
+    monkeypatch.setattr(recommender_model, "LOCAL_MODELS_DIR", str(tmp_path / "models"))
+
+
+@pytest.fixture(scope="function")
+def plant_table(dynamodb):
+    dynamodb.create_table(
+        TableName="mcprengine_test_plant-new",
+        AttributeDefinitions=[
+            {
+                "AttributeName": "plantID",
+                "AttributeType": "N"
+            }
+        ],
+        KeySchema=[
+            {
+                "AttributeName": "plantID",
+                "KeyType": "HASH"
+            }
+        ],
+        ProvisionedThroughput={
+            "ReadCapacityUnits": 10,
+            "WriteCapacityUnits": 10
+        }
+    )
+    yield
+
+
+@pytest.fixture(scope="function")
+def plant_neighbours_table(dynamodb):
+    dynamodb.create_table(
+        TableName="mcprengine_test_plant_neighbours",
+        AttributeDefinitions=[
+            {
+                "AttributeName": "plantID",
+                "AttributeType": "N"
+            }
+        ],
+        KeySchema=[
+            {
+                "AttributeName": "plantID",
+                "KeyType": "HASH"
+            }
+        ],
+        ProvisionedThroughput={
+            "ReadCapacityUnits": 10,
+            "WriteCapacityUnits": 10
+        }
+    )
+    yield
+
+
+@pytest.fixture(scope="function")
+def insert_plants(plant_table):
+    table = boto3.resource("dynamodb").Table("mcprengine_test_plant-new")
+    # three well separated groups: shade/cool/humid, medium, sunny/hot/dry
+    plants = (
+        [build_plant(plant_id, 2, 16.0 + plant_id / 10, 75.0) for plant_id in range(1, 5)]
+        + [build_plant(plant_id, 6, 24.0 + plant_id / 10, 55.0) for plant_id in range(5, 9)]
+        + [build_plant(plant_id, 11, 33.0 + plant_id / 10, 32.0) for plant_id in range(9, 13)]
+    )
+    for plant in plants:
+        table.put_item(Item=plant)
+    return plants
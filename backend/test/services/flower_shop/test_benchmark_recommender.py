@@ -0,0 +1,21 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+
+def test_benchmark_recommender_smoke(tmp_path):
+    output = tmp_path / "benchmark.json"
+    subprocess.run(
+        [sys.executable, "-m", "scripts.benchmark_recommender", "--sizes", "200",
+         "--queries", "5", "--batch-size", "2", "--clusters", "3", "--output", str(output)],
+        cwd=BACKEND_DIR, env=os.environ.copy(), check=True, capture_output=True)
+
+    result, = json.loads(output.read_text())["results"]
+    assert result["plants"] == 200
+    assert set(result["engines"]) == {"cluster", "knn", "precomputed"}
+    for engine in result["engines"].values():
+        assert engine["queries"] == 5 and engine["buildSeconds"] >= 0
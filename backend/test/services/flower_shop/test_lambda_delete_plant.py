@@ -0,0 +1,85 @@
+import json
+from http import HTTPStatus
+
+import boto3
+from botocore.exceptions import ClientError
+
+from test.utils import BOOTCAMP_BUCKET, bucket_file_exists
+
+
+def delete_plants(plant_ids):
+    from services.flower_shop.lambda_delete_plant import delete_plants_handler
+    event = {"body": json.dumps({"plantIds": plant_ids})}
+    return delete_plants_handler(event, None)
+
+
+def upload_images(plant_ids):
+    s3 = boto3.client("s3")
+    for plant_id in plant_ids:
+        s3.put_object(
+            Bucket=BOOTCAMP_BUCKET, Key=f"FlowerShop/PlantImages/Plant{plant_id}.png", Body=b"png")
+
+
+def test_delete_plants(aws_credentials, insert_plants, bootcamp_bucket):
+    upload_images([2, 3, 5])
+
+    result = delete_plants([3, 2, 99, 3, 4])
+    body = json.loads(result["body"])
+
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert body["results"] == [
+        {"plantID": 3, "deleted": True, "imageDeleted": True, "error": None},
+        {"plantID": 2, "deleted": True, "imageDeleted": True, "error": None},
+        {"plantID": 99, "deleted": False, "imageDeleted": False,
+         "error": "Plant not found for ID 99"},
+        # a missing image counts as deleted
+        {"plantID": 4, "deleted": True, "imageDeleted": True, "error": None},
+    ]
+
+    table = boto3.resource("dynamodb").Table("mcprengine_test_plant-new")
+    remaining = sorted(int(item["plantID"]) for item in table.scan()["Items"])
+    assert remaining == [1] + list(range(5, 13))
+    assert not bucket_file_exists(BOOTCAMP_BUCKET, "FlowerShop/PlantImages/Plant2.png")
+    assert not bucket_file_exists(BOOTCAMP_BUCKET, "FlowerShop/PlantImages/Plant3.png")
+    assert bucket_file_exists(BOOTCAMP_BUCKET, "FlowerShop/PlantImages/Plant5.png")
+
+
+def test_delete_plants_reports_rejected_image_batches(
+        aws_credentials, insert_plants, bootcamp_bucket, monkeypatch):
+    from services.flower_shop import lambda_delete_plant
+    upload_images([2, 3])
+
+    def delete_objects(**_):
+        raise ClientError(
+            {"Error": {"Code": "AccessDenied", "Message": "Access Denied"}}, "DeleteObjects")
+
+    monkeypatch.setattr(lambda_delete_plant.s3_res.meta.client, "delete_objects", delete_objects)
+    result = delete_plants([2, 3])
+    body = json.loads(result["body"])
+
+    # the plants are deleted, their images are reported instead of failing the request
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert body["results"] == [
+        {"plantID": plant_id, "deleted": True, "imageDeleted": False,
+         "error": "AccessDenied: Access Denied"}
+        for plant_id in (2, 3)
+    ]
+    assert bucket_file_exists(BOOTCAMP_BUCKET, "FlowerShop/PlantImages/Plant2.png")
+
+
+def test_delete_plants_without_ids(aws_credentials, insert_plants, bootcamp_bucket):
+    result = delete_plants([])
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
+
+
+def test_delete_plant(aws_credentials, insert_plants, bootcamp_bucket):
+    from services.flower_shop.lambda_delete_plant import delete_plant_handler
+    upload_images([7])
+
+    result = delete_plant_handler({"pathParameters": {"id": "7"}}, None)
+    missing = delete_plant_handler({"pathParameters": {"id": "7"}}, None)
+
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert missing["statusCode"] == HTTPStatus.NOT_FOUND.value
+    assert not bucket_file_exists(BOOTCAMP_BUCKET, "FlowerShop/PlantImages/Plant7.png")
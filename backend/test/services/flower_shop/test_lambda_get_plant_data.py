@@ -0,0 +1,142 @@
+import json
+from decimal import Decimal
+from http import HTTPStatus
+
+import boto3
+import pytest
+
+
+def get_plant_data(query_params=None):
+    from services.flower_shop.lambda_get_plant_data import get_plant_data_handler
+    event = {"queryStringParameters": query_params}
+    return get_plant_data_handler(event, None)
+
+
+def test_get_plant_data_pages(aws_credentials, insert_plants):
+    plant_ids = []
+    cursors = []
+    cursor = None
+    while True:
+        result = get_plant_data({"limit": "5", "cursor": cursor} if cursor else {"limit": "5"})
+        page = json.loads(result["body"])
+
+        assert result["statusCode"] == HTTPStatus.OK.value
+        assert len(page["items"]) <= 5
+        plant_ids.extend(item["plant"]["plantID"] for item in page["items"])
+        cursor = page["nextCursor"]
+        if not cursor:
+            break
+        cursors.append(cursor)
+
+    assert sorted(plant_ids) == list(range(1, 13))
+    assert len(cursors) >= 2
+    assert page["items"][-1]["signedPhotoUrl"]
+
+
+def test_get_plant_data_default_limit(aws_credentials, insert_plants):
+    result = get_plant_data()
+    page = json.loads(result["body"])
+
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert len(page["items"]) == 12
+    assert page["nextCursor"] is None
+
+
+def test_get_plant_data_invalid_cursor(aws_credentials, insert_plants):
+    result = get_plant_data({"cursor": "not-a-cursor"})
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
+
+
+@pytest.mark.parametrize("plant_id", ["abc", Decimal("1.5")])
+def test_get_plant_data_forged_cursor(aws_credentials, insert_plants, plant_id, monkeypatch):
+    from bootcamp_lib.pagination import encode_cursor
+    monkeypatch.delenv("PAGINATION_CURSOR_SECRET", raising=False)
+
+    result = get_plant_data({"cursor": encode_cursor({"plantID": plant_id})})
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
+
+
+def test_get_plant_data_signed_cursor(aws_credentials, insert_plants, monkeypatch):
+    monkeypatch.setenv("PAGINATION_CURSOR_SECRET", "secret")
+    first = json.loads(get_plant_data({"limit": "5"})["body"])
+    payload, signature = first["nextCursor"].split(".")
+
+    second = get_plant_data({"limit": "5", "cursor": first["nextCursor"]})
+    unsigned = get_plant_data({"limit": "5", "cursor": payload})
+
+    assert second["statusCode"] == HTTPStatus.OK.value
+    assert unsigned["statusCode"] == HTTPStatus.BAD_REQUEST.value
+
+
+def test_get_plant_data_invalid_limit(aws_credentials, insert_plants):
+    result = get_plant_data({"limit": "0"})
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
+
+
+@pytest.fixture(scope="function")
+def catalog_snapshot(bootcamp_bucket, monkeypatch):
+    from services.flower_shop.lambda_get_plant_data import plant_catalog
+    monkeypatch.setenv("PLANT_CATALOG_SNAPSHOT", "true")
+    yield plant_catalog
+    plant_catalog.stop()
+
+
+def test_get_plant_data_from_snapshot(aws_credentials, insert_plants, catalog_snapshot):
+    first = json.loads(get_plant_data({"limit": "5"})["body"])
+    # the snapshot is not re-read from the table until it is refreshed
+    boto3.resource("dynamodb").Table("mcprengine_test_plant-new").delete_item(Key={"plantID": 6})
+    second = json.loads(get_plant_data({"limit": "5", "cursor": first["nextCursor"]})["body"])
+    third = json.loads(get_plant_data({"limit": "5", "cursor": second["nextCursor"]})["body"])
+
+    assert [item["plant"]["plantID"] for item in first["items"]] == [1, 2, 3, 4, 5]
+    assert [item["plant"]["plantID"] for item in second["items"]] == [6, 7, 8, 9, 10]
+    assert [item["plant"]["plantID"] for item in third["items"]] == [11, 12]
+    assert third["nextCursor"] is None
+    assert first["items"][0]["plant"] == {**insert_plants[0], "temperature": 16.1}
+
+    catalog_snapshot.refresh()
+    refreshed = json.loads(get_plant_data({"limit": "5", "cursor": first["nextCursor"]})["body"])
+    assert [item["plant"]["plantID"] for item in refreshed["items"]] == [7, 8, 9, 10, 11]
+
+
+def test_catalog_snapshot_refreshed_on_version_change(
+        aws_credentials, insert_plants, monkeypatch):
+    from services.flower_shop.plant_catalog import CachedPlantCatalog
+    monkeypatch.setenv("PLANT_CATALOG_SNAPSHOT", "true")
+    versions = ["20240101T000000Z"]
+    catalog = CachedPlantCatalog(version_source=lambda: versions[-1], max_age_seconds=3600)
+    table = boto3.resource("dynamodb").Table("mcprengine_test_plant-new")
+    try:
+        assert len(catalog.snapshot()) == 12
+        assert catalog.snapshot().version == "20240101T000000Z"
+
+        # the table is not scanned again while the version is the same
+        table.delete_item(Key={"plantID": 6})
+        assert not catalog.refresh_if_changed()
+        assert len(catalog.snapshot()) == 12
+
+        versions.append("20240101T000000Z.1")
+        assert catalog.refresh_if_changed()
+        assert len(catalog.snapshot()) == 11
+        assert catalog.snapshot().row_of(6) is None
+
+        # without a version, the snapshot is only reloaded past the max age
+        versions.append(None)
+        assert not catalog.refresh_if_changed()
+        catalog.snapshot().loadedAt -= 3601
+        assert catalog.refresh_if_changed()
+    finally:
+        catalog.stop()
+
+
+def test_get_plant_data_forged_cursor_from_snapshot(
+        aws_credentials, insert_plants, catalog_snapshot, monkeypatch):
+    from bootcamp_lib.pagination import encode_cursor
+    monkeypatch.delenv("PAGINATION_CURSOR_SECRET", raising=False)
+
+    result = get_plant_data({"cursor": encode_cursor({"plantID": "abc"})})
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+from http import HTTPStatus
+
+import boto3
+import pytest
+
+
+@pytest.fixture(scope="function")
+def insert_neighbours(aws_credentials, plant_neighbours_table):
+    table = boto3.resource("dynamodb").Table("mcprengine_test_plant_neighbours")
+    table.put_item(Item={
+        "plantID": 1,
+        "modelVersion": "20240101T000000Z",
+        "neighbours": [{"plantID": plant_id, "distance": plant_id} for plant_id in (2, 3, 4)]
+    })
+
+
+def get_neighbours(plant_id, query_params=None):
+    from services.flower_shop.lambda_get_plant_neighbours import get_plant_neighbours_handler
+    event = {
+        "pathParameters": {"id": str(plant_id)},
+        "queryStringParameters": query_params
+    }
+    return get_plant_neighbours_handler(event, None)
+
+
+def test_get_plant_neighbours(insert_neighbours):
+    result = get_neighbours(1, {"k": "2"})
+    neighbours = json.loads(result["body"])
+
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert neighbours["modelVersion"] == "20240101T000000Z"
+    assert neighbours["neighbours"] == [
+        {"plantID": 2, "distance": 2.0}, {"plantID": 3, "distance": 3.0}]
+
+
+def test_get_plant_neighbours_not_found(insert_neighbours):
+    result = get_neighbours(5)
+
+    assert result["statusCode"] == HTTPStatus.NOT_FOUND.value
+
+
+def test_get_plant_neighbours_invalid_k(insert_neighbours):
+    result = get_neighbours(1, {"k": "-1"})
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
+
+
+def test_get_plant_neighbours_does_not_import_numpy(aws_credentials):
+    code = (
+        "import sys; import services.flower_shop.lambda_get_plant_neighbours; "
+        "sys.exit(int('numpy' in sys.modules or 'sklearn' in sys.modules))"
+    )
+    assert subprocess.run([sys.executable, "-c", code], env=os.environ.copy()).returncode == 0
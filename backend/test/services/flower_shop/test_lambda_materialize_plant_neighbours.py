@@ -0,0 +1,66 @@
+import boto3
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="function")
+def trained_model(aws_credentials, insert_plants, plant_neighbours_table, bootcamp_bucket):
+    from services.flower_shop.lambda_train_recommender import train_recommender_handler
+    return train_recommender_handler({"nClusters": 3}, None)
+
+
+def test_compute_neighbours_blocks():
+    from services.flower_shop.recommender_neighbours import compute_neighbours
+
+    features = np.random.default_rng(0).normal(size=(300, 6)).astype(np.float32)
+    blocks = list(compute_neighbours(
+        features, n_neighbours=4, max_workers=2, query_block_size=32, point_block_size=50))
+    rows = np.vstack([block_rows for _, block_rows, _ in blocks])
+    distances = np.vstack([block_distances for _, _, block_distances in blocks])
+
+    expected = np.linalg.norm(features[:, np.newaxis] - features[np.newaxis], axis=2)
+    np.fill_diagonal(expected, np.inf)
+    assert [start for start, _, _ in blocks] == list(range(0, 300, 32))
+    np.testing.assert_array_equal(rows, np.argsort(expected, axis=1)[:, :4])
+    np.testing.assert_allclose(distances, np.sort(expected, axis=1)[:, :4], atol=1e-5)
+
+
+def test_blas_limit_is_shared_by_the_blocks():
+    from threadpoolctl import threadpool_info, threadpool_limits
+    from services.flower_shop.recommender_neighbours import _single_threaded_blas
+
+    def blas_threads():
+        return {info["num_threads"] for info in threadpool_info() if info["user_api"] == "blas"}
+
+    with threadpool_limits(2):
+        first, second = _single_threaded_blas(), _single_threaded_blas()
+        first.__enter__()
+        second.__enter__()
+        assert blas_threads() == {1}
+        # the first block to finish does not lift the limit of the other one
+        first.__exit__(None, None, None)
+        assert blas_threads() == {1}
+        second.__exit__(None, None, None)
+        assert blas_threads() == {2}
+
+
+def test_materialize_plant_neighbours(trained_model):
+    from services.flower_shop.lambda_materialize_plant_neighbours import (
+        materialize_plant_neighbours_handler
+    )
+    table = boto3.resource("dynamodb").Table("mcprengine_test_plant_neighbours")
+    table.put_item(Item={"plantID": 100, "modelVersion": "old", "neighbours": []})
+    table.put_item(Item={"plantID": 101, "modelVersion": "old.2", "neighbours": []})
+    # written by an incremental update of the trained model, after it was loaded
+    table.put_item(Item={
+        "plantID": 102, "modelVersion": f"{trained_model['version']}.1", "neighbours": []})
+
+    result = materialize_plant_neighbours_handler({"nNeighbours": 3}, None)
+
+    assert result == {"version": trained_model["version"], "plantsCount": 12, "nNeighbours": 3}
+    item = table.get_item(Key={"plantID": 5})["Item"]
+    assert item["modelVersion"] == trained_model["version"]
+    assert sorted(neighbour["plantID"] for neighbour in item["neighbours"]) == [6, 7, 8]
+    assert "Item" not in table.get_item(Key={"plantID": 100})
+    assert "Item" not in table.get_item(Key={"plantID": 101})
+    assert "Item" in table.get_item(Key={"plantID": 102})
@@ -0,0 +1,317 @@
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+from http import HTTPStatus
+
+import boto3
+import numpy as np
+import pytest
+
+from test.utils import build_plant
+
+
+@pytest.fixture(scope="function")
+def trained_model(aws_credentials, insert_plants, bootcamp_bucket):
+    from services.flower_shop.lambda_train_recommender import train_recommender_handler
+    return train_recommender_handler({}, None)
+
+
+def get_recommendations(plant_id, query_params=None):
+    from services.flower_shop.lambda_recommend_plant import (
+        recommend_plant_handler, recommender_model
+    )
+    # every test publishes a new artifact in a fresh bucket
+    recommender_model._model = None
+    recommender_model._store = None
+
+    event = {
+        "pathParameters": {"id": str(plant_id)},
+        "queryStringParameters": query_params
+    }
+    return recommend_plant_handler(event, None)
+
+
+def test_train_recommender(trained_model):
+    assert trained_model["plantsCount"] == 12
+    assert trained_model["version"]
+    assert trained_model["silhouetteScore"] > 0.5
+    assert trained_model["metadata"]["nClusters"] == 3
+    assert [candidate["nClusters"] for candidate in
+            trained_model["metadata"]["clusterSelection"]["candidates"]] == list(range(2, 11))
+    assert trained_model["metadata"]["silhouette"] == {
+        "method": "sampled",
+        "sampleSize": 12,
+        "seed": 0,
+        "silhouetteScore": trained_model["silhouetteScore"]
+    }
+
+
+def test_recommend_plant_same_cluster(trained_model):
+    result = get_recommendations(5, {"mode": "cluster"})
+    recommendations = json.loads(result["body"])
+
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert [rec["plant"]["plantID"] for rec in recommendations] == [6, 7, 8]
+
+
+def test_recommend_plant_top_k_similar(trained_model):
+    result = get_recommendations(1, {"k": "4"})
+    recommendations = json.loads(result["body"])
+    distances = [rec["distance"] for rec in recommendations]
+
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert [rec["plant"]["plantID"] for rec in recommendations][:3] == [2, 3, 4]
+    assert len(recommendations) == 4
+    assert distances == sorted(distances)
+
+
+def test_recommend_plant_invalid_k(trained_model):
+    result = get_recommendations(1, {"k": "0"})
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
+
+
+def test_recommend_plant_not_found(trained_model):
+    result = get_recommendations(100)
+
+    assert result["statusCode"] == HTTPStatus.NOT_FOUND.value
+    assert json.loads(result["body"]) == {"error": "Plant ID 100 not found."}
+
+
+def test_recommend_plant_invalid_id(trained_model):
+    result = get_recommendations("abc")
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
+
+
+def test_recommend_plant_added_after_training(trained_model):
+    boto3.resource("dynamodb").Table("mcprengine_test_plant-new").put_item(
+        Item=build_plant(13, 11, 34.0, 31.0, soilType="Sandy"))
+
+    result = get_recommendations(13, {"k": "3", "mode": "cluster"})
+    recommendations = json.loads(result["body"])
+
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert {rec["plant"]["plantID"] for rec in recommendations} <= {9, 10, 11, 12}
+    assert len(recommendations) == 3
+
+
+def test_recommend_plant_from_snapshot(trained_model, monkeypatch):
+    from services.flower_shop.lambda_recommend_plant import plant_catalog
+    monkeypatch.setenv("PLANT_CATALOG_SNAPSHOT", "true")
+    table = boto3.resource("dynamodb").Table("mcprengine_test_plant-new")
+    try:
+        assert [rec["plant"]["plantID"] for rec in
+                json.loads(get_recommendations(5, {"mode": "cluster"})["body"])] == [6, 7, 8]
+
+        # served from the snapshot loaded by the first call, the new plant from the table
+        table.update_item(
+            Key={"plantID": 6}, UpdateExpression="SET plantName = :name",
+            ExpressionAttributeValues={":name": "Renamed"})
+        table.put_item(Item=build_plant(13, 11, 34.0, 31.0))
+        recommendations = json.loads(get_recommendations(5, {"mode": "cluster"})["body"])
+        assert [rec["plant"]["plantName"] for rec in recommendations][0] == "Plant 6"
+        assert get_recommendations(13, {"k": "3"})["statusCode"] == HTTPStatus.OK.value
+    finally:
+        plant_catalog.stop()
+
+
+def test_train_recommender_streaming(aws_credentials, insert_plants, bootcamp_bucket):
+    from services.flower_shop.lambda_train_recommender import train_recommender_handler
+    trained_model = train_recommender_handler({"mode": "streaming"}, None)
+
+    assert trained_model["plantsCount"] == 12
+    assert trained_model["metadata"]["nClusters"] == 3
+    assert trained_model["metadata"]["training"]["mode"] == "streaming"
+
+    result = get_recommendations(5, {"mode": "cluster"})
+    assert [rec["plant"]["plantID"] for rec in json.loads(result["body"])] == [6, 7, 8]
+
+
+def test_train_model_streaming_pages(aws_credentials, insert_plants, tmp_path):
+    from services.flower_shop.recommender_features import PlantFeatureBuilder, plant_columns
+    from services.flower_shop.recommender_training import train_model_streaming
+    from services.flower_shop.table_plant_data import PlantDataTable
+
+    plant_table = PlantDataTable(boto3.resource("dynamodb"))
+    model = train_model_streaming(plant_table, n_clusters=3, page_size=5, work_dir=str(tmp_path))
+
+    plants = plant_table.scan()
+    builder = PlantFeatureBuilder().fit(plant_columns(plants))
+    assert sorted(model.plantIds.tolist()) == list(range(1, 13))
+    np.testing.assert_allclose(model.feature_builder.mean, builder.mean)
+    np.testing.assert_allclose(model.feature_builder.scale, builder.scale)
+    assert len({model.labels[model.row_of(plant_id)] for plant_id in (1, 2, 3, 4)}) == 1
+    assert len(set(model.labels.tolist())) == 3
+
+
+def test_train_model_streaming_removes_its_work_dir(
+        aws_credentials, insert_plants, tmp_path, monkeypatch):
+    import tempfile
+    from services.flower_shop.recommender_training import train_model_streaming
+    from services.flower_shop.table_plant_data import PlantDataTable
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    model = train_model_streaming(PlantDataTable(boto3.resource("dynamodb")), n_clusters=3)
+
+    assert os.listdir(tmp_path) == []
+    # the memory maps stay readable once their files are deleted
+    assert sorted(model.plantIds.tolist()) == list(range(1, 13))
+    assert model.features.shape == (12, model.feature_builder.width)
+
+
+def test_model_store_memory_maps_the_arrays(aws_credentials, insert_plants, bootcamp_bucket,
+                                            tmp_path):
+    from services.flower_shop.recommender_model import LOCAL_MODELS_DIR, RecommenderModelStore
+    from services.flower_shop.recommender_training import train_model_streaming
+    from services.flower_shop.table_plant_data import PlantDataTable
+
+    model = train_model_streaming(
+        PlantDataTable(boto3.resource("dynamodb")), n_clusters=3, work_dir=str(tmp_path))
+    store = RecommenderModelStore()
+    store.save(model)
+    # a cold container downloads the artifacts again
+    shutil.rmtree(os.path.join(LOCAL_MODELS_DIR, model.version))
+    loaded = store.load(model.version)
+
+    assert isinstance(loaded.features, np.memmap) and not loaded.features.flags.writeable
+    assert isinstance(loaded.attributes["age"], np.memmap)
+    np.testing.assert_array_equal(loaded.features, model.features)
+    np.testing.assert_array_equal(loaded.plantIds, model.plantIds)
+    assert loaded.feature_builder.categories == model.feature_builder.categories
+    assert [loaded.row_of(plant_id) for plant_id in (1, 12, 99)] == [
+        model.row_of(1), model.row_of(12), None]
+    # the KD-tree is saved with the features and mapped as well
+    assert isinstance(loaded.neighbour_index.leafRows, np.memmap)
+    assert loaded.nearest(loaded.features[:1], 3, exclude_row=0) == model.nearest(
+        model.features[:1], 3, exclude_row=0)
+
+
+def test_nearest_kd_tree_matches_brute_force():
+    from services.flower_shop.recommender_model import PlantRecommenderModel
+    rng = np.random.default_rng(7)
+    features = rng.normal(size=(2000, 6)).astype(np.float32)
+    # one-hot like columns, with many tied distances
+    features[:, 3:] = features[:, 3:] > 0.5
+    model = PlantRecommenderModel(
+        version="v", trainedAt="", plantIds=np.arange(1, 2001), labels=np.zeros(2000),
+        centroids=np.zeros((1, 6)), scaler={}, features=features)
+    queries = np.concatenate((features[:40], rng.normal(size=(10, 6)).astype(np.float32)))
+    exclude_rows = list(range(40)) + [None] * 10
+
+    for k in (1, 10, 300):
+        expected = model._rank_candidates(
+            queries, None, k, model._exclude_rows(exclude_rows, len(queries)))
+        ranked = model.nearest_batch(queries, k, exclude_rows)
+        # the tied plants may come in another order, their distances may not
+        np.testing.assert_allclose(
+            [[distance for _, distance in query] for query in ranked],
+            [[distance for _, distance in query] for query in expected])
+        for query, row, neighbours in zip(queries, exclude_rows, ranked):
+            plant_ids = [plant_id for plant_id, _ in neighbours]
+            assert len(set(plant_ids)) == k and (row is None or row + 1 not in plant_ids)
+            np.testing.assert_allclose(
+                np.linalg.norm(features[np.array(plant_ids) - 1] - query, axis=1),
+                [distance for _, distance in neighbours], rtol=1e-5)
+    assert len(model.neighbour_index.leafRows) > 1
+
+
+def test_model_store_loads_pickled_versions(trained_model, tmp_path):
+    from services.flower_shop.recommender_model import LOCAL_MODELS_DIR, RecommenderModelStore
+    store = RecommenderModelStore()
+    model = store.load(trained_model["version"])
+    pickled = tmp_path / "model.pkl"
+    pickled.write_bytes(pickle.dumps(model.to_dict()))
+    boto3.client("s3").upload_file(str(pickled), "test", store.model_key("pickled"))
+
+    loaded = store.load("pickled")
+
+    np.testing.assert_array_equal(loaded.features, model.features)
+    assert loaded.row_of(5) == model.row_of(5)
+    # the files of the previous version are deleted once the new one is loaded
+    assert not os.path.exists(os.path.join(LOCAL_MODELS_DIR, trained_model["version"]))
+    assert os.path.exists(os.path.join(LOCAL_MODELS_DIR, "pickled", "model.pkl"))
+
+
+@pytest.fixture(scope="function")
+def filterable_model(aws_credentials, insert_plants, bootcamp_bucket):
+    from services.flower_shop.lambda_train_recommender import train_recommender_handler
+    table = boto3.resource("dynamodb").Table("mcprengine_test_plant-new")
+    table.put_item(Item=build_plant(13, 2, 16.5, 75.0, location="Italy", plantRating=5))
+    table.put_item(Item=build_plant(14, 2, 16.6, 75.0, soilType="Clay", plantRating=2))
+    return train_recommender_handler({"nClusters": 3}, None)
+
+
+@pytest.mark.parametrize("query_params, expected", [
+    ({"location": "Italy"}, [13]),
+    ({"minRating": "5"}, [13]),
+    ({"soilType": "Clay,Sandy"}, [14]),
+    ({"soilType": "Loam", "minRating": "3", "k": "3"}, [2, 3, 4]),
+    ({"location": "France", "mode": "cluster", "k": "3"}, [2, 3, 4]),
+    ({"location": "Spain"}, []),
+])
+def test_recommend_plant_filtered(filterable_model, query_params, expected):
+    result = get_recommendations(1, query_params)
+    recommendations = json.loads(result["body"])
+
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert sorted(rec["plant"]["plantID"] for rec in recommendations) == expected
+
+
+def test_rating_bitmaps_are_bounded_by_the_ratings():
+    from services.flower_shop.recommender_filters import PlantAttributeIndex
+    index = PlantAttributeIndex({"plantRating": np.array([2, 4, 4, 5], dtype=np.int8)}, {})
+
+    bitmaps = {min_rating: index.rating_bitmap(min_rating) for min_rating in range(-50, 50)}
+
+    assert np.unpackbits(bitmaps[-50], count=4).tolist() == [1, 1, 1, 1]
+    assert np.unpackbits(bitmaps[4], count=4).tolist() == [0, 1, 1, 1]
+    assert np.unpackbits(bitmaps[49], count=4).tolist() == [0, 0, 0, 0]
+    assert len(index._bitmaps) == 5
+
+
+def test_recommend_plant_invalid_filter(filterable_model):
+    result = get_recommendations(1, {"minRating": "high"})
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
+
+
+def test_recommend_plant_init_does_not_import_sklearn(aws_credentials):
+    # the serving needs no sklearn, the training modules are not imported at init
+    code = (
+        "import sys; import services.flower_shop.lambda_recommend_plant as module; "
+        "sys.exit(int('sklearn' in sys.modules or module.init_timer.initMs is None))"
+    )
+    assert subprocess.run([sys.executable, "-c", code], env=os.environ.copy()).returncode == 0
+
+
+def test_recommend_plant_hybrid_ranking(filterable_model):
+    similar = json.loads(get_recommendations(1, {"k": "3"})["body"])
+    hybrid = json.loads(get_recommendations(1, {"k": "3", "ratingWeight": "5"})["body"])
+    scores = [rec["score"] for rec in hybrid]
+
+    assert all(rec["score"] is None for rec in similar)
+    # plant 13 is further than plants 2 to 4 (another location) but rated 5, plant 14 is
+    # rated 2
+    assert hybrid[0]["plant"]["plantID"] == 13
+    assert 14 not in [rec["plant"]["plantID"] for rec in hybrid]
+    assert scores == sorted(scores, reverse=True)
+
+
+@pytest.mark.parametrize("k, expected", [(1, 5), (10, 50), (100, 500), (200, 500), (600, 600)])
+def test_hybrid_candidate_pool_size(k, expected):
+    from services.flower_shop.recommender_ranking import RankingWeights
+    # 5 x k of the nearest plants are re-ranked, at most 500 but never fewer than k
+    assert RankingWeights(rating=1.0).candidates_count(k) == expected
+
+
+@pytest.mark.parametrize("query_params", [
+    {"ratingWeight": "high"}, {"ageWeight": "nan"}, {"distanceWeight": "-1"}
+])
+def test_recommend_plant_invalid_weights(filterable_model, query_params):
+    result = get_recommendations(1, query_params)
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
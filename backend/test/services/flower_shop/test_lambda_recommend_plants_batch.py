@@ -0,0 +1,78 @@
+import json
+from http import HTTPStatus
+
+import pytest
+
+from test.utils import build_plant
+
+
+@pytest.fixture(scope="function")
+def trained_model(aws_credentials, insert_plants, bootcamp_bucket):
+    from services.flower_shop.lambda_train_recommender import train_recommender_handler
+    return train_recommender_handler({"nClusters": 3}, None)
+
+
+def get_batch_recommendations(body):
+    from services.flower_shop.lambda_recommend_plant import recommender_model
+    from services.flower_shop.lambda_recommend_plants_batch import recommend_plants_batch_handler
+    recommender_model._model = None
+    recommender_model._store = None
+
+    return recommend_plants_batch_handler({"body": json.dumps(body)}, None)
+
+
+def test_recommend_plants_batch(trained_model):
+    result = get_batch_recommendations({"plantIds": [1, 5, 9], "k": 3})
+    recommendations = json.loads(result["body"])
+
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert [rec["plantID"] for rec in recommendations] == [1, 5, 9]
+    assert [
+        sorted(plant["plant"]["plantID"] for plant in rec["recommendations"])
+        for rec in recommendations
+    ] == [[2, 3, 4], [6, 7, 8], [10, 11, 12]]
+
+
+def test_recommend_plants_batch_matches_single(trained_model):
+    from services.flower_shop.lambda_recommend_plant import recommend_plants, recommender_model
+
+    result = get_batch_recommendations({"plantIds": [2, 7], "k": 5, "mode": "cluster"})
+    recommendations = json.loads(result["body"])
+
+    for rec in recommendations:
+        single = recommend_plants(rec["plantID"], recommender_model.get(), k=5, mode="cluster")
+        assert [plant["plant"]["plantID"] for plant in rec["recommendations"]] == [
+            plant.plant.plantID for plant in single]
+
+
+def test_recommend_plants_batch_missing_and_new(trained_model):
+    import boto3
+    boto3.resource("dynamodb").Table("mcprengine_test_plant-new").put_item(
+        Item=build_plant(13, 11, 34.5, 31.0))
+
+    result = get_batch_recommendations({"plantIds": [13, 100, 13], "k": 2})
+    recommendations = json.loads(result["body"])
+
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert [(rec["plantID"], rec["found"]) for rec in recommendations] == [
+        (13, True), (100, False)]
+    assert {plant["plant"]["plantID"] for plant in recommendations[0]["recommendations"]} <= {
+        9, 10, 11, 12}
+    assert recommendations[1]["recommendations"] == []
+
+
+@pytest.mark.parametrize("body", [{"plantIds": []}, {"plantIds": ["a"]}, {"k": 2},
+                                  {"plantIds": list(range(101))}])
+def test_recommend_plants_batch_invalid(trained_model, body):
+    result = get_batch_recommendations(body)
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
+
+
+def test_recommend_plants_batch_filtered(trained_model):
+    result = get_batch_recommendations(
+        {"plantIds": [1, 5], "k": 2, "filters": {"location": ["France"], "minRating": 4}})
+    recommendations = json.loads(result["body"])
+
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert [len(rec["recommendations"]) for rec in recommendations] == [2, 2]
@@ -0,0 +1,76 @@
+import json
+from http import HTTPStatus
+
+import boto3
+import pytest
+
+from test.utils import build_plant
+
+
+def search_plants(query_params=None):
+    from services.flower_shop.lambda_search_plants import search_plants_handler
+    event = {"queryStringParameters": query_params}
+    return search_plants_handler(event, None)
+
+
+@pytest.fixture(scope="function")
+def named_plants(insert_plants, bootcamp_bucket, monkeypatch):
+    from services.flower_shop.lambda_search_plants import plant_catalog
+    monkeypatch.setenv("PLANT_CATALOG_SNAPSHOT", "true")
+    table = boto3.resource("dynamodb").Table("mcprengine_test_plant-new")
+    for plant_id, name in ((13, "Aloe Vera"), (14, "Snake Plant"), (15, "Bird of Paradise")):
+        table.put_item(Item=build_plant(plant_id, 6, 24.0, 55.0, plantName=name))
+    yield
+    plant_catalog.stop()
+
+
+def test_search_plants_prefix(aws_credentials, named_plants):
+    result = search_plants({"q": "plant 1", "fuzzy": "false"})
+    body = json.loads(result["body"])
+
+    assert result["statusCode"] == HTTPStatus.OK.value
+    assert body["query"] == "plant 1"
+    assert [match["plant"]["plantID"] for match in body["matches"]] == [1, 10, 11, 12]
+    assert body["matches"][0]["matchType"] == "exact"
+    assert body["matches"][0]["score"] == 1.0
+    assert body["matches"][1]["matchType"] == "prefix"
+
+
+def test_search_plants_word_prefix(aws_credentials, named_plants):
+    body = json.loads(search_plants({"q": "vera"})["body"])
+
+    assert body["matches"][0]["plant"]["plantName"] == "Aloe Vera"
+    assert body["matches"][0]["matchType"] == "word"
+
+
+def test_search_plants_fuzzy(aws_credentials, named_plants):
+    body = json.loads(search_plants({"q": "snak plnt", "limit": "3"})["body"])
+
+    assert len(body["matches"]) <= 3
+    assert body["matches"][0]["plant"]["plantName"] == "Snake Plant"
+    assert body["matches"][0]["matchType"] == "fuzzy"
+    assert not json.loads(search_plants({"q": "snak plnt", "fuzzy": "false"})["body"])["matches"]
+
+
+def test_search_plants_missing_query(aws_credentials, named_plants):
+    result = search_plants({"q": "  "})
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
+
+
+def test_search_plants_invalid_limit(aws_credentials, named_plants):
+    result = search_plants({"q": "plant", "limit": "500"})
+
+    assert result["statusCode"] == HTTPStatus.BAD_REQUEST.value
+
+
+def test_search_plants_without_snapshot(aws_credentials, named_plants, monkeypatch):
+    from services.flower_shop.lambda_search_plants import plant_catalog
+    monkeypatch.delenv("PLANT_CATALOG_SNAPSHOT")
+    table = boto3.resource("dynamodb").Table("mcprengine_test_plant-new")
+    table.put_item(Item=build_plant(16, 6, 24.0, 55.0, plantName="Spider Plant"))
+
+    body = json.loads(search_plants({"q": "spider", "fuzzy": "false"})["body"])
+
+    assert [match["plant"]["plantID"] for match in body["matches"]] == [16]
+    assert plant_catalog._snapshot is None and plant_catalog._refresher is None
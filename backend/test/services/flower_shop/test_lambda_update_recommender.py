@@ -0,0 +1,197 @@
+import boto3
+import numpy as np
+import pytest
+from dynamodb_json import json_util
+
+from test.utils import build_plant
+
+
+@pytest.fixture(scope="function")
+def materialized_model(
+        aws_credentials, insert_plants, plant_neighbours_table, bootcamp_bucket, monkeypatch):
+    from services.flower_shop.lambda_materialize_plant_neighbours import (
+        materialize_plant_neighbours_handler
+    )
+    from services.flower_shop.lambda_train_recommender import train_recommender_handler
+    monkeypatch.setenv("RECOMMENDER_NEIGHBOURS", "3")
+    trained = train_recommender_handler({"nClusters": 3}, None)
+    materialize_plant_neighbours_handler({}, None)
+    return trained
+
+
+@pytest.fixture(scope="function")
+def retrain_requests(monkeypatch):
+    from services.flower_shop import lambda_update_recommender
+    from services.flower_shop.recommender_model import CachedRecommenderModel
+    monkeypatch.setattr(
+        lambda_update_recommender, "recommender_model", CachedRecommenderModel(refresh_seconds=0))
+    requests = []
+    monkeypatch.setattr(lambda_update_recommender, "request_retrain", lambda: requests.append(1))
+    return requests
+
+
+def stream_event(inserted=(), removed=()):
+    records = [
+        {
+            "eventName": "INSERT",
+            "dynamodb": {
+                "Keys": json_util.dumps({"plantID": plant["plantID"]}, as_dict=True),
+                "NewImage": json_util.dumps(plant, as_dict=True)
+            }
+        }
+        for plant in inserted
+    ] + [
+        {
+            "eventName": "REMOVE",
+            "dynamodb": {"Keys": json_util.dumps({"plantID": plant_id}, as_dict=True)}
+        }
+        for plant_id in removed
+    ]
+    return {"Records": records}
+
+
+def test_update_recommender_from_stream(materialized_model, retrain_requests):
+    from services.flower_shop.lambda_update_recommender import update_recommender_handler
+    from services.flower_shop.recommender_model import RecommenderModelStore
+
+    result = update_recommender_handler(
+        stream_event(inserted=[build_plant(13, 11, 34.05, 32.0)], removed=[1]), None)
+
+    assert result["version"] == f"{materialized_model['version']}.1"
+    assert result["upserted"] == 1 and result["removed"] == 1
+    assert not result["retrainRequested"] and not retrain_requests
+
+    store = RecommenderModelStore()
+    model = store.load()
+    assert model.version == result["version"]
+    # only the delta is published, the trained model and the latest pointer are unchanged
+    base = materialized_model["version"]
+    assert store.latest_base_version() == base
+    assert sorted(key.rsplit("/", 2)[-2:] for key in store._s3.list_files(
+        f"FlowerShop/Recommender/Models/{base}/")) == [
+        [base, "model.arrays"], [base, "model.json"], [base, "updates.json"],
+        ["deltas", "000001.arrays"], ["deltas", "000001.json"]]
+    assert model.row_of(1) is None
+    assert model.labels_of([model.row_of(13)]) == model.labels_of([model.row_of(9)])
+
+    table = boto3.resource("dynamodb").Table("mcprengine_test_plant_neighbours")
+    assert "Item" not in table.get_item(Key={"plantID": 1})
+    new_plant = table.get_item(Key={"plantID": 13})["Item"]
+    assert {neighbour["plantID"] for neighbour in new_plant["neighbours"]} <= {9, 10, 11, 12}
+    plant_2 = table.get_item(Key={"plantID": 2})["Item"]
+    assert sorted(neighbour["plantID"] for neighbour in plant_2["neighbours"]) == [3, 4, 5]
+
+
+def test_model_deltas_overlay_the_mapped_arrays(materialized_model):
+    from services.flower_shop.recommender_filters import PlantFilters
+    from services.flower_shop.recommender_model import RecommenderModelStore
+    from services.flower_shop.recommender_updates import PlantChanges, apply_plant_changes
+    model = RecommenderModelStore().load()
+
+    updated, _, _ = apply_plant_changes(model, PlantChanges(
+        upserts={13: build_plant(13, 11, 34.05, 32.0, location="Spain")}, removedIds=[1]))
+    updated, _, _ = apply_plant_changes(updated, PlantChanges(
+        upserts={2: build_plant(2, 11, 34.0, 32.0), 14: build_plant(14, 11, 34.1, 32.1)},
+        removedIds=[13]))
+
+    # the trained arrays are still the memory maps, only the changed plants are on the heap
+    assert updated.features is model.features and updated.neighbour_index is model.neighbour_index
+    assert updated.overlay.plantIds.tolist() == [2, 14]
+    assert updated.overlay.droppedRows.tolist() == sorted([model.row_of(1), model.row_of(2)])
+    assert updated.plants_count == 12 and [updated.row_of(plant_id) for plant_id in (1, 13)] == [
+        None, None]
+
+    compacted = updated.compacted()
+    assert sorted(compacted.plantIds.tolist()) == [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 14]
+    queries = compacted.features_of([compacted.row_of(plant_id) for plant_id in (2, 5, 14)])
+    for k in (3, 12):
+        assert [[plant_id for plant_id, _ in ranked] for ranked in updated.nearest_batch(
+            queries, k, [updated.row_of(plant_id) for plant_id in (2, 5, 14)])] == [
+            [plant_id for plant_id, _ in ranked] for ranked in compacted.nearest_batch(
+                queries, k, [compacted.row_of(plant_id) for plant_id in (2, 5, 14)])]
+        assert updated.cluster_members_batch(queries, k) == compacted.cluster_members_batch(
+            queries, k)
+    france = PlantFilters(location=["France"])
+    assert sorted(updated.plant_ids_of(np.flatnonzero(updated.attribute_index.mask(france)))) == \
+        sorted(compacted.plant_ids_of(np.flatnonzero(compacted.attribute_index.mask(france))))
+
+
+def test_update_recommender_requests_retrain_on_drift(
+        materialized_model, retrain_requests, monkeypatch):
+    from services.flower_shop.lambda_update_recommender import update_recommender_handler
+    monkeypatch.setenv("RECOMMENDER_DRIFT_MAX_CHANGE_RATIO", "0.1")
+
+    first = update_recommender_handler({"removedIds": [1]}, None)
+    second = update_recommender_handler({"removedIds": [2]}, None)
+    third = update_recommender_handler({"removedIds": [3]}, None)
+
+    assert not first["retrainRequested"]
+    assert second["retrainRequested"]
+    assert second["drift"]["changeRatio"] == pytest.approx(2 / 12)
+    # already requested for this base model
+    assert not third["retrainRequested"]
+    assert retrain_requests == [1]
+
+
+def test_update_recommender_rejects_stale_deltas(materialized_model, retrain_requests):
+    from services.flower_shop.recommender_model import ModelVersionConflict, RecommenderModelStore
+    from services.flower_shop.recommender_updates import PlantChanges, apply_plant_changes
+    store = RecommenderModelStore()
+    model = store.load()
+
+    _, _, first = apply_plant_changes(model, PlantChanges(upserts={}, removedIds=[1]))
+    _, _, second = apply_plant_changes(model, PlantChanges(upserts={}, removedIds=[2]))
+    store.save_delta(first)
+
+    with pytest.raises(ModelVersionConflict):
+        store.save_delta(second)
+    assert store.latest_version() == first.version
+
+
+def test_update_recommender_follows_a_new_training(
+        materialized_model, retrain_requests, monkeypatch):
+    from services.flower_shop import lambda_update_recommender, recommender_training
+    from services.flower_shop.lambda_train_recommender import train_recommender_handler
+    from services.flower_shop.recommender_model import RecommenderModelStore
+    update_recommender_handler = lambda_update_recommender.update_recommender_handler
+    base = materialized_model["version"]
+    update_recommender_handler({"removedIds": [1]}, None)
+
+    # a training publishes a new base while the next batch is computed from the old one
+    monkeypatch.setattr(recommender_training, "new_model_version", lambda: "20990101T000000Z")
+    save_delta = RecommenderModelStore.save_delta
+
+    def save_delta_after_training(store, delta):
+        if delta.baseVersion == base:
+            train_recommender_handler({"nClusters": 3}, None)
+        return save_delta(store, delta)
+
+    monkeypatch.setattr(RecommenderModelStore, "save_delta", save_delta_after_training)
+    result = update_recommender_handler({"removedIds": [2]}, None)
+
+    assert result["version"] == "20990101T000000Z.1"
+    store = RecommenderModelStore()
+    model = store.load()
+    assert model.version == result["version"]
+    assert model.row_of(2) is None and model.row_of(1) is not None
+    # the deltas of the replaced base are kept for the containers still reading them
+    assert store.latest_sequence(base) == 1
+
+
+def test_training_deletes_the_older_deltas(materialized_model, retrain_requests, monkeypatch):
+    from services.flower_shop import recommender_training
+    from services.flower_shop.lambda_train_recommender import train_recommender_handler
+    from services.flower_shop.lambda_update_recommender import update_recommender_handler
+    from services.flower_shop.recommender_model import RecommenderModelStore
+    base = materialized_model["version"]
+    update_recommender_handler({"removedIds": [1]}, None)
+
+    for version in ("20990101T000000Z", "20990102T000000Z"):
+        monkeypatch.setattr(recommender_training, "new_model_version", lambda: version)
+        train_recommender_handler({"nClusters": 3}, None)
+
+    store = RecommenderModelStore()
+    assert store.latest_sequence(base) == 0
+    assert not [key for key in store._s3.list_files(f"FlowerShop/Recommender/Models/{base}/")
+                if "/deltas/" in key]
+    assert store._s3.list_files(f"FlowerShop/Recommender/Models/{base}/model.json")
@@ -0,0 +1,51 @@
+import json
+
+import boto3
+
+
+def write_plants(path, plant_ids):
+    with open(path, "w") as file:
+        for plant_id in plant_ids:
+            file.write(json.dumps({
+                "Plant-ID": plant_id, "Plant-Rating": 4, "Plant-Name": f"Plant {plant_id}",
+                "Soil-Type": "Loam", "Sunlight-Hours": 6, "Water-Frequency": "Weekly",
+                "Fertilizer-Type": "Organic", "Temperature": 21.5, "Humidity": 60.0,
+                "Location": "France", "Age": 10
+            }) + "\n")
+
+
+def stored_plant_ids():
+    table = boto3.resource("dynamodb").Table("mcprengine_test_plant-new")
+    return sorted(int(item["plantID"]) for item in table.scan()["Items"])
+
+
+def test_populate_plants_resumes_after_the_checkpoint(plant_table, tmp_path):
+    from executable_scripts.populate_db_plant_data import (
+        load_checkpoint, populate_plants, save_checkpoint
+    )
+    input_path = str(tmp_path / "plants.jsonl")
+    checkpoint_path = str(tmp_path / "plants.jsonl.checkpoint")
+    write_plants(input_path, range(1, 6))
+    # an interrupted load which acknowledged the first chunk of 2 lines
+    with open(input_path, "rb") as file:
+        offset = len(file.readline()) + len(file.readline())
+    checkpoint = load_checkpoint(checkpoint_path, input_path)
+    checkpoint.update(offset=offset, line=2, written=2)
+    save_checkpoint(checkpoint_path, checkpoint)
+
+    summary = populate_plants(input_path, checkpoint_path, workers=2, chunk_lines=2)
+
+    assert stored_plant_ids() == [3, 4, 5]
+    assert summary["written"] == 5 and summary["line"] == 5 and summary["invalid"] == 0
+    assert not (tmp_path / "plants.jsonl.checkpoint").exists()
+
+
+def test_populate_plants_empty_input(plant_table, tmp_path):
+    from executable_scripts.populate_db_plant_data import populate_plants
+    input_path = tmp_path / "plants.jsonl"
+    input_path.write_text("\n")
+
+    summary = populate_plants(str(input_path), str(tmp_path / "plants.jsonl.checkpoint"))
+
+    assert summary["written"] == 0 and summary["invalid"] == 0
+    assert stored_plant_ids() == []
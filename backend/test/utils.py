@@ -1,4 +1,6 @@
 import os
+from decimal import Decimal
+
 import boto3
 
 BOOTCAMP_BUCKET = "test"
@@ -13,3 +15,21 @@ def bucket_file_exists(bucket, file):
     return any(
         obj.bucket_name == bucket and obj.key == file
         for obj in s3.Bucket(BOOTCAMP_BUCKET).objects.all())
+
+
+def build_plant(plant_id, sunlight_hours, temperature, humidity, **fields):
+    plant = {
+        "plantID": plant_id,
+        "plantRating": 4,
+        "plantName": f"Plant {plant_id}",
+        "soilType": "Loam",
+        "sunlightHours": sunlight_hours,
+        "waterFrequency": "Weekly",
+        "fertilizerType": "Organic",
+        "temperature": Decimal(str(temperature)),
+        "humidity": Decimal(str(humidity)),
+        "location": "France",
+        "age": 10
+    }
+    plant.update(fields)
+    return plant